@@ -0,0 +1,192 @@
+"""
+Local renderer of shields.io style (flat) SVG badges
+
+Text width is measured with the advance widths of Verdana at 11px (the font used by
+shields.io), so the generated badges have the same layout as the downloaded ones,
+without any network access.
+"""
+
+import base64
+import mimetypes
+import os
+from itertools import chain
+from xml.sax.saxutils import escape
+
+FONT_SIZE = 11
+HORIZONTAL_PADDING = 5
+LOGO_SIZE = 14
+LOGO_PADDING = 3
+LABEL_COLOR = "#555"
+
+# Same named colors as shields.io
+COLORS = {
+    "brightgreen": "#4c1",
+    "green": "#97ca00",
+    "yellowgreen": "#a4a61d",
+    "yellow": "#dfb317",
+    "orange": "#fe7d37",
+    "red": "#e05d44",
+    "blue": "#007ec6",
+    "lightgrey": "#9f9f9f",
+    "grey": "#555",
+}
+
+# Advance widths of Verdana glyphs in font units (2048 per em)
+VERDANA_UNITS_PER_EM = 2048
+VERDANA_DEFAULT_WIDTH = 1300
+VERDANA_WIDTHS = {
+    " ": 720,
+    "!": 806,
+    '"': 940,
+    "#": 1716,
+    "$": 1302,
+    "%": 2204,
+    "&": 1488,
+    "'": 550,
+    "(": 909,
+    ")": 909,
+    "*": 1302,
+    "+": 1716,
+    ",": 745,
+    "-": 909,
+    ".": 745,
+    "/": 909,
+    ":": 909,
+    ";": 909,
+    "<": 1716,
+    "=": 1716,
+    ">": 1716,
+    "?": 1117,
+    "@": 2000,
+    "[": 909,
+    "\\": 909,
+    "]": 909,
+    "^": 1716,
+    "_": 1302,
+    "`": 1302,
+    "{": 1300,
+    "|": 909,
+    "}": 1300,
+    "~": 1716,
+    **{digit: 1302 for digit in "0123456789"},
+    **dict(
+        zip(
+            "ABCDEFGHIJKLMNOPQRSTUVWXYZ",
+            chain(
+                [1401, 1405, 1435, 1577, 1294, 1178, 1577, 1541, 862, 931, 1425, 1155],
+                [1740, 1533, 1613, 1241, 1613, 1441, 1401, 1234, 1504, 1401, 2025],
+                [1407, 1234, 1407],
+            ),
+        )
+    ),
+    **dict(
+        zip(
+            "abcdefghijklmnopqrstuvwxyz",
+            chain(
+                [1229, 1270, 1069, 1270, 1218, 720, 1270, 1296, 562, 705, 1186, 562],
+                [1995, 1296, 1233, 1270, 1270, 874, 1067, 807, 1296, 1186, 1654],
+                [1184, 1186, 1051],
+            ),
+        )
+    ),
+}
+
+
+def get_text_width(text):
+    """Width of the text in pixels, rounded up to an odd number like shields.io does"""
+
+    units = sum(VERDANA_WIDTHS.get(char, VERDANA_DEFAULT_WIDTH) for char in text)
+    width = int(-(-units * FONT_SIZE // VERDANA_UNITS_PER_EM))
+
+    return width if width % 2 == 1 else width + 1
+
+
+def get_color(color):
+    return COLORS.get(color, color if color.startswith("#") else f"#{color}")
+
+
+def get_logo_uri(logo):
+    """
+    Return the data URI of the logo, which can be either a data URI already
+    or a path to an image file. Named shields.io logos can't be resolved offline,
+    so anything else is an error.
+    """
+
+    if not logo:
+        return None
+
+    if logo.startswith("data:"):
+        return logo
+
+    if not os.path.isfile(logo):
+        raise ValueError(
+            f"Badge logo {logo} is neither an image file nor a data: URI "
+            "(named shields.io logos are not supported)"
+        )
+
+    mime_type = mimetypes.guess_type(logo)[0] or "image/svg+xml"
+    with open(logo, "rb") as file:
+        encoded = base64.b64encode(file.read()).decode("ascii")
+
+    return f"data:{mime_type};base64,{encoded}"
+
+
+def render_text(text, center, width):
+    # Text is rendered at 10x scale for better precision, with a shadow below it
+    return (
+        f'<text aria-hidden="true" x="{round(center * 10)}" y="150" fill="#010101" '
+        f'fill-opacity=".3" transform="scale(.1)" textLength="{width * 10}">'
+        f"{text}</text>"
+        f'<text x="{round(center * 10)}" y="140" transform="scale(.1)" fill="#fff" '
+        f'textLength="{width * 10}">{text}</text>'
+    )
+
+
+def render_badge(label, message, color, logo=None):
+    """Render flat badge as SVG string"""
+
+    logo_uri = get_logo_uri(logo)
+    logo_width = LOGO_SIZE + LOGO_PADDING if logo_uri else 0
+
+    label_width = get_text_width(label)
+    message_width = get_text_width(message)
+
+    left_width = label_width + 2 * HORIZONTAL_PADDING + logo_width
+    right_width = message_width + 2 * HORIZONTAL_PADDING
+    total_width = left_width + right_width
+
+    label_center = HORIZONTAL_PADDING + logo_width + label_width / 2
+    message_center = left_width + HORIZONTAL_PADDING + message_width / 2
+
+    label, message = escape(label), escape(message)
+    logo_image = (
+        f'<image x="{HORIZONTAL_PADDING}" y="3" width="{LOGO_SIZE}" '
+        f'height="{LOGO_SIZE}" xlink:href="{logo_uri}"/>'
+        if logo_uri
+        else ""
+    )
+
+    return (
+        '<svg xmlns="http://www.w3.org/2000/svg" '
+        'xmlns:xlink="http://www.w3.org/1999/xlink" '
+        f'width="{total_width}" height="20" role="img" '
+        f'aria-label="{label}: {message}">'
+        f"<title>{label}: {message}</title>"
+        '<linearGradient id="s" x2="0" y2="100%">'
+        '<stop offset="0" stop-color="#bbb" stop-opacity=".1"/>'
+        '<stop offset="1" stop-opacity=".1"/></linearGradient>'
+        f'<clipPath id="r"><rect width="{total_width}" height="20" rx="3" '
+        'fill="#fff"/></clipPath>'
+        '<g clip-path="url(#r)">'
+        f'<rect width="{left_width}" height="20" fill="{LABEL_COLOR}"/>'
+        f'<rect x="{left_width}" width="{right_width}" height="20" '
+        f'fill="{get_color(color)}"/>'
+        f'<rect width="{total_width}" height="20" fill="url(#s)"/></g>'
+        '<g fill="#fff" text-anchor="middle" '
+        'font-family="Verdana,Geneva,DejaVu Sans,sans-serif" '
+        'text-rendering="geometricPrecision" font-size="110">'
+        f"{logo_image}"
+        f"{render_text(label, label_center, label_width)}"
+        f"{render_text(message, message_center, message_width)}"
+        "</g></svg>"
+    )
@@ -0,0 +1,309 @@
+"""
+Builds of several vt configurations, scheduled to fit the available cores and memory
+
+The configurations are given as a JSON list (either inline or in a file), e.g.
+[
+    {"name": "unity", "env": {"VT_UNITY_BUILD_ENABLED": "1"}},
+    {"name": "debug", "env": {"CMAKE_BUILD_TYPE": "Debug"}, "target": "all"}
+]
+where env holds the variables read by build_vt.sh, target is the built target
+(defaults to vt) and flags are the extra compiler flags (none by default).
+
+Every configuration is built with build_vt.sh in its own build folder. Several builds
+run at the same time, each limited with CMAKE_BUILD_PARALLEL_LEVEL, so that all jobs
+fit into the cores and into the memory budget (using the peak memory recorded by the
+compile monitor when available). All builds get the same number of jobs, so their
+times can be compared with each other, though not with the main build.
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+from compile_memory import MEMORY_BUDGET_GB, read_compile_jobs, recommend_jobs
+from config import get_config
+from generate_build_graph import read_build_times
+from ninja_log import BUILD_CORES
+
+CONFIG = get_config()
+BUILD_MATRIX = CONFIG.build_matrix
+# Memory of a compiler job when the compile monitor didn't record it
+MATRIX_JOB_MEMORY_GB = CONFIG.matrix_job_memory_gb
+# Builds are started in parallel only when each of them gets at least this many jobs
+MIN_JOBS_PER_BUILD = 2
+
+BUILD_MATRIX_FILENAME = "build_matrix.json"
+BUILD_VT_SCRIPT = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "build_vt.sh"
+)
+
+OK = "ok"
+FAILED = "failed"
+
+# Options of CMakeCache.txt shown in the configuration tables
+CONFIG_OPTIONS = {
+    "Build Type": "CMAKE_BUILD_TYPE",
+    "Unity Build": "vt_unity_build_enabled",
+    "Production Mode": "vt_production_build_enabled",
+    "Memory Pool": "vt_pool_enabled",
+    "mimalloc": "vt_mimalloc_enabled",
+    "LB": "vt_lb_enabled",
+    "Trace": "vt_trace_enabled",
+}
+CACHE_ENTRY_RE = re.compile(r"^([^#/][^:=]*):[^=]*=(.*)$")
+COMPILER_RE = re.compile(r'^set\(CMAKE_CXX_COMPILER_(ID|VERSION) "(.*)"\)$')
+
+
+class BuildConfig(NamedTuple):
+    """Configuration of the build matrix, built with its own environment and flags"""
+
+    name: str
+    env: dict
+    target: str
+    flags: str
+
+
+class MatrixBuild(NamedTuple):
+    """Build time of a configuration of the build matrix"""
+
+    name: str
+    target: str
+    jobs: int
+    real: float
+    user: float
+    sys: float
+    status: str
+    # Settings read back from the configuration's CMakeCache.txt
+    settings: dict
+
+
+def parse_configs(matrix=BUILD_MATRIX):
+    """Parse the configurations from JSON text or from the JSON file it names"""
+
+    if not matrix.strip():
+        return []
+
+    if not matrix.lstrip().startswith("["):
+        with open(matrix, encoding="utf-8") as file:
+            matrix = file.read()
+
+    configs = [
+        BuildConfig(
+            config["name"],
+            {key: str(value) for key, value in config.get("env", {}).items()},
+            config.get("target", "vt"),
+            config.get("flags", ""),
+        )
+        for config in json.loads(matrix)
+    ]
+
+    names = [config.name for config in configs]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Configuration names must be unique: {names}")
+
+    return configs
+
+
+def plan_schedule(num_configs, cores=BUILD_CORES, max_jobs=None):
+    """
+    Return the number of builds running at the same time and the jobs of each build.
+    max_jobs is the number of compiler jobs which fit into the memory budget.
+    """
+
+    if max_jobs is None:
+        max_jobs = int(MEMORY_BUDGET_GB // MATRIX_JOB_MEMORY_GB)
+
+    total_jobs = max(min(cores, max_jobs), 1)
+    parallel_builds = max(min(num_configs, total_jobs // MIN_JOBS_PER_BUILD), 1)
+
+    return parallel_builds, max(total_jobs // parallel_builds, 1)
+
+
+def read_cmake_cache(build_folder):
+    """Return the entries of CMakeCache.txt (without their types)"""
+
+    cache = {}
+    file_name = os.path.join(build_folder, "CMakeCache.txt")
+    if not os.path.exists(file_name):
+        return cache
+
+    with open(file_name, encoding="utf-8", errors="replace") as file:
+        for line in file:
+            match = CACHE_ENTRY_RE.match(line.strip())
+            if match is not None:
+                cache[match[1]] = match[2]
+
+    return cache
+
+
+def get_compiler(build_folder):
+    """Compiler ID and version detected by CMake, e.g. 'Clang 15.0.7'"""
+
+    compiler = {}
+    for file_name in glob.glob(
+        os.path.join(build_folder, "CMakeFiles", "*", "CMakeCXXCompiler.cmake")
+    ):
+        with open(file_name, encoding="utf-8", errors="replace") as file:
+            for line in file:
+                match = COMPILER_RE.match(line.strip())
+                if match is not None:
+                    compiler[match[1]] = match[2]
+
+    return " ".join(compiler[key] for key in ("ID", "VERSION") if key in compiler)
+
+
+def format_option(value):
+    if value.upper() in ("1", "ON", "TRUE", "YES"):
+        return "ON"
+    if value.upper() in ("0", "OFF", "FALSE", "NO", ""):
+        return "OFF"
+    return value
+
+
+def get_build_settings(build_folder):
+    """Return the compiler and CONFIG_OPTIONS of the configured build folder"""
+
+    cache = read_cmake_cache(build_folder)
+    settings = {
+        "Compiler": get_compiler(build_folder) or cache.get("CMAKE_CXX_COMPILER", "")
+    }
+    for title, option in CONFIG_OPTIONS.items():
+        if option in cache:
+            settings[title] = (
+                cache[option]
+                if option == "CMAKE_BUILD_TYPE"
+                else format_option(cache[option])
+            )
+
+    return settings
+
+
+def run_build(config, source_folder, matrix_folder, jobs, checkpoint_folder=None):
+    """Build the configuration with build_vt.sh and return its MatrixBuild"""
+
+    build_folder = os.path.join(matrix_folder, config.name)
+    os.makedirs(build_folder, exist_ok=True)
+
+    # Share the checkpoint build of the main build instead of building it again
+    checkpoint_link = os.path.join(build_folder, "checkpoint")
+    if checkpoint_folder is not None and not os.path.exists(checkpoint_link):
+        os.symlink(checkpoint_folder, checkpoint_link)
+
+    env = dict(os.environ, **config.env, CMAKE_BUILD_PARALLEL_LEVEL=str(jobs))
+    print(f"Building configuration {config.name} ({config.target}) with {jobs} jobs")
+
+    with open(os.path.join(build_folder, "build.log"), "w", encoding="utf-8") as log:
+        result = subprocess.run(
+            [BUILD_VT_SCRIPT, source_folder, build_folder, config.flags, config.target],
+            env=env,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+            check=False,
+        )
+
+    vt_folder = os.path.join(build_folder, "vt")
+    time_file = os.path.join(vt_folder, "build_time.txt")
+    status = OK if result.returncode == 0 and os.path.exists(time_file) else FAILED
+    times = (
+        read_build_times(time_file)
+        if status == OK
+        else {"real": float("nan"), "user": float("nan"), "sys": float("nan")}
+    )
+    print(f"Configuration {config.name}: {status}, {times['real']}s")
+
+    return MatrixBuild(
+        config.name,
+        config.target,
+        jobs,
+        times["real"],
+        times["user"],
+        times["sys"],
+        status,
+        get_build_settings(vt_folder),
+    )
+
+
+def run_matrix(configs, source_folder, matrix_folder, main_build_folder):
+    """Build all configurations, as many at the same time as the resources allow"""
+
+    jobs = read_compile_jobs(main_build_folder)
+    parallel_builds, jobs_per_build = plan_schedule(
+        len(configs), max_jobs=recommend_jobs(jobs) if jobs else None
+    )
+    print(
+        f"Building {len(configs)} configurations, {parallel_builds} at a time "
+        f"with {jobs_per_build} jobs each"
+    )
+
+    checkpoint_folder = os.path.join(os.path.dirname(main_build_folder), "checkpoint")
+    if not os.path.isdir(checkpoint_folder):
+        checkpoint_folder = None
+
+    with ThreadPoolExecutor(max_workers=parallel_builds) as executor:
+        return list(
+            executor.map(
+                lambda config: run_build(
+                    config,
+                    source_folder,
+                    matrix_folder,
+                    jobs_per_build,
+                    checkpoint_folder,
+                ),
+                configs,
+            )
+        )
+
+
+def write_results(builds, file_name):
+    with open(file_name, "w", encoding="utf-8") as file:
+        json.dump([build._asdict() for build in builds], file, indent=2)
+
+
+def read_results(matrix_folder):
+    """Return the builds stored in the matrix folder or None if there are none"""
+
+    file_name = os.path.join(matrix_folder, BUILD_MATRIX_FILENAME)
+    if not os.path.exists(file_name):
+        return None
+
+    with open(file_name, encoding="utf-8") as file:
+        return [MatrixBuild(**build) for build in json.load(file)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build vt in several configurations")
+    parser.add_argument("-s", "--source_folder", help="vt source folder", required=True)
+    parser.add_argument(
+        "-b",
+        "--build_folder",
+        help="Main vt build folder",
+        default=CONFIG.build_folder,
+    )
+    parser.add_argument(
+        "-m",
+        "--matrix_folder",
+        help="Folder for the builds of the configurations",
+        required=True,
+    )
+    parser.add_argument(
+        "-c",
+        "--configs",
+        help="JSON list of configurations or a file with it",
+        default=BUILD_MATRIX,
+    )
+    args = parser.parse_args()
+
+    os.makedirs(args.matrix_folder, exist_ok=True)
+    write_results(
+        run_matrix(
+            parse_configs(args.configs),
+            args.source_folder,
+            args.matrix_folder,
+            args.build_folder,
+        ),
+        os.path.join(args.matrix_folder, BUILD_MATRIX_FILENAME),
+    )
@@ -0,0 +1,151 @@
+"""
+Detection of build time regressions
+
+Every value of a series is compared with the rolling baseline formed by the previous
+INPUT_REGRESSION_WINDOW values, which makes single noisy builds on shared runners
+much less likely to be reported than a plain comparison with the previous build.
+Two tests are available:
+- mad: robust z-score, i.e. distance from the baseline median in units of the
+  baseline's median absolute deviation (MAD)
+- percent: relative change from the baseline median in percent
+"""
+
+import json
+from typing import NamedTuple, Optional
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from config import get_config
+
+CONFIG = get_config()
+REGRESSION_WINDOW = CONFIG.regression_window
+REGRESSION_TEST = CONFIG.regression_test
+REGRESSION_THRESHOLD = CONFIG.regression_threshold
+REGRESSION_MIN_CHANGE = CONFIG.regression_min_change
+FAIL_ON_REGRESSION = CONFIG.fail_on_regression
+
+REGRESSED = "regressed"
+IMPROVED = "improved"
+UNCHANGED = "unchanged"
+
+# Scale factor which makes MAD a consistent estimator of standard deviation
+MAD_SCALE = 1.4826
+# Lower bound for MAD relative to the median, so that a perfectly flat baseline
+# doesn't turn every tiny change into a significant one
+MIN_RELATIVE_MAD = 0.005
+
+
+class Verdict(NamedTuple):
+    """Latest value of a build time series judged against its baseline"""
+
+    series: str
+    status: str
+    # Change of the latest value relative to its baseline median
+    magnitude_percent: float
+    delta: float
+    baseline: float
+    score: float
+    # First run of the trailing streak of significant changes
+    first_run: Optional[int]
+    first_commit: Optional[str]
+
+
+def get_scores(values, window=REGRESSION_WINDOW, test=REGRESSION_TEST):
+    """
+    Compute baseline median, relative change and test score for every value,
+    using only the values preceding it. The first `window` values have no baseline.
+    """
+
+    values = np.asarray(values, dtype=float)
+    baselines = np.full(len(values), np.nan)
+    scores = np.full(len(values), np.nan)
+
+    if len(values) <= window:
+        return baselines, np.full(len(values), np.nan), scores
+
+    # Row i holds the `window` values preceding value i + window
+    windows = sliding_window_view(values[:-1], window)
+    medians = np.median(windows, axis=1)
+    mads = np.median(np.abs(windows - medians[:, None]), axis=1)
+    mads = np.maximum(mads, np.abs(medians) * MIN_RELATIVE_MAD)
+
+    baselines[window:] = medians
+    changes = (values - baselines) / baselines * 100.0
+
+    if test == "percent":
+        scores = changes
+    else:
+        scores[window:] = (values[window:] - medians) / (MAD_SCALE * mads)
+
+    return baselines, changes, scores
+
+
+def get_verdict(series, values, run_nums, commits, **kwargs):
+    """Judge the latest value of a (non-empty) series"""
+
+    baselines, changes, scores = get_scores(values, **kwargs)
+
+    significant = (np.abs(scores) > REGRESSION_THRESHOLD) & (
+        np.abs(changes) >= REGRESSION_MIN_CHANGE
+    )
+    signs = np.sign(scores)
+
+    status = UNCHANGED
+    first = None
+
+    if significant[-1]:
+        status = REGRESSED if signs[-1] > 0 else IMPROVED
+
+        # Walk back to the beginning of the streak of same direction changes
+        first = len(values) - 1
+        while first > 0 and significant[first - 1] and signs[first - 1] == signs[-1]:
+            first -= 1
+
+    return Verdict(
+        series,
+        status,
+        float(changes[-1]),
+        float(values[-1] - baselines[-1]),
+        float(baselines[-1]),
+        float(scores[-1]),
+        int(run_nums[first]) if first is not None else None,
+        str(commits[first]) if first is not None else None,
+    )
+
+
+def detect_build_regressions(history):
+    """Return verdicts for the vt, tests and total build times of the history"""
+
+    run_nums = history["run_num"].to_numpy()
+    commits = history["commit"].to_numpy()
+    series = {
+        "vt": history["vt"],
+        "tests": history["tests"],
+        "total": history["vt"] + history["tests"],
+    }
+
+    verdicts = {
+        name: get_verdict(name, values.to_numpy(), run_nums, commits)
+        for name, values in series.items()
+    }
+
+    for verdict in verdicts.values():
+        print(f"Build time verdict: {verdict}")
+
+    return verdicts
+
+
+def write_verdicts(verdicts, file_name):
+    with open(file_name, "w", encoding="utf-8") as file:
+        json.dump(
+            {
+                name: {
+                    key: (
+                        None if isinstance(value, float) and np.isnan(value) else value
+                    )
+                    for key, value in verdict._asdict().items()
+                }
+                for name, verdict in verdicts.items()
+            },
+            file,
+            indent=2,
+        )
@@ -0,0 +1,227 @@
+"""
+Single-pass parser for the text report created by `ClangBuildAnalyzer --analyze`
+
+The report is read line by line and every entry is emitted as a typed record as soon
+as it's complete, so memory usage doesn't depend on the size of the report.
+
+Example input:
+**** Templates that took longest to instantiate:
+ 26549 ms: some<template> (306 times, avg 86 ms)
+
+**** Expensive headers:
+26549 ms: some_header.h (included 237 times, avg 506 ms), included via:
+  12x: some_file.cc.o other_header.h
+
+Output:
+NameTimesAvg(section="templates", name="some<template>", total_ms=26549, times=306, avg_ms=86)
+HeaderTime(section="headers", name="some_header.h", total_ms=26549, times=237, avg_ms=506,
+           chains=(IncludeChain(times=12, includers=("some_file.cc.o", "other_header.h")),))
+"""
+
+import re
+from typing import Iterable, Iterator, NamedTuple, Optional, Tuple, Union
+
+TIME_SUMMARY = "time_summary"
+FILE_PARSE = "file_parse"
+FILE_CODEGEN = "file_codegen"
+TEMPLATES = "templates"
+TEMPLATE_SETS = "template_sets"
+FUNCTIONS = "functions"
+FUNCTION_SETS = "function_sets"
+HEADERS = "headers"
+
+SECTION_TITLES = {
+    "**** Time summary:": TIME_SUMMARY,
+    "**** Files that took longest to parse": FILE_PARSE,
+    "**** Files that took longest to codegen": FILE_CODEGEN,
+    "**** Templates that took longest to instantiate:": TEMPLATES,
+    "**** Template sets that took longest to instantiate:": TEMPLATE_SETS,
+    "**** Functions that took longest to compile:": FUNCTIONS,
+    "**** Function sets that took longest to compile": FUNCTION_SETS,
+    "**** Expensive headers:": HEADERS,
+}
+
+ENTRY_RE = re.compile(r"^\s*(\d+) ms: (.*)$")
+NAME_TIMES_AVG_RE = re.compile(r"^(.*) \((\d+) times, avg (\d+) ms\)$")
+HEADER_RE = re.compile(r"^(.*) \(included (\d+) times, avg (\d+) ms\), included via:$")
+FUNCTION_RE = re.compile(r"^(.*) \(([^()]*)\)$")
+CHAIN_RE = re.compile(r"^\s*(\d+)x: (.*)$")
+DIRECT_INCLUDE = "<direct include>"
+SUMMARY_RE = re.compile(r"^\s*(.+?):\s+(\d+(?:\.\d+)?) s$")
+
+
+class SummaryTime(NamedTuple):
+    """Total time of a compilation phase"""
+
+    section: str
+    name: str
+    time_s: float
+
+
+class FileTime(NamedTuple):
+    """Frontend or backend time of a translation unit"""
+
+    section: str
+    name: str
+    time_ms: int
+
+
+class FunctionTime(NamedTuple):
+    """Compile time of a function"""
+
+    section: str
+    name: str
+    time_ms: int
+    file: str
+
+
+class NameTimesAvg(NamedTuple):
+    """Total and average time of a template, template set or function set"""
+
+    section: str
+    name: str
+    total_ms: int
+    times: int
+    avg_ms: int
+
+
+class IncludeChain(NamedTuple):
+    """Path through which a header was included, from the object file"""
+
+    times: int
+    includers: Tuple[str, ...]
+
+
+class HeaderTime(NamedTuple):
+    """Parse time of an expensive header with its include chains"""
+
+    section: str
+    name: str
+    total_ms: int
+    times: int
+    avg_ms: int
+    chains: Tuple[IncludeChain, ...]
+
+
+Record = Union[SummaryTime, FileTime, FunctionTime, NameTimesAvg, HeaderTime]
+
+
+def get_section(line):
+    for title, section in SECTION_TITLES.items():
+        if line.startswith(title):
+            return section
+
+    return None
+
+
+def parse_entry(section, line) -> Optional[Record]:
+    """Parse a single line of any section other than the expensive headers"""
+
+    if section == TIME_SUMMARY:
+        match = SUMMARY_RE.match(line)
+        return SummaryTime(section, match[1], float(match[2])) if match else None
+
+    entry = ENTRY_RE.match(line)
+    if entry is None:
+        return None
+
+    time_ms, text = int(entry[1]), entry[2]
+
+    if section in (FILE_PARSE, FILE_CODEGEN):
+        return FileTime(section, text, time_ms)
+
+    if section == FUNCTIONS:
+        match = FUNCTION_RE.match(text)
+        return FunctionTime(section, match[1], time_ms, match[2]) if match else None
+
+    match = NAME_TIMES_AVG_RE.match(text)
+    if match is None:
+        return None
+
+    return NameTimesAvg(section, match[1], time_ms, int(match[2]), int(match[3]))
+
+
+def parse_header_line(line) -> Union[HeaderTime, IncludeChain, None]:
+    """Parse a line of the expensive headers section: a header or one of its chains"""
+
+    entry = ENTRY_RE.match(line)
+    match = HEADER_RE.match(entry[2]) if entry else None
+    if match is not None:
+        return HeaderTime(
+            HEADERS, match[1], int(entry[1]), int(match[2]), int(match[3]), ()
+        )
+
+    chain = CHAIN_RE.match(line)
+    if chain is None:
+        return None
+
+    # Headers included directly by a source file have no includers
+    includers = chain[2].split() if chain[2] != DIRECT_INCLUDE else []
+    return IncludeChain(int(chain[1]), tuple(includers))
+
+
+def parse_report(lines: Iterable[str]) -> Iterator[Record]:
+    """
+    Parse the report in a single pass and yield a record for every entry,
+    in the order they appear in the report.
+    """
+
+    section = None
+
+    # Expensive header which is waiting for its 'included via' chains
+    header = None
+    chains = []
+
+    for line in lines:
+        line = line.rstrip("\n")
+
+        if line.startswith("****"):
+            if header is not None:
+                yield header._replace(chains=tuple(chains))
+                header = None
+
+            section = get_section(line)
+            continue
+
+        if section is None:
+            continue
+
+        if section == HEADERS:
+            parsed = parse_header_line(line)
+
+            if isinstance(parsed, IncludeChain) and header is not None:
+                chains.append(parsed)
+                continue
+
+            # A new header or anything else than its chains ends the current header,
+            # something other than a header or its chain ends the section
+            if line.strip():
+                if header is not None:
+                    yield header._replace(chains=tuple(chains))
+
+                header = parsed if isinstance(parsed, HeaderTime) else None
+                chains = []
+                section = HEADERS if header is not None else None
+
+            continue
+
+        # Sections of the time summary are separated by blank lines
+        if section == TIME_SUMMARY and not line.strip():
+            continue
+
+        record = parse_entry(section, line)
+        if record is None:
+            # Stop if we parsed all lines for given section
+            if section != TIME_SUMMARY:
+                section = None
+            continue
+
+        yield record
+
+    if header is not None:
+        yield header._replace(chains=tuple(chains))
+
+
+def read_report(file_name) -> Iterator[Record]:
+    with open(file_name, encoding="utf-8") as file:
+        yield from parse_report(file)
@@ -0,0 +1,234 @@
+"""
+Per-run snapshots of the build report and differences between them
+
+The template, function and header aggregates of every run are stored as a compact
+gzipped JSON file, so the next run can show what changed. Entries are matched by name,
+and names which were truncated (ending with '...') are matched to the entry of the
+other snapshot which starts with the same prefix.
+
+Example snapshot:
+{"run_num": 42, "sections": {"templates": {"some<template>": [26549, 306]}}}
+"""
+
+import glob
+import gzip
+import json
+import os
+import re
+from typing import NamedTuple
+from build_report_parser import (
+    FUNCTION_SETS,
+    FUNCTIONS,
+    HEADERS,
+    TEMPLATE_SETS,
+    TEMPLATES,
+)
+from config import get_config
+
+NUM_SNAPSHOTS = get_config().num_snapshots
+
+SNAPSHOT_SECTIONS = (TEMPLATES, TEMPLATE_SETS, FUNCTIONS, FUNCTION_SETS, HEADERS)
+SNAPSHOT_RE = re.compile(r"snapshot_(\d+)\.json\.gz$")
+
+TRUNCATION_MARK = "..."
+# Shorter truncated names are too ambiguous to be matched by prefix
+MIN_PREFIX_LENGTH = 20
+
+NEW = "new"
+REMOVED = "removed"
+CHANGED = "changed"
+
+
+class DiffEntry(NamedTuple):
+    """Change of an entry since the previous run"""
+
+    section: str
+    name: str
+    status: str
+    old_total_ms: int
+    new_total_ms: int
+    old_avg_ms: float
+    new_avg_ms: float
+
+    @property
+    def total_change_ms(self):
+        return self.new_total_ms - self.old_total_ms
+
+    @property
+    def total_change_percent(self):
+        return get_percent(self.old_total_ms, self.new_total_ms)
+
+    @property
+    def avg_change_ms(self):
+        return self.new_avg_ms - self.old_avg_ms
+
+    @property
+    def avg_change_percent(self):
+        return get_percent(self.old_avg_ms, self.new_avg_ms)
+
+
+def get_percent(old, new):
+    return (new - old) / old * 100 if old else float("inf")
+
+
+def add_record(snapshot, record):
+    if record.section not in SNAPSHOT_SECTIONS:
+        return
+
+    entries = snapshot.setdefault(record.section, {})
+
+    # Compiled functions are listed per file, they're summed up by name
+    if record.section == FUNCTIONS:
+        entry = entries.setdefault(record.name, [0, 0])
+        entry[0] += record.time_ms
+        entry[1] += 1
+    else:
+        entries[record.name] = [record.total_ms, record.times]
+
+
+def collect_snapshot(records, snapshot):
+    """Pass the records through, while adding them to the snapshot"""
+
+    for record in records:
+        add_record(snapshot, record)
+        yield record
+
+
+def get_snapshot_file(directory, run_num):
+    return os.path.join(directory, f"snapshot_{run_num}.json.gz")
+
+
+def list_snapshots(directory):
+    """Return the run numbers of the stored snapshots in ascending order"""
+
+    run_nums = []
+    for file_name in glob.glob(os.path.join(directory, "snapshot_*.json.gz")):
+        match = SNAPSHOT_RE.search(file_name)
+        if match is not None:
+            run_nums.append(int(match[1]))
+
+    return sorted(run_nums)
+
+
+def write_snapshot(snapshot, directory, run_num, keep_last=NUM_SNAPSHOTS):
+    """Store the snapshot and remove the oldest ones, keeping keep_last snapshots"""
+
+    os.makedirs(directory, exist_ok=True)
+
+    with gzip.open(
+        get_snapshot_file(directory, run_num), "wt", encoding="utf-8"
+    ) as file:
+        json.dump(
+            {"run_num": run_num, "sections": snapshot}, file, separators=(",", ":")
+        )
+
+    for old_run_num in list_snapshots(directory)[:-keep_last]:
+        os.remove(get_snapshot_file(directory, old_run_num))
+
+
+def read_previous_snapshot(directory, run_num):
+    """Return the run number and the snapshot of the latest run before run_num"""
+
+    previous = [num for num in list_snapshots(directory) if num < run_num]
+    if not previous:
+        return None, None
+
+    with gzip.open(
+        get_snapshot_file(directory, previous[-1]), "rt", encoding="utf-8"
+    ) as file:
+        return previous[-1], json.load(file)["sections"]
+
+
+def get_prefix(name):
+    return name[: -len(TRUNCATION_MARK)] if name.endswith(TRUNCATION_MARK) else None
+
+
+def is_prefix_match(name, other):
+    """Whether the (shorter) truncated one of the names is a prefix of the other one"""
+
+    prefix, other_prefix = get_prefix(name), get_prefix(other)
+    if prefix is None and other_prefix is None:
+        return False
+
+    if prefix is None or (other_prefix is not None and len(other_prefix) < len(prefix)):
+        other, prefix = name, other_prefix
+
+    return len(prefix) >= MIN_PREFIX_LENGTH and other.startswith(prefix)
+
+
+def match_names(old_names, new_names):
+    """
+    Return dict mapping new names to old names. Names which aren't in both lists are
+    matched when one of them is truncated and the other one starts with its prefix.
+    """
+
+    matches = {name: name for name in new_names if name in old_names}
+    unmatched_old = [name for name in old_names if name not in matches]
+
+    for new_name in new_names:
+        if new_name in matches:
+            continue
+
+        candidates = [name for name in unmatched_old if is_prefix_match(new_name, name)]
+        if candidates:
+            # The longest common prefix is the most specific match
+            prefix_lengths = [
+                len(os.path.commonprefix([name, new_name])) for name in candidates
+            ]
+            best = candidates[prefix_lengths.index(max(prefix_lengths))]
+            matches[new_name] = best
+            unmatched_old.remove(best)
+
+    return matches
+
+
+def diff_section(section, old_entries, new_entries):
+    matches = match_names(list(old_entries), list(new_entries))
+    matched_old = set(matches.values())
+
+    for name, (total_ms, times) in new_entries.items():
+        if name in matches:
+            old_total, old_times = old_entries[matches[name]]
+            yield DiffEntry(
+                section,
+                name,
+                CHANGED,
+                old_total,
+                total_ms,
+                old_total / old_times,
+                total_ms / times,
+            )
+        else:
+            yield DiffEntry(section, name, NEW, 0, total_ms, 0.0, total_ms / times)
+
+    for name, (total_ms, times) in old_entries.items():
+        if name not in matched_old:
+            yield DiffEntry(section, name, REMOVED, total_ms, 0, total_ms / times, 0.0)
+
+
+def diff_snapshots(old, new):
+    """Compare two snapshots and return DiffEntry for every entry of both of them"""
+
+    return [
+        entry
+        for section in SNAPSHOT_SECTIONS
+        for entry in diff_section(section, old.get(section, {}), new.get(section, {}))
+    ]
+
+
+def rank_entries(entries, key="total_change_ms", status=CHANGED):
+    """
+    Return the entries with given status and non-zero key, ordered by the absolute
+    value of key, which is one of total_change_ms, total_change_percent, avg_change_ms
+    and avg_change_percent (or new_total_ms/old_total_ms for new/removed entries)
+    """
+
+    return sorted(
+        (
+            entry
+            for entry in entries
+            if entry.status == status and getattr(entry, key) != 0
+        ),
+        key=lambda entry: abs(getattr(entry, key)),
+        reverse=True,
+    )
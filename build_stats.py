@@ -0,0 +1,138 @@
+"""
+Command line interface of the stages that update the wiki
+
+Every stage runs in the wiki repository (or its perf_tests directory), the 'all'
+pipeline runs them in order in a single process, so the interpreter is started and
+the libraries are imported only once. A stage's module (and with it pandas,
+matplotlib, ...) is imported only when the stage is run. The wiki is generated even
+if an earlier stage failed, the exit code is the one of the first failed stage.
+
+Example: build_stats.py -w vt.wiki all -vt vt_time.txt -te tests_time.txt -r 42
+Example: build_stats.py perf-graph --help
+"""
+
+import argparse
+import importlib
+import os
+import sys
+import time
+import traceback
+from contextlib import contextmanager
+from typing import NamedTuple
+
+PERF_TESTS_DIR = "perf_tests"
+ALL = "all"
+
+
+class Stage(NamedTuple):
+    """Stage of the pipeline, run by its module's main()"""
+
+    module: str
+    # Directory the stage runs in, relative to the wiki
+    directory: str
+    description: str
+
+
+STAGES = {
+    "build-graph": Stage(
+        "generate_build_graph", ".", "Update the build times history and its graphs"
+    ),
+    "perf-graph": Stage(
+        "generate_perf_graph",
+        PERF_TESTS_DIR,
+        "Record the perf test results and render their graphs",
+    ),
+    "perf-regression": Stage(
+        "perf_regression", PERF_TESTS_DIR, "Judge the latest perf test results"
+    ),
+    "heaptrack": Stage(
+        "heaptrack_report",
+        PERF_TESTS_DIR,
+        "Render the heaptrack profiles and compare their allocation sites",
+    ),
+    "wiki": Stage(
+        "generate_wiki_pages", ".", "Generate the build stats and perf tests pages"
+    ),
+}
+
+
+@contextmanager
+def working_directory(path):
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def add_stage_arguments(parser, stage_names):
+    """Add the arguments of the stages, this imports their modules"""
+
+    for name in stage_names:
+        module = importlib.import_module(STAGES[name].module)
+        if hasattr(module, "add_arguments"):
+            module.add_arguments(parser)
+
+
+def run_stage(name, args, wiki_dir="."):
+    """
+    Run the stage with the parsed arguments of its module, return its exit code.
+    An exception is reported and turned into a failure, so that the following
+    stages of a pipeline still run.
+    """
+
+    stage = STAGES[name]
+    start = time.perf_counter()
+
+    try:
+        with working_directory(os.path.join(wiki_dir, stage.directory)):
+            status = importlib.import_module(stage.module).main(args) or 0
+    except Exception:  # pylint: disable=broad-except
+        print(f"Stage {name} failed:\n{traceback.format_exc()}")
+        status = 1
+
+    print(f"Stage {name} finished in {time.perf_counter() - start:.1f}s ({status})")
+    return status
+
+
+def run_stages(stage_names, args, wiki_dir="."):
+    """Run every stage, return the exit code of the first failed one"""
+
+    statuses = [run_stage(name, args, wiki_dir) for name in stage_names]
+    return next((status for status in statuses if status != 0), 0)
+
+
+def parse_args(argv=None):
+    """
+    Parse the stage and then its own arguments, so that only the modules of the
+    stages to run are imported
+    """
+
+    stages = [f"{name} ({stage.description})" for name, stage in STAGES.items()]
+    parser = argparse.ArgumentParser(
+        description="Update the build stats and perf tests wiki",
+        epilog=f"stages: {', '.join(stages)}, {ALL} (every stage in this order)",
+    )
+    parser.add_argument(
+        "-w", "--wiki_dir", help="Wiki repository directory", default="."
+    )
+    parser.add_argument("stage", choices=[*STAGES, ALL])
+    parser.add_argument(
+        "stage_args", nargs=argparse.REMAINDER, help="Arguments of the stage"
+    )
+    args = parser.parse_args(argv)
+
+    stage_names = list(STAGES) if args.stage == ALL else [args.stage]
+    stage_parser = argparse.ArgumentParser(
+        prog=f"{parser.prog} {args.stage}",
+        description=STAGES[args.stage].description if args.stage in STAGES else None,
+    )
+    add_stage_arguments(stage_parser, stage_names)
+
+    return args.wiki_dir, stage_names, stage_parser.parse_args(args.stage_args)
+
+
+if __name__ == "__main__":
+    wiki_dir_in, stage_names_in, stage_args_in = parse_args()
+    sys.exit(run_stages(stage_names_in, stage_args_in, wiki_dir_in))
@@ -6,6 +6,9 @@ source_dir=${1}
 build_dir=${2}
 extra_flags=${3}
 
+# Directory with the other scripts (compile_monitor.py)
+scripts_dir=$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)
+
 # Dependency versions, when fetched via git.
 checkpoint_rev=develop
 
@@ -38,6 +41,14 @@ export VT_BUILD=${build_dir}/vt
 mkdir -p "$VT_BUILD"
 cd "$VT_BUILD"
 
+# Record peak memory and duration of every compile and link job
+compiler_launcher=""
+if test "${VT_COMPILE_MONITOR_ENABLED:-0}" == "1"
+then
+    export VT_COMPILE_MONITOR_LOG="$VT_BUILD/compile_monitor.jsonl"
+    compiler_launcher="python3;${scripts_dir}/compile_monitor.py"
+fi
+
 cmake -G "${CMAKE_GENERATOR:-Ninja}" \
       -DCMAKE_EXPORT_COMPILE_COMMANDS=1 \
       -Dvt_test_trace_runtime_enabled="${VT_TRACE_RUNTIME_ENABLED:-0}" \
@@ -73,6 +84,8 @@ cmake -G "${CMAKE_GENERATOR:-Ninja}" \
       -DCMAKE_INSTALL_PREFIX="$VT_BUILD/install" \
       -Dvt_ci_build="${VT_CI_BUILD:-0}" \
       -DCMAKE_CXX_FLAGS="${extra_flags:-}" \
+      -DCMAKE_CXX_COMPILER_LAUNCHER="${compiler_launcher}" \
+      -DCMAKE_CXX_LINKER_LAUNCHER="${compiler_launcher}" \
       -Dvt_tests_num_nodes=2 \
       "$VT"
 
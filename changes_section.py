@@ -0,0 +1,102 @@
+"""
+"What changed since last run" section of the build stats page (see build_snapshot.py)
+"""
+
+from build_report_parser import (
+    FUNCTION_SETS,
+    FUNCTIONS,
+    HEADERS,
+    TEMPLATE_SETS,
+    TEMPLATES,
+)
+from build_snapshot import (
+    NEW,
+    REMOVED,
+    diff_snapshots,
+    rank_entries,
+    read_previous_snapshot,
+    write_snapshot,
+)
+from wiki_common import OUTPUT_DIR, RUN_NUM, strip_relative_path
+
+SNAPSHOT_DIR = f"{OUTPUT_DIR}/snapshots"
+NUM_DIFF_RESULTS = 10
+
+SECTION_KINDS = {
+    TEMPLATES: "template",
+    TEMPLATE_SETS: "template set",
+    FUNCTIONS: "function",
+    FUNCTION_SETS: "function set",
+    HEADERS: "header",
+}
+
+
+def format_change(change, percent):
+    return f"{change:+.0f} ({percent:+.0f}%)"
+
+
+def get_diff_name(entry):
+    name = entry.name
+    if entry.section == HEADERS:
+        name = strip_relative_path(name)
+
+    # Escape '|' to not break markdown table
+    return name.replace("|", r"\|")
+
+
+def generate_movers_table(entries):
+    table = (
+        "| Kind | Name | Total before (ms) | Total now (ms) | Total change (ms) "
+        "| Avg before (ms) | Avg now (ms) | Avg change (ms) |\n"
+        "|---|:---:|---|---|---|---|---|---|\n"
+    )
+    for entry in entries[:NUM_DIFF_RESULTS]:
+        table += (
+            f"| {SECTION_KINDS[entry.section]} | `{get_diff_name(entry)}` "
+            f"| {entry.old_total_ms} | {entry.new_total_ms} "
+            f"| **{format_change(entry.total_change_ms, entry.total_change_percent)}** "
+            f"| {entry.old_avg_ms:.0f} | {entry.new_avg_ms:.0f} "
+            f"| **{format_change(entry.avg_change_ms, entry.avg_change_percent)}** |\n"
+        )
+
+    return table
+
+
+def generate_entries_table(entries, get_times):
+    table = "| Kind | Name | Total (ms) | Avg (ms) |\n|---|:---:|---|---|\n"
+    for entry in entries[:NUM_DIFF_RESULTS]:
+        total_ms, avg_ms = get_times(entry)
+        table += (
+            f"| {SECTION_KINDS[entry.section]} | `{get_diff_name(entry)}` "
+            f"| **{total_ms}** | {avg_ms:.0f} |\n"
+        )
+
+    return table
+
+
+def generate_changes_section(snapshot):
+    """Store the snapshot of this run and compare it with the previous one"""
+
+    previous_run, previous = read_previous_snapshot(SNAPSHOT_DIR, RUN_NUM)
+    write_snapshot(snapshot, SNAPSHOT_DIR, RUN_NUM)
+
+    if previous is None:
+        return "There's no snapshot of a previous run to compare with\n"
+
+    entries = diff_snapshots(previous, snapshot)
+    new_entries = rank_entries(entries, "new_total_ms", NEW)
+    removed_entries = rank_entries(entries, "old_total_ms", REMOVED)
+
+    return (
+        f"Templates, functions and headers compared with run {previous_run}. New and "
+        "removed entries may also have just crossed the limits of the report.\n"
+        f"- New: **{len(new_entries)}**, removed: **{len(removed_entries)}**\n\n"
+        "## Biggest movers (total time)\n"
+        f"{generate_movers_table(rank_entries(entries, 'total_change_ms'))}"
+        "## Biggest movers (relative average time)\n"
+        f"{generate_movers_table(rank_entries(entries, 'avg_change_percent'))}"
+        "## Newcomers\n"
+        f"{generate_entries_table(new_entries, lambda e: (e.new_total_ms, e.new_avg_ms))}"
+        "## Removed\n"
+        f"{generate_entries_table(removed_entries, lambda e: (e.old_total_ms, e.old_avg_ms))}"
+    )
@@ -0,0 +1,94 @@
+"""
+Analysis of the compiler memory usage recorded by compile_monitor.py
+
+Shows which translation units need the most memory, how much memory the jobs
+running at the same time needed over the course of the build, and the maximal
+parallelism (-j) which fits into a RAM budget.
+"""
+
+import json
+import os
+from typing import NamedTuple
+import numpy as np
+from config import get_config
+
+COMPILE_MONITOR_FILENAME = "compile_monitor.jsonl"
+MEMORY_BUDGET_GB = get_config().build_memory_budget_gb
+
+
+class CompileJob(NamedTuple):
+    """Peak memory and duration of a compiler or linker invocation"""
+
+    target: str
+    kind: str
+    start: float
+    duration_s: float
+    max_rss_kb: int
+    exit_code: int
+
+    @property
+    def end(self):
+        return self.start + self.duration_s
+
+    @property
+    def max_rss_gb(self):
+        return self.max_rss_kb / 1024**2
+
+
+def read_compile_jobs(build_folder):
+    """
+    Read the records of all jobs written to the build folder by compile_monitor.py,
+    ordered by start time. Returns None when the monitor wasn't enabled.
+    """
+
+    file_name = os.path.join(build_folder, COMPILE_MONITOR_FILENAME)
+    if not os.path.exists(file_name):
+        print(f"{file_name} not found, skipping compiler memory report")
+        return None
+
+    jobs = []
+    with open(file_name, encoding="utf-8") as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            jobs.append(CompileJob(**record))
+
+    print(f"Read {len(jobs)} compiler jobs from {file_name}")
+
+    return sorted(jobs, key=lambda job: job.start) or None
+
+
+def get_memory_profile(jobs):
+    """
+    Return the times (seconds since the first job started) at which the set of running
+    jobs changes, and the sum of the peak memory (in GB) of those jobs. As every job is
+    counted with its peak for its whole duration, this is an upper bound of real usage.
+    """
+
+    first_start = jobs[0].start
+    starts = [job.start - first_start for job in jobs]
+    ends = [job.end - first_start for job in jobs]
+    times = np.array(starts + ends)
+    memory = np.array([job.max_rss_gb for job in jobs] * 2)
+    memory[len(jobs) :] *= -1
+
+    unique_times, inverse = np.unique(times, return_inverse=True)
+    changes = np.zeros(len(unique_times))
+    np.add.at(changes, inverse, memory)
+
+    # Remove the rounding noise of the cumulative sum
+    return unique_times, np.maximum(np.cumsum(changes), 0)
+
+
+def recommend_jobs(jobs, budget_gb=MEMORY_BUDGET_GB):
+    """
+    Return the largest number of parallel jobs for which even the heaviest jobs
+    running at the same time fit into the budget (at least 1)
+    """
+
+    peaks = np.sort([job.max_rss_gb for job in jobs])[::-1]
+    fitting = np.cumsum(peaks) <= budget_gb
+
+    return max(int(fitting.sum()), 1)
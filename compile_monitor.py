@@ -0,0 +1,86 @@
+"""
+Compiler launcher which records peak memory and duration of every compile and link job
+
+build_vt.sh sets it as CMAKE_CXX_COMPILER_LAUNCHER and CMAKE_CXX_LINKER_LAUNCHER when
+VT_COMPILE_MONITOR_ENABLED=1, so it's invoked as `compile_monitor.py <compiler> <args>`.
+The compiler runs as a child process and its resource usage (including its own child
+processes, e.g. gcc's cc1plus) is collected with wait4. Every job appends one JSON line
+to the file given by VT_COMPILE_MONITOR_LOG.
+
+It runs for every job of the build, so it only depends on the standard library.
+The log is analyzed by compile_memory.py.
+"""
+
+import json
+import os
+import sys
+import time
+
+COMPILE_MONITOR_LOG = os.getenv("VT_COMPILE_MONITOR_LOG", "compile_monitor.jsonl")
+
+# Same job kinds as in ninja_log.py
+COMPILE = "compile"
+LINK = "link"
+
+
+def get_target(args):
+    """Output file of the compiler invocation, or the last argument when there's no -o"""
+
+    for index, arg in enumerate(args):
+        if arg == "-o" and index + 1 < len(args):
+            return args[index + 1]
+        if arg.startswith("-o") and len(arg) > 2:
+            return arg[2:]
+
+    return args[-1] if args else ""
+
+
+def append_record(file_name, record):
+    # A single write to a file opened with O_APPEND keeps the lines of parallel jobs intact
+    line = (json.dumps(record) + "\n").encode("utf-8")
+    descriptor = os.open(file_name, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(descriptor, line)
+    finally:
+        os.close(descriptor)
+
+
+def run_compiler(command, log_file=COMPILE_MONITOR_LOG):
+    """Run the compiler command, record its usage and return its exit code"""
+
+    start = time.time()
+    pid = os.posix_spawnp(command[0], command, os.environ)
+    _, status, rusage = os.wait4(pid, 0)
+    duration = time.time() - start
+    exit_code = os.waitstatus_to_exitcode(status)
+    if exit_code < 0:
+        # Killed by a signal (e.g. by the OOM killer), report it the way shells do
+        exit_code = 128 - exit_code
+
+    args = command[1:]
+    try:
+        append_record(
+            log_file,
+            {
+                "target": get_target(args),
+                "kind": COMPILE if "-c" in args else LINK,
+                "start": round(start, 3),
+                "duration_s": round(duration, 3),
+                # Kilobytes on Linux
+                "max_rss_kb": rusage.ru_maxrss,
+                "exit_code": exit_code,
+            },
+        )
+    except OSError as error:
+        # Monitoring must never break the build
+        print(f"compile_monitor: can't write {log_file}: {error}", file=sys.stderr)
+
+    return exit_code
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: compile_monitor.py <compiler> [args...]", file=sys.stderr)
+        sys.exit(2)
+
+    sys.exit(run_compiler(sys.argv[1:]))
@@ -0,0 +1,146 @@
+"""
+Settings shared by the stages of the pipeline
+
+The action's inputs (INPUT_*) and the environment of the run are parsed once per
+process by get_config(), the modules read them from the returned Config.
+"""
+
+import os
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+
+class Config(NamedTuple):
+    """Settings of the run, parsed from the environment"""
+
+    # Wiki directory of the build stats, relative to the wiki's root
+    output_dir: str
+    build_times_filename: str
+    build_result_filename: str
+    graph_filename: str
+    long_term_graph_filename: str
+    efficiency_graph_filename: str
+    badge_filename: str
+    badge_title: str
+    badge_logo: Optional[str]
+    title: str
+    x_label: str
+    y_label: str
+    graph_width: float
+    graph_height: float
+    num_last_builds: int
+    # Worker processes for rendering the perf graphs and heaptrack profiles
+    num_graph_jobs: int
+    build_folder: str
+    matrix_build_folder: str
+    repo_name: str
+    run_num: int
+    commit: str
+    # Build report and history
+    build_analyzer: str
+    history_backend: str
+    history_db_filename: str
+    full_resolution_runs: int
+    daily_rollup_days: int
+    num_snapshots: int
+    template_collapse_depth: int
+    template_namespace_depth: int
+    directory_depth: int
+    # Build time regressions
+    regression_window: int
+    regression_test: str
+    regression_threshold: float
+    regression_min_change: float
+    fail_on_regression: bool
+    # Build resources and incremental builds
+    build_cores: int
+    build_memory_budget_gb: float
+    build_matrix: str
+    matrix_job_memory_gb: float
+    num_incremental_headers: int
+    incremental_budget_s: float
+    # Perf tests
+    perf_repetitions: int
+    perf_cpus: str
+    perf_baseline_runs: int
+    perf_alpha: float
+    perf_min_change: float
+    fail_on_perf_regression: bool
+    max_rank_bars: int
+    memory_warmup: float
+    leak_threshold_kib: float
+    max_plot_points: int
+    heaptrack_top_sites: int
+
+
+def get_flag(name):
+    return os.getenv(name, "false").lower() == "true"
+
+
+@lru_cache(maxsize=None)
+def get_config() -> Config:
+    build_folder = os.getenv("VT_BUILD_FOLDER", "/build/vt")
+
+    return Config(
+        output_dir=os.getenv("INPUT_BUILD_STATS_OUTPUT") or ".",
+        build_times_filename=os.getenv("INPUT_BUILD_TIMES_FILENAME", "build_times.csv"),
+        build_result_filename=os.getenv(
+            "INPUT_BUILD_RESULT_FILENAME", "build_result.txt"
+        ),
+        graph_filename=os.getenv("INPUT_GRAPH_FILENAME", "graph.png"),
+        long_term_graph_filename=os.getenv(
+            "INPUT_LONG_TERM_GRAPH_FILENAME", "long_term_graph.png"
+        ),
+        efficiency_graph_filename=os.getenv(
+            "INPUT_EFFICIENCY_GRAPH_FILENAME", "efficiency_graph.png"
+        ),
+        badge_filename=os.getenv("INPUT_BADGE_FILENAME", "build_status_badge.svg"),
+        badge_title=os.getenv("INPUT_BADGE_TITLE", "build time"),
+        badge_logo=os.getenv("INPUT_BADGE_LOGO") or None,
+        title=os.getenv("INPUT_TITLE", ""),
+        x_label=os.getenv("INPUT_X_LABEL", "Run number"),
+        y_label=os.getenv("INPUT_Y_LABEL", "Build time (min)"),
+        graph_width=float(os.getenv("INPUT_GRAPH_WIDTH", "20")),
+        graph_height=float(os.getenv("INPUT_GRAPH_HEIGHT", "20")),
+        num_last_builds=int(os.getenv("INPUT_NUM_LAST_BUILD", "25")),
+        num_graph_jobs=int(os.getenv("INPUT_PERF_GRAPH_JOBS") or os.cpu_count() or 1),
+        build_folder=build_folder,
+        matrix_build_folder=os.getenv(
+            "VT_MATRIX_BUILD_FOLDER",
+            os.path.join(os.path.dirname(build_folder), "matrix"),
+        ),
+        repo_name=os.getenv("GITHUB_REPOSITORY", ""),
+        run_num=int(os.getenv("GITHUB_RUN_NUMBER", "0")),
+        commit=os.getenv("GITHUB_SHA", ""),
+        build_analyzer=os.getenv("INPUT_BUILD_ANALYZER", "ClangBuildAnalyzer"),
+        history_backend=os.getenv("INPUT_HISTORY_BACKEND", "csv"),
+        history_db_filename=os.getenv("INPUT_HISTORY_DB_FILENAME", "history.db"),
+        full_resolution_runs=int(os.getenv("INPUT_FULL_RESOLUTION_RUNS", "200")),
+        daily_rollup_days=int(os.getenv("INPUT_DAILY_ROLLUP_DAYS", "90")),
+        num_snapshots=int(os.getenv("INPUT_NUM_SNAPSHOTS", "30")),
+        template_collapse_depth=int(os.getenv("INPUT_TEMPLATE_COLLAPSE_DEPTH", "0")),
+        template_namespace_depth=int(os.getenv("INPUT_TEMPLATE_NAMESPACE_DEPTH", "2")),
+        directory_depth=int(os.getenv("INPUT_DIRECTORY_DEPTH", "4")),
+        regression_window=int(os.getenv("INPUT_REGRESSION_WINDOW", "10")),
+        regression_test=os.getenv("INPUT_REGRESSION_TEST", "mad"),
+        regression_threshold=float(os.getenv("INPUT_REGRESSION_THRESHOLD", "3.5")),
+        regression_min_change=float(os.getenv("INPUT_REGRESSION_MIN_CHANGE", "2")),
+        fail_on_regression=get_flag("INPUT_FAIL_ON_REGRESSION"),
+        build_cores=int(os.getenv("INPUT_BUILD_CORES") or os.cpu_count() or 1),
+        build_memory_budget_gb=float(os.getenv("INPUT_BUILD_MEMORY_BUDGET", "14")),
+        build_matrix=os.getenv("INPUT_BUILD_MATRIX", ""),
+        matrix_job_memory_gb=float(os.getenv("INPUT_MATRIX_JOB_MEMORY", "2")),
+        num_incremental_headers=int(os.getenv("INPUT_INCREMENTAL_HEADERS", "10")),
+        incremental_budget_s=float(os.getenv("INPUT_INCREMENTAL_BUDGET", "1200")),
+        perf_repetitions=int(os.getenv("INPUT_PERF_REPETITIONS", "1")),
+        perf_cpus=os.getenv("INPUT_PERF_CPUS", ""),
+        perf_baseline_runs=int(os.getenv("INPUT_PERF_BASELINE_RUNS", "10")),
+        perf_alpha=float(os.getenv("INPUT_PERF_ALPHA", "0.01")),
+        perf_min_change=float(os.getenv("INPUT_PERF_MIN_CHANGE", "5")),
+        fail_on_perf_regression=get_flag("INPUT_FAIL_ON_PERF_REGRESSION"),
+        max_rank_bars=int(os.getenv("INPUT_MAX_RANK_BARS", "8")),
+        memory_warmup=float(os.getenv("INPUT_MEMORY_WARMUP", "0.2")),
+        leak_threshold_kib=float(os.getenv("INPUT_LEAK_THRESHOLD", "1")),
+        max_plot_points=int(os.getenv("INPUT_MAX_PLOT_POINTS", "2000")),
+        heaptrack_top_sites=int(os.getenv("INPUT_HEAPTRACK_TOP_SITES", "15")),
+    )
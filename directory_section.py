@@ -0,0 +1,124 @@
+"""
+Compile Time by Directory section of the build stats page (see directory_times.py)
+"""
+
+from datetime import date
+import matplotlib.pyplot as plt
+import pandas as pd
+from directory_times import (
+    DIRECTORY_DEPTH,
+    append_history,
+    get_directory_times,
+    read_history,
+)
+from history_store import open_history_store
+from treemap import save_treemap
+from wiki_common import (
+    BUILD_ANALYZER,
+    CONFIG,
+    NUM_TOP_RESULTS,
+    OUTPUT_DIR,
+    REPO_NAME,
+    RUN_NUM,
+    create_image_hyperlink,
+)
+
+DIRECTORY_TREEMAP_GRAPH = f"{OUTPUT_DIR}/directory_treemap.png"
+DIRECTORY_HISTORY_GRAPH = f"{OUTPUT_DIR}/directory_history.png"
+NUM_DIRECTORY_GRAPH = 10
+
+
+def generate_directory_treemap(directory_times):
+    """Treemap of the directories' compile time, colored by their top two components"""
+
+    directory_times = [
+        time for time in directory_times[:NUM_TOP_RESULTS] if time.total_ms > 0
+    ]
+    save_treemap(
+        DIRECTORY_TREEMAP_GRAPH,
+        "Compile time (parse + codegen) by source directory",
+        [time.total_ms for time in directory_times],
+        [f"{time.directory} ({time.total_ms / 1000:.0f}s)" for time in directory_times],
+        ["/".join(time.directory.split("/")[:2]) for time in directory_times],
+    )
+
+
+def generate_directory_history_graph(history, directories):
+    """Compile time of the directories over the last runs"""
+
+    _, axis = plt.subplots(figsize=(19, 10))
+    for directory in directories:
+        if directory in history:
+            axis.plot(history.index, history[directory], marker="o", label=directory)
+
+    axis.set_title("Compile time by source directory")
+    axis.set_xlabel("Run number")
+    axis.set_ylabel("Parse + codegen time (s)")
+    axis.grid(True)
+    axis.legend(fontsize=12)
+
+    plt.tight_layout()
+    plt.savefig(DIRECTORY_HISTORY_GRAPH)
+    plt.close()
+
+
+def generate_directory_section(directory_totals):
+    """Compile time by source directory, compared with the previous run"""
+
+    directory_times = get_directory_times(directory_totals)
+    if not directory_times:
+        return "There are no per-file compile times in the build report\n"
+
+    store = open_history_store(OUTPUT_DIR)
+    num_runs = CONFIG.num_last_builds
+    previous = read_history(store, num_runs)
+    previous = previous[previous.index < RUN_NUM]
+
+    append_history(
+        store,
+        directory_times,
+        RUN_NUM,
+        date.today().strftime("%d %B %Y"),
+        CONFIG.commit,
+    )
+    history = read_history(store, num_runs)
+
+    top_directories = [time.directory for time in directory_times]
+    generate_directory_treemap(directory_times)
+    generate_directory_history_graph(history, top_directories[:NUM_DIRECTORY_GRAPH])
+
+    table = (
+        "| Label | Directory | Total (s) | Parse (s) | Codegen (s) | Files "
+        "| Change since previous run (s) |\n"
+        "|---|:---:|---|---|---|---|---|\n"
+    )
+    for idx, directory_time in enumerate(directory_times[:NUM_TOP_RESULTS]):
+        total_s = directory_time.total_ms / 1000
+        if previous.empty or pd.isna(previous.iloc[-1].get(directory_time.directory)):
+            change = "new"
+        else:
+            change = f"{total_s - previous.iloc[-1][directory_time.directory]:+.1f}"
+
+        table += (
+            f"| **{idx}** | `{directory_time.directory}` | **{total_s:.1f}** "
+            f"| {directory_time.parse_ms / 1000:.1f} "
+            f"| {directory_time.codegen_ms / 1000:.1f} | {directory_time.files} "
+            f"| {change} |\n"
+        )
+
+    source_note = (
+        "-ftime-trace"
+        if BUILD_ANALYZER == "time-trace"
+        else "the file sections of ClangBuildAnalyzer's report"
+    )
+    wiki_url = f"https://github.com/{REPO_NAME}/wiki"
+
+    return (
+        f"Parse and codegen times of the translation units from {source_note}, summed "
+        f"up by the first {DIRECTORY_DEPTH} components of their source directory. "
+        "Files compiled in less than the report's minimum time are not included.\n"
+        "\n"
+        f"{create_image_hyperlink(f'{wiki_url}/{DIRECTORY_TREEMAP_GRAPH}')}\n"
+        f"{create_image_hyperlink(f'{wiki_url}/{DIRECTORY_HISTORY_GRAPH}')}\n"
+        f"{table}"
+    )
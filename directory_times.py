@@ -0,0 +1,153 @@
+"""
+Compile time of the translation units rolled up by their source directory
+
+The parse (frontend) and codegen (backend) times of every object file are mapped back
+to the directory of its source file and summed up, so it's visible which subsystem
+(e.g. src/vt/vrt/collection) costs the most to compile. The totals of each run are
+appended to the directory_times history table.
+
+Example input: src/CMakeFiles/vt.dir/vt/vrt/collection/manager.cc.o
+Source directory: src/vt/vrt/collection
+With depth=3: src/vt/vrt
+"""
+
+from typing import NamedTuple
+import pandas as pd
+from build_report_parser import FILE_CODEGEN, FILE_PARSE
+from config import get_config
+
+DIRECTORY_DEPTH = get_config().directory_depth
+
+DIRECTORY_TIMES_TABLE = "directory_times"
+HISTORY_COLUMNS = [
+    "run_num",
+    "date",
+    "commit",
+    "directory",
+    "parse_s",
+    "codegen_s",
+    "files",
+]
+
+CMAKE_FILES_DIR = "CMakeFiles"
+TARGET_DIR_SUFFIX = ".dir"
+
+
+class DirectoryTime(NamedTuple):
+    """Compile time of the translation units in a source directory"""
+
+    directory: str
+    parse_ms: int
+    codegen_ms: int
+    # Number of translation units in the directory
+    files: int
+
+    @property
+    def total_ms(self):
+        return self.parse_ms + self.codegen_ms
+
+
+def get_source_dir(object_name):
+    """
+    Directory of the source file of the object file. CMake puts the objects of target
+    in '<binary dir>/CMakeFiles/<target>.dir/<source path relative to the source dir>',
+    other paths are returned as they are.
+    """
+
+    components = [
+        component
+        for component in object_name.replace("\\", "/").split("/")
+        if component not in ("", ".", "..")
+    ]
+
+    for index, component in enumerate(components[:-1]):
+        if component == CMAKE_FILES_DIR and components[index + 1].endswith(
+            TARGET_DIR_SUFFIX
+        ):
+            components = components[:index] + components[index + 2 :]
+            break
+
+    return "/".join(components[:-1]) or "."
+
+
+def get_directory(object_name, depth=DIRECTORY_DEPTH):
+    """Source directory of the object file, truncated to the first depth components"""
+
+    return "/".join(get_source_dir(object_name).split("/")[:depth])
+
+
+def add_file_times(records, totals, depth=DIRECTORY_DEPTH):
+    """
+    Pass the records through, while adding the FileTime records to
+    totals {directory: {object name: [parse_ms, codegen_ms]}}
+    """
+
+    for record in records:
+        if record.section in (FILE_PARSE, FILE_CODEGEN):
+            times = totals.setdefault(get_directory(record.name, depth), {}).setdefault(
+                record.name, [0, 0]
+            )
+            times[0 if record.section == FILE_PARSE else 1] += record.time_ms
+
+        yield record
+
+
+def get_directory_times(totals):
+    """Return DirectoryTime of every directory, ordered by total time"""
+
+    return sorted(
+        (
+            DirectoryTime(
+                directory,
+                sum(times[0] for times in files.values()),
+                sum(times[1] for times in files.values()),
+                len(files),
+            )
+            for directory, files in totals.items()
+        ),
+        key=lambda directory_time: directory_time.total_ms,
+        reverse=True,
+    )
+
+
+def append_history(store, directory_times, run_num, run_date, commit):
+    """Append the directory totals of this run to the history table"""
+
+    if not directory_times:
+        return
+
+    store.append(
+        DIRECTORY_TIMES_TABLE,
+        pd.DataFrame(
+            [
+                [
+                    run_num,
+                    run_date,
+                    commit,
+                    directory_time.directory,
+                    directory_time.parse_ms / 1000,
+                    directory_time.codegen_ms / 1000,
+                    directory_time.files,
+                ]
+                for directory_time in directory_times
+            ],
+            columns=HISTORY_COLUMNS,
+        ),
+    )
+
+
+def read_history(store, num_runs):
+    """
+    Return the total compile time (in seconds) of the last num_runs runs as a frame
+    indexed by run number, with a column for every directory
+    """
+
+    if not store.exists(DIRECTORY_TIMES_TABLE):
+        return pd.DataFrame()
+
+    history = store.read_last_runs(DIRECTORY_TIMES_TABLE, num_runs)
+    history = history.assign(total_s=history["parse_s"] + history["codegen_s"])
+
+    return history.pivot_table(
+        index="run_num", columns="directory", values="total_s", aggfunc="sum"
+    )
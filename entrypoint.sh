@@ -20,20 +20,29 @@ if [ -z "${INPUT_GITHUB_PERSONAL_TOKEN}" ]; then
 fi
 
 export VT_BUILD_FOLDER="$GITHUB_WORKSPACE/build/vt"
+export VT_MATRIX_BUILD_FOLDER="$GITHUB_WORKSPACE/build/matrix"
+
+if [ "${INPUT_COMPILE_MONITOR:-false}" == "true" ]; then
+    export VT_COMPILE_MONITOR_ENABLED=1
+fi
 
 ########################
 ## CLONE DEPENDENCIES ##
 ########################
 
 git clone https://github.com/brendangregg/FlameGraph.git
-git clone https://github.com/aras-p/ClangBuildAnalyzer
 
-cd ClangBuildAnalyzer
-mkdir build && cd build
+# With 'time-trace' analyzer the -ftime-trace files are read directly by generate_wiki_pages.py
+if [ "${INPUT_BUILD_ANALYZER:-ClangBuildAnalyzer}" != "time-trace" ]; then
+    git clone https://github.com/aras-p/ClangBuildAnalyzer
 
-cmake .. && make
-chmod +x ClangBuildAnalyzer
-ClangBuildTool="$GITHUB_WORKSPACE/ClangBuildAnalyzer/build/ClangBuildAnalyzer"
+    cd ClangBuildAnalyzer
+    mkdir build && cd build
+
+    cmake .. && make
+    chmod +x ClangBuildAnalyzer
+    ClangBuildTool="$GITHUB_WORKSPACE/ClangBuildAnalyzer/build/ClangBuildAnalyzer"
+fi
 
 ##################
 ## BUILD VT LIB ##
@@ -44,23 +53,46 @@ export VT_TESTS_ARGUMENTS="--vt_perf_gen_file"
 
 # Build VT lib
 /build_vt.sh "$GITHUB_WORKSPACE" "$GITHUB_WORKSPACE/build" "-ftime-trace" vt
-vt_build_time=$(grep -oP 'real\s+\K\d+m\d+\.\d+s' "$VT_BUILD_FOLDER/build_time.txt")
+vt_build_time="$GITHUB_WORKSPACE/vt_build_time.txt"
+cp "$VT_BUILD_FOLDER/build_time.txt" "$vt_build_time"
 
 # Build tests and examples
 /build_vt.sh "$GITHUB_WORKSPACE" "$GITHUB_WORKSPACE/build" "-ftime-trace" all
-tests_and_examples_build=$(grep -oP 'real\s+\K\d+m\d+\.\d+s' "$VT_BUILD_FOLDER/build_time.txt")
+tests_and_examples_build="$GITHUB_WORKSPACE/tests_build_time.txt"
+cp "$VT_BUILD_FOLDER/build_time.txt" "$tests_and_examples_build"
+
+if [ "${INPUT_BUILD_ANALYZER:-ClangBuildAnalyzer}" != "time-trace" ]; then
+    cp /ClangBuildAnalyzer.ini .
+    $ClangBuildTool --all "$VT_BUILD_FOLDER" vt-build
+    $ClangBuildTool --analyze vt-build > build_result.txt
+fi
+
+########################
+## INCREMENTAL BUILDS ##
+########################
+
+if [ "${INPUT_INCREMENTAL_BENCH:-false}" == "true" ]; then
+    report_args=()
+    if [ "${INPUT_BUILD_ANALYZER:-ClangBuildAnalyzer}" != "time-trace" ]; then
+        report_args=(-r "$GITHUB_WORKSPACE/build_result.txt")
+    fi
+    python3 /incremental_bench.py -b "$VT_BUILD_FOLDER" -s "$GITHUB_WORKSPACE" "${report_args[@]}"
+fi
 
-cp /ClangBuildAnalyzer.ini .
-$ClangBuildTool --all "$VT_BUILD_FOLDER" vt-build
-$ClangBuildTool --analyze vt-build > build_result.txt
+##########################
+## BUILD CONFIGURATIONS ##
+##########################
+
+if [ -n "${INPUT_BUILD_MATRIX:-}" ]; then
+    python3 /build_matrix.py -s "$GITHUB_WORKSPACE" -b "$VT_BUILD_FOLDER" -m "$VT_MATRIX_BUILD_FOLDER"
+fi
 
 #######################
 ## PERFORMANCE TESTS ##
 #######################
 
-cd "$GITHUB_WORKSPACE/build/vt"
-ctest --output-on-failure --verbose -L perf_test
-cd -
+# Every test is run perf_repetitions times in random order and the results are merged
+python3 /perf_runner.py -b "$VT_BUILD_FOLDER" --seed "$GITHUB_RUN_NUMBER"
 
 ##########################
 ## GENERATE FLAMEGRAPHS ##
@@ -68,25 +100,7 @@ cd -
 
 # Running 'mpirun -n x heaptrack' will generate x number of separate files, one for each node/rank
 mpirun -n 2 heaptrack "$GITHUB_WORKSPACE/build/vt/examples/collection/jacobi2d_vt" 10 10 200
-jacobi_output_list=$(ls -- *heaptrack.jacobi2d_vt.*.gz)
-
-node_num=0
-for file in ${jacobi_output_list}
-do
-    file_name="flame$node_num"
-
-    # number of allocations
-    heaptrack_print -f "$file" -F "alloc_count_$file_name"
-    "$GITHUB_WORKSPACE/FlameGraph/flamegraph.pl" --title="jacobi2d_vt node:$node_num number of allocations"\
-    --width=1920 --colors mem --countname allocations < "alloc_count_$file_name" > "flame_heaptrack_jacobi_alloc_count_$node_num.svg"
-
-    # leaked
-    heaptrack_print -f "$file" -F "leaked_$file_name" --flamegraph-cost-type leaked
-    "$GITHUB_WORKSPACE/FlameGraph/flamegraph.pl" --title="jacobi2d_vt node:$node_num number of bytes leaked"\
-    --width=1920 --colors mem --countname bytes < "leaked_$file_name" > "flame_heaptrack_jacobi_leaked_$node_num.svg"
-
-    ((node_num=node_num+1))
-done
+# The profiles are processed in the wiki's perf_tests, next to the previous run's results
 
 #####################
 ## GENERATE GRAPHS ##
@@ -99,25 +113,29 @@ tmp_dir=$(mktemp -d -t ci-XXXXXXXXXX)
     git init
     git config user.name "$GITHUB_ACTOR"
     git config user.email "$GITHUB_ACTOR@users.noreply.github.com"
-    git pull "$WIKI_URL"
-
-    # Generate graph
-    python3 /generate_build_graph.py -vt "$vt_build_time" -te "$tests_and_examples_build" -r "$GITHUB_RUN_NUMBER"
+    # errexit doesn't apply in a subshell followed by ||, every failure has to exit on its own
+    git pull "$WIKI_URL" || exit 1
 
-    cd perf_tests
-    python3 /generate_perf_graph.py
-    cd -
+    if [ "${INPUT_BUILD_ANALYZER:-ClangBuildAnalyzer}" != "time-trace" ]; then
+        cp "$GITHUB_WORKSPACE/build_result.txt" "$INPUT_BUILD_STATS_OUTPUT" || exit 1
+    fi
 
-    cp "$GITHUB_WORKSPACE/build_result.txt" "$INPUT_BUILD_STATS_OUTPUT"
-    eval cp "$GITHUB_WORKSPACE/flame_heaptrack*" "./perf_tests/"
+    # Runs every stage in one process, the wiki pages are generated even if a stage failed.
+    # Exits with non-zero code on build time or perf test regression when
+    # fail_on_regression or fail_on_perf_regression is set
+    build_stats=0
+    python3 /build_stats.py all -vt "$vt_build_time" -te "$tests_and_examples_build" -r "$GITHUB_RUN_NUMBER" \
+        -f "$GITHUB_WORKSPACE/FlameGraph/flamegraph.pl" "$GITHUB_WORKSPACE"/heaptrack.jacobi2d_vt.* \
+        || build_stats=$?
 
-    python3 /generate_wiki_pages.py
+    git add . || exit 1
+    git commit -m "$INPUT_COMMIT_MESSAGE" || exit 1
+    git push --set-upstream "$WIKI_URL" master || exit 1
 
-    git add .
-    git commit -m "$INPUT_COMMIT_MESSAGE"
-    git push --set-upstream "$WIKI_URL" master
-) || exit 1
+    # Wiki is updated even if the build time or the perf tests regressed
+    exit "$build_stats"
+) || status=$?
 
 rm -rf "$tmp_dir"
 
-exit 0
+exit "${status:-0}"
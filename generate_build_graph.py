@@ -1,75 +1,172 @@
 import argparse
 from datetime import date
 import os
+import re
+import sys
 import matplotlib.pyplot as plt
-import requests
+import numpy as np
 import pandas as pd
-
-OUTPUT_DIR = os.getenv("INPUT_BUILD_STATS_OUTPUT")
+from badge import render_badge
+from build_regression import (
+    FAIL_ON_REGRESSION,
+    IMPROVED,
+    REGRESSED,
+    UNCHANGED,
+    detect_build_regressions,
+    write_verdicts,
+)
+from config import get_config
+from history_retention import apply_retention, read_long_term_history
+from history_store import BUILD_TIMES_TABLE, open_history_store
+from ninja_log import BUILD_CORES
+
+CONFIG = get_config()
+OUTPUT_DIR = CONFIG.output_dir
+LONG_TERM_GRAPH_FILENAME = CONFIG.long_term_graph_filename
+EFFICIENCY_GRAPH_FILENAME = CONFIG.efficiency_graph_filename
+REGRESSION_FILENAME = "build_regression.json"
+VERDICT_COLORS = {REGRESSED: "red", IMPROVED: "green", UNCHANGED: "black"}
+
+DURATION_RE = re.compile(r"^(?:(\d+)h)?(?:(\d+)m)?(\d+(?:[.,]\d*)?)s?$")
 
 
 def extract_build_time(in_time):
     """
-    Convert the duration from linux's time command format to seconds
+    Convert the duration from linux's time command format to seconds. Hours are
+    optional and both '.' and ',' (used by some locales) are accepted as decimal mark.
 
-    Example input: 07m44.068s
-    Output: 464
+    Example input: 07m44.068s (or 1h07m44,068s, 464.068)
+    Output: 464.068
     """
 
-    time_in_min = int(in_time[0 : in_time.index("m")])
-    time_in_seconds = int(in_time[in_time.index("m") + 1 : in_time.index(".")])
-    total_time_seconds = time_in_seconds + time_in_min * 60
+    match = DURATION_RE.match(in_time.strip())
+    if match is None:
+        raise ValueError(f"Unrecognized duration {in_time}")
 
-    print(
-        f"Build time is {in_time}\n\
-        Build time minutes {time_in_min} in seconds is {time_in_seconds}"
+    hours, minutes, seconds = match.groups()
+    total_time_seconds = sum(
+        [
+            int(hours or 0) * 3600,
+            int(minutes or 0) * 60,
+            float(seconds.replace(",", ".")),
+        ]
     )
 
-    return total_time_seconds
+    print(f"Build time is {in_time} ({total_time_seconds} seconds)")
+
+    return round(total_time_seconds, 3)
+
+
+def read_build_times(build_time):
+    """
+    Return real, user and sys time (in seconds) of the build. build_time is either the
+    output of bash's time command (the last real/user/sys lines are used) or the real
+    time alone, in which case user and sys times are unknown.
+
+    Example input:
+    real    7m44.068s
+    user    27m13.502s
+    sys     1m2.121s
+
+    Output: {'real': 464.068, 'user': 1633.502, 'sys': 62.121}
+    """
+
+    if not os.path.isfile(build_time):
+        return {"real": extract_build_time(build_time), "user": np.nan, "sys": np.nan}
+
+    times = {}
+    with open(build_time, encoding="utf-8", errors="replace") as file:
+        for line in file:
+            fields = line.split()
+            if len(fields) == 2 and fields[0] in ("real", "user", "sys"):
+                times[fields[0]] = extract_build_time(fields[1])
+
+    if "real" not in times:
+        raise ValueError(f"No build time found in {build_time}")
+
+    return {
+        "real": times["real"],
+        "user": times.get("user", np.nan),
+        "sys": times.get("sys", np.nan),
+    }
 
 
-def prepare_data():
-    """Parse the input data, read CSV file and append the new results"""
+def get_efficiency(real, user, system, cores=BUILD_CORES):
+    """Fraction of the available CPU time used by the build, (user + sys) / real / cores"""
+    return (user + system) / real / cores
 
-    parser = argparse.ArgumentParser()
-    parser.add_argument("-vt", "--vt_time", help="VT lib build time", required=True)
+
+def open_build_times_store():
+    return open_history_store(
+        OUTPUT_DIR, {BUILD_TIMES_TABLE: CONFIG.build_times_filename}
+    )
+
+
+def add_arguments(parser):
     parser.add_argument(
-        "-te", "--tests_examples_time", help="Tests&Examples build time", required=True
+        "-vt",
+        "--vt_time",
+        help="VT lib build time, or file with the output of time command",
+        required=True,
     )
-    parser.add_argument("-r", "--run_num", help="Run number", required=True)
+    parser.add_argument(
+        "-te",
+        "--tests_examples_time",
+        help="Tests&Examples build time, or file with the output of time command",
+        required=True,
+    )
+    parser.add_argument("-r", "--run_num", help="Run number", type=int, required=True)
 
-    vt_build_time = parser.parse_args().vt_time
-    tests_and_examples_build_time = parser.parse_args().tests_examples_time
-    new_run_num = int(parser.parse_args().run_num)
-    new_date = date.today().strftime("%d %B %Y")
 
-    commit_id = os.getenv("GITHUB_SHA")
+def prepare_data(vt_build_time, tests_and_examples_build_time, new_run_num):
+    """Read the build times, append the new results to the history and return the last ones"""
 
-    vt_total_time_seconds = extract_build_time(vt_build_time)
-    tests_total_time_seconds = extract_build_time(tests_and_examples_build_time)
+    new_date = date.today().strftime("%d %B %Y")
 
-    file_name = os.getenv("INPUT_BUILD_TIMES_FILENAME")
-    previous_builds_filename = f"{OUTPUT_DIR}/{file_name}"
+    vt_times = read_build_times(vt_build_time)
+    tests_times = read_build_times(tests_and_examples_build_time)
 
-    data_frame = pd.read_csv(previous_builds_filename)
-    last_builds = data_frame.tail(int(os.getenv("INPUT_NUM_LAST_BUILD")) - 1)
-    updated = pd.concat(
-        [
-            last_builds,
-            pd.DataFrame(
+    store = open_build_times_store()
+    store.append(
+        BUILD_TIMES_TABLE,
+        pd.DataFrame(
+            [
                 [
-                    [
-                        vt_total_time_seconds,
-                        tests_total_time_seconds,
-                        new_run_num,
-                        new_date,
-                        commit_id,
-                    ]
-                ],
-                columns=["vt", "tests", "run_num", "date", "commit"],
-            ),
-        ]
+                    vt_times["real"],
+                    tests_times["real"],
+                    new_run_num,
+                    new_date,
+                    CONFIG.commit,
+                    vt_times["user"],
+                    vt_times["sys"],
+                    tests_times["user"],
+                    tests_times["sys"],
+                    BUILD_CORES,
+                    get_efficiency(
+                        vt_times["real"] + tests_times["real"],
+                        vt_times["user"] + tests_times["user"],
+                        vt_times["sys"] + tests_times["sys"],
+                    ),
+                ]
+            ],
+            columns=[
+                "vt",
+                "tests",
+                "run_num",
+                "date",
+                "commit",
+                "vt_user",
+                "vt_sys",
+                "tests_user",
+                "tests_sys",
+                "cores",
+                "efficiency",
+            ],
+        ),
     )
+    apply_retention(store)
+
+    updated = store.read_tail(BUILD_TIMES_TABLE, CONFIG.num_last_builds)
 
     # Data to be plotted
     vt_timings = updated["vt"].tolist()
@@ -83,8 +180,6 @@ def prepare_data():
     print(f"run nums = {run_nums}")
     print(f"commits = {commits}")
 
-    updated.to_csv(previous_builds_filename, index=False)
-
     return vt_timings, tests_timings, run_nums, dates
 
 
@@ -93,20 +188,23 @@ def set_common_axis_data(iterable_axis):
         axis.xaxis.get_major_locator().set_params(integer=True)
         axis.legend()
         axis.grid(True)
-        axis.set_ylabel(os.getenv("INPUT_Y_LABEL"))
+        axis.set_ylabel(CONFIG.y_label)
 
 
-def annotate(axis, x_list, y_list):
+def annotate(axis, x_list, y_list, verdict):
     """Annotate build time graph with percentage change between
-    current build time and the previous one."""
+    current build time and its baseline, coloured by the regression verdict."""
+
+    if np.isnan(verdict.magnitude_percent):
+        print(f"Not enough builds to annotate {verdict.series} build time")
+        return
 
     avg_y = sum(y_list) / len(y_list)
 
-    previous_value = y_list[-2]
     current_value = y_list[-1]
 
-    percentage_diff = round(((current_value - previous_value) / previous_value) * 100.0)
-    color = "red" if percentage_diff > 0 else "green"
+    percentage_diff = round(verdict.magnitude_percent)
+    color = VERDICT_COLORS[verdict.status]
     x_pos = x_list[-1] + (x_list[-1] / 100.0)
 
     y_offset = avg_y / 100.0
@@ -115,16 +213,16 @@ def annotate(axis, x_list, y_list):
     else:
         y_pos = current_value + y_offset
 
-    text = f"+{percentage_diff}%" if color == "red" else f"{percentage_diff}%"
+    text = f"+{percentage_diff}%" if percentage_diff > 0 else f"{percentage_diff}%"
     print(
-        f"Previous value = {previous_value}, Current value = "
+        f"Baseline value = {verdict.baseline}, Current value = "
         f"{current_value}, Percentage diff = {percentage_diff},"
-        f"xy={x_pos}, {y_pos}, Color = {color}"
+        f"xy={x_pos}, {y_pos}, Verdict = {verdict.status}"
     )
     axis.annotate(text, xy=(x_pos, y_pos), color=color, weight="bold")
 
 
-def generate_graph(vt_times, tests_times, run_nums, dates):
+def generate_graph(vt_times, tests_times, run_nums, dates, verdicts):
     medium_size = 25
     big_size = 35
 
@@ -135,8 +233,8 @@ def generate_graph(vt_times, tests_times, run_nums, dates):
     plt.rc("legend", fontsize=medium_size)
     plt.rc("figure", titlesize=big_size)
 
-    graph_width = float(os.getenv("INPUT_GRAPH_WIDTH"))
-    graph_height = float(os.getenv("INPUT_GRAPH_HEIGHT"))
+    graph_width = CONFIG.graph_width
+    graph_height = CONFIG.graph_height
 
     # Times in CSV are stored in seconds, transform them to minutes for graph
     vt_timings = [x / 60 for x in vt_times]
@@ -148,8 +246,8 @@ def generate_graph(vt_times, tests_times, run_nums, dates):
         figsize=(graph_width, graph_height), nrows=3, ncols=1
     )
 
-    ax_1.set_title(f"{os.getenv('INPUT_TITLE')} ({dates[0]} - {dates[-1]})")
-    plt.xlabel(os.getenv("INPUT_X_LABEL"))
+    ax_1.set_title(f"{CONFIG.title} ({dates[0]} - {dates[-1]})")
+    plt.xlabel(CONFIG.x_label)
 
     ax_1.plot(
         run_nums, total_timings, color="b", marker="o", label="total", linewidth=4
@@ -164,41 +262,168 @@ def generate_graph(vt_times, tests_times, run_nums, dates):
         linewidth=4,
     )
 
-    annotate(ax_1, run_nums, total_timings)
-    annotate(ax_2, run_nums, vt_timings)
-    annotate(ax_3, run_nums, tests_timings)
+    annotate(ax_1, run_nums, total_timings, verdicts["total"])
+    annotate(ax_2, run_nums, vt_timings, verdicts["vt"])
+    annotate(ax_3, run_nums, tests_timings, verdicts["tests"])
 
     set_common_axis_data([ax_1, ax_2, ax_3])
     plt.tight_layout()
 
-    plt.savefig(f"{OUTPUT_DIR}/{os.getenv('INPUT_GRAPH_FILENAME')}")
+    plt.savefig(f"{OUTPUT_DIR}/{CONFIG.graph_filename}")
 
 
-def generate_badge(vt_times, tests_times):
-    average_time = (sum(vt_times) + sum(tests_times)) / len(vt_times)
+def generate_long_term_graph():
+    """
+    Plot the whole build history from the daily and weekly rollups,
+    showing median build time and the p10-p90 band
+    """
 
-    build_time = vt_times[-1] + tests_times[-1]
-    badge_color = "brightgreen" if build_time <= average_time else "red"
-    title = os.getenv("INPUT_BADGE_TITLE").replace(" ", "%20")
+    rollups = read_long_term_history(open_build_times_store())
+    periods = pd.to_datetime(rollups["period"])
+
+    graph_width = CONFIG.graph_width
+    graph_height = CONFIG.graph_height
+
+    _, axes = plt.subplots(figsize=(graph_width, graph_height), nrows=3, ncols=1)
+    axes[0].set_title(
+        f"{CONFIG.title} ({rollups['period'].iloc[0]} - "
+        f"{rollups['period'].iloc[-1]})"
+    )
+
+    for axis, metric, color, label in zip(
+        axes,
+        ["total", "vt", "tests"],
+        ["b", "m", "c"],
+        ["total", "vt-lib", "tests and examples"],
+    ):
+        # Times are stored in seconds, transform them to minutes for graph
+        axis.fill_between(
+            periods,
+            rollups[f"{metric}_p10"] / 60,
+            rollups[f"{metric}_p90"] / 60,
+            color=color,
+            alpha=0.2,
+            label=f"{label} (p10-p90)",
+        )
+        axis.plot(
+            periods,
+            rollups[f"{metric}_median"] / 60,
+            color=color,
+            label=f"{label} (median)",
+            linewidth=4,
+        )
+        axis.legend()
+        axis.grid(True)
+        axis.set_ylabel(CONFIG.y_label)
+
+    plt.xlabel("Date")
+    plt.tight_layout()
+
+    plt.savefig(f"{OUTPUT_DIR}/{LONG_TERM_GRAPH_FILENAME}")
+
+
+def generate_efficiency_graph():
+    """Plot CPU utilisation of the last builds, (user + sys) / real / cores"""
+
+    history = open_build_times_store().read_tail(
+        BUILD_TIMES_TABLE, CONFIG.num_last_builds
+    )
+
+    graph_width = CONFIG.graph_width
+    graph_height = CONFIG.graph_height / 2
+
+    _, axis = plt.subplots(figsize=(graph_width, graph_height))
+    axis.set_title(
+        f"Parallel efficiency ({history['date'].iloc[0]} - {history['date'].iloc[-1]})"
+    )
+
+    # Older builds were recorded without CPU times, so they have no efficiency
+    for label, color, marker, part in (
+        ("vt-lib", "m", "s", "vt"),
+        ("tests and examples", "c", "d", "tests"),
+    ):
+        efficiency = get_efficiency(
+            history[part],
+            history[f"{part}_user"],
+            history[f"{part}_sys"],
+            history["cores"],
+        )
+        axis.plot(
+            history["run_num"],
+            efficiency * 100,
+            color=color,
+            marker=marker,
+            label=label,
+            linewidth=4,
+        )
+
+    axis.plot(
+        history["run_num"],
+        history["efficiency"] * 100,
+        color="b",
+        marker="o",
+        label="total",
+        linewidth=4,
+    )
+
+    axis.xaxis.get_major_locator().set_params(integer=True)
+    axis.legend()
+    axis.grid(True)
+    axis.set_xlabel(CONFIG.x_label)
+    axis.set_ylabel("CPU utilisation (%)")
+    plt.tight_layout()
+
+    plt.savefig(f"{OUTPUT_DIR}/{EFFICIENCY_GRAPH_FILENAME}")
+
+
+def generate_badge(vt_times, tests_times, verdict):
+    build_time = round(vt_times[-1] + tests_times[-1])
+    badge_color = "red" if verdict.status == REGRESSED else "brightgreen"
+    title = CONFIG.badge_title
 
     print(
-        f"Last build time = {build_time}seconds average build = {average_time}seconds color = {badge_color}"
+        f"Last build time = {build_time}seconds baseline build = {verdict.baseline}seconds color = {badge_color}"
     )
-    url = f"https://img.shields.io/badge/{title}-{build_time//60}%20min%20{build_time%60}%20sec-{badge_color}.svg"
 
-    badge_logo = os.getenv("INPUT_BADGE_LOGO")
-    if len(badge_logo) > 0:
-        url += f"?logo={badge_logo}"
+    badge_file = f"{OUTPUT_DIR}/{CONFIG.badge_filename}"
+    with open(badge_file, "w", encoding="utf-8") as file:
+        file.write(
+            render_badge(
+                title,
+                f"{build_time//60} min {build_time%60} sec",
+                badge_color,
+                CONFIG.badge_logo,
+            )
+        )
 
-    print(f"Downloading badge with URL = {url}")
-    request = requests.get(url)
 
-    open(f"{OUTPUT_DIR}/{os.getenv('INPUT_BADGE_FILENAME')}", "wb").write(
-        request.content
+def main(args):
+    """Update the build times history and its graphs, return the exit code"""
+
+    [vt_times, tests_times, ret_runs, ret_dates] = prepare_data(
+        args.vt_time, args.tests_examples_time, args.run_num
+    )
+    verdicts = detect_build_regressions(
+        open_build_times_store().read(BUILD_TIMES_TABLE)
     )
+    write_verdicts(verdicts, f"{OUTPUT_DIR}/{REGRESSION_FILENAME}")
+
+    generate_graph(vt_times, tests_times, ret_runs, ret_dates, verdicts)
+    generate_long_term_graph()
+    generate_efficiency_graph()
+    generate_badge(vt_times, tests_times, verdicts["total"])
+
+    if FAIL_ON_REGRESSION and verdicts["total"].status == REGRESSED:
+        print(
+            f"Total build time regressed by {verdicts['total'].magnitude_percent:.1f}%"
+            f" since run {verdicts['total'].first_run}"
+        )
+        return 1
+
+    return 0
 
 
 if __name__ == "__main__":
-    [vt_times_in, tests_times_in, ret_runs_in, ret_dates_in] = prepare_data()
-    generate_graph(vt_times_in, tests_times_in, ret_runs_in, ret_dates_in)
-    generate_badge(vt_times_in, tests_times_in)
+    parser_in = argparse.ArgumentParser()
+    add_arguments(parser_in)
+    sys.exit(main(parser_in.parse_args()))
@@ -1,21 +1,129 @@
+"""
+Graphs of the performance test results
+
+The CSV files written by the perf tests (VT_BUILD_FOLDER/tests/*_time.csv and
+*_mem.csv) are discovered and rendered by their columns:
+- time files (name, mean, stdev and optionally node): a bar chart of the benchmarks,
+  grouped by node when there are more nodes, and a graph of the past runs
+- memory files (node, mem): memory usage of every node over the iterations
+Tests which need a tailored graph register their own renderer with
+@register_renderer, it replaces the generic rendering of the files it reads.
+The rendered sections are listed in perf_manifest.json, which the wiki page is
+generated from.
+"""
+
+import glob
 import os
+import sys
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import date
+from functools import partial
+from typing import Callable, NamedTuple
+import matplotlib
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
-import seaborn as sns
+from matplotlib.ticker import FuncFormatter
+from config import get_config
+from history_store import get_history_table, open_history_store
+from memory_stats import (
+    LEAK_THRESHOLD_KIB,
+    MEMORY_STATS_FILENAME,
+    analyze_memory,
+    append_history as append_memory_history,
+    lttb_indices,
+    read_history as read_memory_history,
+    write_stats,
+)
+from perf_manifest import write_manifest
+from rank_stats import (
+    MAX_RANK_BARS,
+    add_iterations,
+    aggregate_ranks,
+    append_imbalance_history,
+    get_num_ranks,
+    read_imbalance_history,
+)
+from transport_model import (
+    PING_PONG,
+    SEND_COST_FILES,
+    TRANSPORT_MODELS_FILENAME,
+    append_history as append_transport_history,
+    describe_models,
+    fit_alpha_beta,
+    fit_models,
+    format_fit,
+    get_payload_times,
+    get_ping_pong_size,
+    read_history as read_transport_history,
+    read_payload_times,
+    write_models,
+)
 
 GRAPH_WIDTH = 20
 GRAPH_HEIGHT = 10
-NUM_LAST_BUILDS = int(os.getenv("INPUT_NUM_LAST_BUILD", "30")) - 1
-VT_BUILD_FOLDER = os.getenv("VT_BUILD_FOLDER", "/build/vt")
-RUN_NUM = os.getenv("RUN_NUMBER")
+CONFIG = get_config()
+NUM_LAST_BUILDS = CONFIG.num_last_builds - 1
+VT_BUILD_FOLDER = CONFIG.build_folder
+RUN_NUM = CONFIG.run_num
 DATE = date.today().strftime("%d %B %Y")
-COMMIT_ID = os.getenv("GITHUB_SHA", "")
+COMMIT_ID = CONFIG.commit
+NUM_GRAPH_JOBS = CONFIG.num_graph_jobs
+
+RANK_IMBALANCE_GRAPH = "rank_imbalance_history.png"
+TRANSPORT_MODEL_GRAPH = "transport_model_history.png"
+MEMORY_STATS_GRAPH = "memory_stats_history.png"
+TIME = "time"
+MEMORY = "mem"
+TIME_COLUMNS = {"name", "mean", "stdev"}
+
+
+class PerfFile(NamedTuple):
+    """Results file written by a perf test"""
+
+    # File name without the extension, e.g. test_ping_pong_time
+    name: str
+    # Name of the test, e.g. ping_pong
+    test: str
+    kind: str
+    num_nodes: int
+
+
+class PerfRenderer(NamedTuple):
+    """Graph job that renders the images of some perf files"""
+
+    # Section of the wiki page
+    title: str
+    render: Callable
+    # CSV files (without the extension) read by the renderer
+    files: tuple
+    # Images written by the renderer
+    images: tuple
+
+
+# Hand-tuned renderers in the order of registration. They're started before the
+# generic ones, so that the slowest jobs are started first when rendering in parallel
+OVERRIDES = []
+
+
+def register_renderer(title, files, images):
+    """Register the decorated function as the renderer of the files"""
+
+    def decorator(render):
+        OVERRIDES.append(PerfRenderer(title, render, tuple(files), tuple(images)))
+        return render
+
+    return decorator
 
 
 def generate_bar_graph_for_single_value(test_file_name, title, hisotry_title):
     time_df = pd.read_csv(f"{VT_BUILD_FOLDER}/tests/{test_file_name}.csv")
 
+    # Merged by perf_runner.py from several repetitions
+    if "reps" in time_df and time_df["reps"].max() > 1:
+        title += f" (median of {time_df['reps'].max()} runs)"
+
     _, ax_1 = plt.subplots(figsize=(GRAPH_WIDTH, GRAPH_HEIGHT))
     x_pos = range(len(time_df))
 
@@ -42,17 +150,11 @@ def generate_bar_graph_for_single_value(test_file_name, title, hisotry_title):
     time_df["commit"] = COMMIT_ID
     time_df["run_num"] = RUN_NUM
 
-    file_path = f"{test_file_name}_history.csv"
-    if os.path.exists(file_path):
-        past_results = pd.read_csv(file_path)
-    else:
-        past_results = pd.DataFrame(columns=time_df.columns)
-        past_results.to_csv(file_path, index=False)
-
-    updated_results = pd.concat([past_results, time_df], ignore_index=True)
-    updated_results.to_csv(file_path, index=False)
+    history_table = get_history_table(test_file_name)
+    store = open_history_store(".")
+    store.append(history_table, time_df)
 
-    last_n_results = updated_results.tail(NUM_LAST_BUILDS)
+    last_n_results = store.read_tail(history_table, NUM_LAST_BUILDS)
 
     _, ax_1 = plt.subplots(figsize=(GRAPH_WIDTH, GRAPH_HEIGHT))
     x_pos = range(len(last_n_results))
@@ -78,87 +180,78 @@ def generate_bar_graph_for_single_value(test_file_name, title, hisotry_title):
     plt.savefig(f"{test_file_name}_history.png")
 
 
-def generate_send_cost_graph(name, subtitle, data_frame):
-    graph = sns.catplot(
-        x="name",
-        y="mean",
-        hue="Group",
-        data=data_frame,
-        kind="bar",
-        height=6,
-        aspect=2,
-        palette="muted",
-    )
+@register_renderer(
+    "send_cost",
+    list(SEND_COST_FILES.values()),
+    ["test_send_cost_time.png"],
+)
+def send_cost():
+    samples = read_payload_times(f"{VT_BUILD_FOLDER}/tests")
+    samples.pop(PING_PONG, None)
+    fits = fit_models(samples)
+
+    _, ax_1 = plt.subplots(figsize=(GRAPH_WIDTH, GRAPH_HEIGHT))
+    for group, payloads in samples.items():
+        points = ax_1.scatter(payloads["bytes"], payloads["time"], s=80, label=group)
+        sizes = np.geomspace(payloads["bytes"].min(), payloads["bytes"].max(), 100)
+        ax_1.plot(
+            sizes,
+            fits[group].predict(sizes),
+            color=points.get_facecolor()[0],
+            label=f"{group} fit: {format_fit(fits[group])}",
+        )
 
-    graph.set_xticklabels(rotation=45, horizontalalignment="right")
-    graph.set_axis_labels("Payload Size (num of 32bit elems)", "Mean Time (ms)")
-    graph.figure.suptitle(subtitle, fontsize=14, fontweight="bold")
-    graph.figure.subplots_adjust(top=0.9)
+    ax_1.set_xscale("log", base=2)
+    ax_1.set_yscale("log")
+    ax_1.set_title("Send cost: time = latency + payload / bandwidth")
+    ax_1.set_xlabel("Payload (bytes)")
+    ax_1.set_ylabel("Time (ms)")
+    ax_1.grid(True, which="both", ls="--", linewidth=0.5)
+    ax_1.legend()
     plt.tight_layout()
+    plt.savefig("test_send_cost_time.png")
 
-    graph.figure.savefig(f"test_send_cost_{name}_time.png")
 
+def plot_rank_band(ax_1, x_values, stats, label):
+    """Plot the median across the ranks with a band from their min to their max"""
 
-def send_cost():
-    mpi_df = pd.read_csv(f"{VT_BUILD_FOLDER}/tests/test_send_time.csv")
-    objgroup_df = pd.read_csv(f"{VT_BUILD_FOLDER}/tests/test_objgroup_send_time.csv")
-    collection_df = pd.read_csv(
-        f"{VT_BUILD_FOLDER}/tests/test_collection_send_time.csv"
+    ax_1.fill_between(
+        x_values, stats["min"], stats["max"], alpha=0.3, label=f"{label} (min-max)"
     )
+    ax_1.plot(x_values, stats["median"], linewidth=4, label=f"{label} (median)")
 
-    mpi_df["Group"] = "MPI"
-    objgroup_df["Group"] = "ObjGroup"
-    collection_df["Group"] = "Collection"
 
-    combined_df = pd.concat([mpi_df, objgroup_df, collection_df])
+def plot_bars_per_node(ax_1, time_df):
+    """
+    Plot the benchmarks as bars grouped by node, or as a band across the ranks when
+    there are more than MAX_RANK_BARS of them. Return the benchmark names.
+    """
 
-    # Convert the name to payload size, so we can group them
-    combined_df["name"] = combined_df["name"].apply(lambda x: int(x.split()[-1]))
+    means = time_df.pivot_table(index="name", columns="node", values="mean", sort=False)
+    num_iter = list(range(len(means)))
+    num_nodes = len(means.columns)
 
-    df_small = combined_df[combined_df["name"].isin([1, 64, 128])]
-    df_medium = combined_df[combined_df["name"].isin([2048, 16384, 32768])]
-    df_large = combined_df[combined_df["name"].isin([524288, 1048576, 2097152])]
+    ax_1.grid(True, which="both", ls="--", linewidth=0.5)
+    ax_1.set_xticks(num_iter)
 
-    sns.set_theme(style="whitegrid")
+    if num_nodes > MAX_RANK_BARS:
+        plot_rank_band(
+            ax_1, num_iter, aggregate_ranks(time_df, "name"), f"{num_nodes} ranks"
+        )
+        return means.index.tolist()
 
-    generate_send_cost_graph(
-        "small", "Execution time of sending small payloads", df_small
-    )
-    generate_send_cost_graph(
-        "medium", "Execution time of sending medium payloads", df_medium
-    )
-    generate_send_cost_graph(
-        "large", "Execution time of sending large payloads", df_large
+    stdevs = time_df.pivot_table(
+        index="name", columns="node", values="stdev", sort=False
     )
-
-
-def ping_pong():
-    time_df = pd.read_csv(f"{VT_BUILD_FOLDER}/tests/test_ping_pong_time.csv")
-
-    # Split data by nodes
-    num_nodes = time_df["node"].nunique()
-    time_data = [time_df[time_df["node"] == node] for node in range(num_nodes)]
-
-    # Create the plot
-    _, ax_1 = plt.subplots(figsize=(GRAPH_WIDTH, GRAPH_HEIGHT))
-    ax_1.set_title("Bytes time results")
-
-    num_iter = list(range(len(time_data[0])))
     bar_width = 1.0 / (2 * num_nodes)
 
-    # Calculate bar positions for each node
-    bar_positions = [
-        [i - bar_width * (num_nodes / 2) + bar_width / 2 for i in num_iter]
-    ]
-
-    for node in range(1, num_nodes):
-        bar_positions.append([x + bar_width for x in bar_positions[node - 1]])
-
-    for node in range(num_nodes):
+    for index, node in enumerate(means.columns):
+        # Bars of the nodes side by side, centered on the benchmark
+        offset = bar_width * (index - num_nodes / 2 + 0.5)
         ax_1.bar(
-            bar_positions[node],
-            time_data[node]["mean"],
-            yerr=time_data[node]["stdev"],
+            [i + offset for i in num_iter],
+            means[node],
+            yerr=stdevs[node],
             label=f"node {node}",
             width=bar_width,
             align="center",
@@ -167,22 +260,41 @@ def ping_pong():
             capsize=5.0,
         )
 
-    ax_1.grid(True, which="both", ls="--", linewidth=0.5)
+    return means.index.tolist()
+
+
+@register_renderer(
+    "ping_pong",
+    ["test_ping_pong_time", "test_ping_pong_mem"],
+    ["test_ping_pong_time.png", "test_ping_pong_mem.png"],
+)
+def ping_pong():
+    time_df = pd.read_csv(f"{VT_BUILD_FOLDER}/tests/test_ping_pong_time.csv")
+
+    # Create the plot
+    _, ax_1 = plt.subplots(figsize=(GRAPH_WIDTH, GRAPH_HEIGHT))
+    ax_1.set_title("Bytes time results")
 
     # Set x-ticks and labels
-    name_list = time_data[0]["name"].tolist()
-    ax_1.set_xticks(num_iter)
+    name_list = plot_bars_per_node(ax_1, time_df)
     ax_1.set_xticklabels([i.split()[0] for i in name_list])
     ax_1.set_xlabel("Bytes")
 
+    # Fitted alpha-beta model of the median across the ranks
+    payloads = get_payload_times(time_df, get_ping_pong_size)
+    fit = fit_alpha_beta(payloads["bytes"], payloads["time"])
+    ax_1.plot(
+        range(len(name_list)),
+        fit.predict([get_ping_pong_size(name) for name in name_list]),
+        color="black",
+        linestyle="--",
+        label=f"fit: {format_fit(fit)}",
+    )
+
     # Set y-axis label and scale
     ax_1.set_ylabel("Time (ms)")
     ax_1.set_yscale("log")
-
-    # Customize y-ticks
-    y_ticks = [0.03, 1, 5, 40]
-    ax_1.set_yticks(y_ticks)
-    ax_1.set_yticklabels([f"{y_tick:.2f} ms" for y_tick in y_ticks])
+    ax_1.yaxis.set_major_formatter(FuncFormatter(lambda y_tick, _: f"{y_tick:g} ms"))
     ax_1.legend()
 
     plt.xticks(rotation=85)
@@ -194,6 +306,11 @@ def ping_pong():
     generate_memory_graph("ping_pong", memory_df)
 
 
+@register_renderer(
+    "ping_pong_am",
+    ["test_ping_pong_am_time"],
+    ["test_ping_pong_am_time.png", "test_ping_pong_am_time_history.png"],
+)
 def ping_pong_am():
     generate_bar_graph_for_single_value(
         "test_ping_pong_am_time",
@@ -202,6 +319,11 @@ def ping_pong_am():
     )
 
 
+@register_renderer(
+    "make_runnable_micro",
+    ["test_make_runnable_micro_time"],
+    ["test_make_runnable_micro_time.png", "test_make_runnable_micro_time_history.png"],
+)
 def make_runnable_micro():
     generate_bar_graph_for_single_value(
         "test_make_runnable_micro_time",
@@ -210,6 +332,11 @@ def make_runnable_micro():
     )
 
 
+@register_renderer(
+    "objgroup_local_send",
+    ["test_objgroup_local_send_time"],
+    ["test_objgroup_local_send_time.png", "test_objgroup_local_send_time_history.png"],
+)
 def objgroup_local_send():
     generate_bar_graph_for_single_value(
         "test_objgroup_local_send_time",
@@ -218,6 +345,14 @@ def objgroup_local_send():
     )
 
 
+@register_renderer(
+    "collection_local_send",
+    ["test_collection_local_send_time", "test_collection_local_send_preallocate_time"],
+    [
+        "test_collection_local_send_time.png",
+        "test_collection_local_send_time_history.png",
+    ],
+)
 def collection_local_send():
     # Read data
     time_df = pd.read_csv(
@@ -256,18 +391,12 @@ def collection_local_send():
     combined_df["commit"] = COMMIT_ID
     combined_df["run_num"] = RUN_NUM
 
-    file_path = "test_collection_local_send_time_history.csv"
-    if os.path.exists(file_path):
-        past_results = pd.read_csv(file_path)
-    else:
-        past_results = pd.DataFrame(columns=combined_df.columns)
-
-    # Append new results and save
-    updated_results = pd.concat([past_results, combined_df], ignore_index=True)
-    updated_results.to_csv(file_path, index=False)
+    history_table = get_history_table("test_collection_local_send_time")
+    store = open_history_store(".")
 
-    # Get last N results
-    last_n_results = updated_results.tail(NUM_LAST_BUILDS)
+    # Append new results and get last N results
+    store.append(history_table, combined_df)
+    last_n_results = store.read_tail(history_table, NUM_LAST_BUILDS)
 
     # Split data by type
     time_data = {
@@ -310,6 +439,11 @@ def collection_local_send():
     plt.savefig("test_collection_local_send_time_history.png")
 
 
+@register_renderer(
+    "reduce",
+    ["test_reduce_time", "test_reduce_mem"],
+    ["test_reduce_time.png", "test_reduce_mem.png"],
+)
 def reduce():
     time_df = pd.read_csv(f"{VT_BUILD_FOLDER}/tests/test_reduce_time.csv")
     memory_df = pd.read_csv(f"{VT_BUILD_FOLDER}/tests/test_reduce_mem.csv")
@@ -318,21 +452,25 @@ def reduce():
     time_df["iteration"] = time_df["name"].apply(lambda x: int(x.split()[0]))
 
     _, ax_1 = plt.subplots(figsize=(GRAPH_WIDTH, GRAPH_HEIGHT))
-    for node in time_df["node"].unique():
-        node_data = time_df[time_df["node"] == node]
-        _, caps, bars = ax_1.errorbar(
-            node_data["iteration"],
-            node_data["mean"],
-            yerr=node_data["stdev"],
-            fmt="-",
-            label=f"Node {node}",
-        )
-
-        # loop through bars and caps and set the alpha value
-        for my_bar in bars:
-            my_bar.set_alpha(0.3)
-        for my_cap in caps:
-            my_cap.set_alpha(0.3)
+    num_ranks = get_num_ranks(time_df)
+    if num_ranks > MAX_RANK_BARS:
+        stats = aggregate_ranks(time_df, "iteration")
+        plot_rank_band(ax_1, stats.index, stats, f"{num_ranks} ranks")
+    else:
+        for node, node_data in time_df.groupby("node"):
+            _, caps, bars = ax_1.errorbar(
+                node_data["iteration"],
+                node_data["mean"],
+                yerr=node_data["stdev"],
+                fmt="-",
+                label=f"Node {node}",
+            )
+
+            # loop through bars and caps and set the alpha value
+            for my_bar in bars:
+                my_bar.set_alpha(0.3)
+            for my_cap in caps:
+                my_cap.set_alpha(0.3)
 
     ax_1.set_xlabel("Iteration")
     ax_1.set_ylabel("Time (ms)")
@@ -364,17 +502,28 @@ def generate_memory_graph(test_name, memory_data):
     plt.xlabel("Iteration")
     plt.ylabel("Size (MiB)")
 
-    num_nodes = memory_data["node"].max() + 1
-
-    for node in range(num_nodes):
-        node_data = memory_data[memory_data["node"] == node]
-        num_iter = list(
-            range(len(node_data))
-        )  # Ensure num_iter matches the length of node_data
+    # MiB per iteration of every rank
+    memory_data = add_iterations(memory_data).assign(
+        mem=memory_data["mem"] / 1024 / 1024
+    )
+    num_ranks = get_num_ranks(memory_data)
 
-        ax1.plot(
-            num_iter, node_data["mem"] / 1024 / 1024, label=f"Node {node}", linewidth=4
-        )
+    # Long series are downsampled, which keeps their peaks
+    if num_ranks > MAX_RANK_BARS:
+        stats = aggregate_ranks(memory_data, "iteration", "mem")
+        stats = stats.iloc[lttb_indices(stats.index, stats["max"])]
+        plot_rank_band(ax1, stats.index, stats, f"{num_ranks} ranks")
+    else:
+        for node, node_data in memory_data.groupby("node"):
+            node_data = node_data.iloc[
+                lttb_indices(node_data["iteration"], node_data["mem"])
+            ]
+            ax1.plot(
+                node_data["iteration"],
+                node_data["mem"],
+                label=f"Node {node}",
+                linewidth=4,
+            )
 
     ax1.xaxis.get_major_locator().set_params(integer=True)
     ax1.legend()
@@ -384,13 +533,412 @@ def generate_memory_graph(test_name, memory_data):
     plt.savefig(f"test_{test_name}_mem.png")
 
 
-if __name__ == "__main__":
+def plot_rank_history(ax_1, history):
+    """
+    Plot the median across the ranks of every benchmark over the past runs, with a
+    band from their min to their max. Return the run numbers.
+    """
+
+    stats = aggregate_ranks(history, ["run_num", "name"])
+    run_nums = stats.index.unique("run_num")
+    x_values = range(len(run_nums))
+
+    for name in stats.index.unique("name"):
+        benchmark = stats.xs(name, level="name").reindex(run_nums)
+        (line,) = ax_1.plot(
+            x_values, benchmark["median"], marker="o", label=f"{name} (median, min-max)"
+        )
+        ax_1.fill_between(
+            x_values,
+            benchmark["min"],
+            benchmark["max"],
+            color=line.get_color(),
+            alpha=0.2,
+        )
+
+    ax_1.set_xticks(x_values)
+    ax_1.set_xticklabels(run_nums.astype(str))
+
+
+def generate_history_graph(test_file_name, title, history):
+    """
+    Mean time of every benchmark (and node) over the past runs, aggregated across the
+    ranks when there are more than MAX_RANK_BARS of them
+    """
+
+    num_ranks = history["node"].nunique() if "node" in history else 1
+
+    _, ax_1 = plt.subplots(figsize=(GRAPH_WIDTH, GRAPH_HEIGHT))
+    if num_ranks > MAX_RANK_BARS:
+        plot_rank_history(ax_1, history)
+        title += f" ({num_ranks} ranks)"
+    else:
+        labels = history["name"].astype(str)
+        if num_ranks > 1:
+            labels += " (node " + history["node"].astype(str) + ")"
+
+        runs = history.assign(label=labels).pivot_table(
+            index="run_num", columns="label", values="mean", aggfunc="last", sort=False
+        )
+        for label in runs.columns:
+            ax_1.plot(runs.index.astype(str), runs[label], marker="o", label=label)
+
+    ax_1.set_title(title)
+    ax_1.set_xlabel("Run numbers")
+    ax_1.set_ylabel("Time (ms)")
+    ax_1.grid(True, which="both", ls="--", linewidth=0.5)
+    ax_1.legend()
+    plt.tight_layout()
+    plt.savefig(f"{test_file_name}_history.png")
+
+
+def generate_time_graph(perf_file):
+    """Generic graphs of a time file, the results are appended to its history"""
+
+    if perf_file.num_nodes <= 1:
+        generate_bar_graph_for_single_value(
+            perf_file.name,
+            f"Time of {perf_file.test}",
+            f"Past runs of {perf_file.test}",
+        )
+        return
+
+    time_df = pd.read_csv(f"{VT_BUILD_FOLDER}/tests/{perf_file.name}.csv")
+
+    _, ax_1 = plt.subplots(figsize=(GRAPH_WIDTH, GRAPH_HEIGHT))
+    ax_1.set_title(f"Time of {perf_file.test}")
+    ax_1.set_xticklabels(plot_bars_per_node(ax_1, time_df))
+    ax_1.set_ylabel("Time (ms)")
+    ax_1.legend()
+    plt.xticks(rotation=85)
+    plt.tight_layout()
+    plt.savefig(f"{perf_file.name}.png")
+
+    time_df["commit"] = COMMIT_ID
+    time_df["run_num"] = RUN_NUM
+
+    history_table = get_history_table(perf_file.name)
+    store = open_history_store(".")
+    store.append(history_table, time_df)
+
+    generate_history_graph(
+        perf_file.name,
+        f"Past runs of {perf_file.test}",
+        store.read_last_runs(history_table, NUM_LAST_BUILDS),
+    )
+
+
+def generate_imbalance_graph():
+    """Worst load imbalance (max / mean across ranks) of every test over the past runs"""
+
+    history = read_imbalance_history(open_history_store("."), NUM_LAST_BUILDS)
+
+    _, ax_1 = plt.subplots(figsize=(GRAPH_WIDTH, GRAPH_HEIGHT))
+    for test in history.columns:
+        ax_1.plot(history.index.astype(str), history[test], marker="o", label=test)
+
+    ax_1.axhline(1.0, color="black", linestyle="--", label="balanced")
+    ax_1.set_title("Load imbalance across ranks (max / mean of the slowest benchmark)")
+    ax_1.set_xlabel("Run numbers")
+    ax_1.set_ylabel("Imbalance")
+    ax_1.grid(True, which="both", ls="--", linewidth=0.5)
+    ax_1.legend()
+    plt.tight_layout()
+    plt.savefig(RANK_IMBALANCE_GRAPH)
+
+
+def record_imbalance(perf_files):
+    """
+    Append the imbalance of the multi-node time files to the history, return whether
+    there were any. Done before rendering, as the jobs can't share the history table.
+    """
+
+    store = open_history_store(".")
+    multi_node_files = [
+        perf_file
+        for perf_file in perf_files.values()
+        if perf_file.kind == TIME and perf_file.num_nodes > 1
+    ]
+
+    for perf_file in multi_node_files:
+        append_imbalance_history(
+            store,
+            perf_file.test,
+            pd.read_csv(f"{VT_BUILD_FOLDER}/tests/{perf_file.name}.csv"),
+            RUN_NUM,
+            COMMIT_ID,
+        )
+
+    return bool(multi_node_files)
+
+
+def generate_transport_model_graph():
+    """Fitted latency and bandwidth of every transport over the past runs"""
+
+    history = read_transport_history(open_history_store("."), NUM_LAST_BUILDS)
+
+    _, (ax_1, ax_2) = plt.subplots(2, 1, figsize=(GRAPH_WIDTH, GRAPH_HEIGHT * 1.5))
+    for group, runs in history.groupby("group", sort=False):
+        run_nums = runs["run_num"].astype(str)
+        ax_1.plot(run_nums, runs["latency_ms"] * 1000, marker="o", label=group)
+        ax_2.plot(run_nums, runs["bandwidth_gb_s"], marker="o", label=group)
+
+    ax_1.set_title("Fitted latency")
+    ax_1.set_ylabel("Latency (us)")
+    ax_1.set_yscale("log")
+    ax_2.set_title("Fitted asymptotic bandwidth")
+    ax_2.set_ylabel("Bandwidth (GB/s)")
+    for axis in (ax_1, ax_2):
+        axis.set_xlabel("Run numbers")
+        axis.grid(True, which="both", ls="--", linewidth=0.5)
+        axis.legend()
+
+    plt.tight_layout()
+    plt.savefig(TRANSPORT_MODEL_GRAPH)
+
+
+def record_transport_models():
+    """Fit the transport models, write them and append them to the history"""
+
+    models = describe_models(fit_models(read_payload_times(f"{VT_BUILD_FOLDER}/tests")))
+    for model in models:
+        print(f"Transport model: {model}")
+
+    write_models(models, TRANSPORT_MODELS_FILENAME)
+    append_transport_history(open_history_store("."), models, RUN_NUM, COMMIT_ID)
+
+    return bool(models)
+
+
+def generate_memory_stats_graph():
+    """Peak memory and the fastest growth across the ranks of every test over the past runs"""
+
+    history = read_memory_history(open_history_store("."), NUM_LAST_BUILDS)
+    runs = history.groupby(["test", "run_num"], sort=False).agg(
+        peak_mib=("peak_mib", "max"), slope_kib=("slope_kib", "max")
+    )
+
+    _, (ax_1, ax_2) = plt.subplots(2, 1, figsize=(GRAPH_WIDTH, GRAPH_HEIGHT * 1.5))
+    for test, test_runs in runs.groupby(level="test", sort=False):
+        run_nums = test_runs.index.get_level_values("run_num").astype(str)
+        ax_1.plot(run_nums, test_runs["peak_mib"], marker="o", label=test)
+        ax_2.plot(run_nums, test_runs["slope_kib"], marker="o", label=test)
+
+    ax_2.axhline(
+        LEAK_THRESHOLD_KIB, color="red", linestyle="--", label="leak threshold"
+    )
+    ax_1.set_title("Peak memory usage (highest rank)")
+    ax_1.set_ylabel("Size (MiB)")
+    ax_2.set_title("Memory growth after warm-up (fastest growing rank)")
+    ax_2.set_ylabel("Growth (KiB / iteration)")
+    for axis in (ax_1, ax_2):
+        axis.set_xlabel("Run numbers")
+        axis.grid(True, which="both", ls="--", linewidth=0.5)
+        axis.legend()
+
+    plt.tight_layout()
+    plt.savefig(MEMORY_STATS_GRAPH)
+
+
+def record_memory_stats(perf_files):
+    """Analyze the memory files, write the results and append them to the history"""
+
+    stats = []
+    for perf_file in perf_files.values():
+        if perf_file.kind == MEMORY:
+            stats += analyze_memory(
+                perf_file.test,
+                pd.read_csv(f"{VT_BUILD_FOLDER}/tests/{perf_file.name}.csv"),
+            )
+
+    for memory_stats in stats:
+        if memory_stats.leak:
+            print(f"Suspected memory leak: {memory_stats}")
+
+    write_stats(stats, MEMORY_STATS_FILENAME)
+    append_memory_history(open_history_store("."), stats, RUN_NUM, COMMIT_ID)
+
+    return bool(stats)
+
+
+def generate_memory_file_graph(perf_file):
+    generate_memory_graph(
+        perf_file.test, pd.read_csv(f"{VT_BUILD_FOLDER}/tests/{perf_file.name}.csv")
+    )
+
+
+def get_generic_images(perf_file):
+    if perf_file.kind == MEMORY:
+        return (f"test_{perf_file.test}_mem.png",)
+    return (f"{perf_file.name}.png", f"{perf_file.name}_history.png")
+
+
+def discover_perf_files(tests_folder):
+    """
+    Return PerfFile of every CSV file written by the perf tests, by file name.
+    The kind of the file is inferred from its columns, unknown files are skipped.
+
+    Example: test_reduce_mem.csv with columns node,mem
+    Output: {"test_reduce_mem": PerfFile("test_reduce_mem", "reduce", "mem", 2)}
+    """
+
+    perf_files = {}
+    for file_name in sorted(
+        glob.glob(os.path.join(tests_folder, f"*_{TIME}.csv"))
+    ) + sorted(glob.glob(os.path.join(tests_folder, f"*_{MEMORY}.csv"))):
+        name = os.path.basename(file_name)[: -len(".csv")]
+        data_frame = pd.read_csv(file_name)
+
+        if TIME_COLUMNS.issubset(data_frame.columns):
+            kind = TIME
+        elif "mem" in data_frame.columns:
+            kind = MEMORY
+        else:
+            print(f"Unknown columns of {file_name}: {list(data_frame.columns)}")
+            continue
+
+        test = name[: -len(f"_{kind}")]
+        test = test[len("test_") :] if test.startswith("test_") else test
+        num_nodes = data_frame["node"].nunique() if "node" in data_frame else 1
+        perf_files[name] = PerfFile(name, test, kind, num_nodes)
+
+    return perf_files
+
+
+def plan_graph_jobs(perf_files):
+    """
+    Return the renderers of the discovered files by job name. A registered renderer
+    is used when all of its files were found, the other files are rendered generically.
+    """
+
+    jobs = {}
+    rendered = set()
+
+    for renderer in OVERRIDES:
+        if all(file_name in perf_files for file_name in renderer.files):
+            jobs[renderer.render.__name__] = renderer
+            rendered.update(renderer.files)
+
+    for perf_file in perf_files.values():
+        if perf_file.name not in rendered:
+            render = (
+                generate_memory_file_graph
+                if perf_file.kind == MEMORY
+                else generate_time_graph
+            )
+            jobs[perf_file.name] = PerfRenderer(
+                perf_file.test,
+                partial(render, perf_file),
+                (perf_file.name,),
+                get_generic_images(perf_file),
+            )
+
+    return jobs
+
+
+def record_histories(perf_files):
+    """
+    Append the summaries of this run to their histories (in the main process, graph
+    jobs can't share a history table), return the renderers of the recorded ones
+    """
+
+    jobs = {}
+    if record_imbalance(perf_files):
+        jobs["rank_imbalance"] = PerfRenderer(
+            "Load imbalance", generate_imbalance_graph, (), (RANK_IMBALANCE_GRAPH,)
+        )
+    if record_transport_models():
+        jobs["transport_models"] = PerfRenderer(
+            "Transport model",
+            generate_transport_model_graph,
+            (),
+            (TRANSPORT_MODEL_GRAPH,),
+        )
+    if record_memory_stats(perf_files):
+        jobs["memory_stats"] = PerfRenderer(
+            "Memory usage history",
+            generate_memory_stats_graph,
+            (),
+            (MEMORY_STATS_GRAPH,),
+        )
+
+    return jobs
+
+
+def init_graph_worker():
+    """Prepare a process for rendering graphs without a display"""
+    matplotlib.use("Agg")
     set_graph_properties()
 
-    reduce()
-    collection_local_send()
-    objgroup_local_send()
-    make_runnable_micro()
-    ping_pong_am()
-    ping_pong()
-    send_cost()
+
+def run_graph_job(render):
+    """
+    Render a single graph job and return its outcome instead of raising,
+    so that one broken test doesn't prevent the others from being rendered.
+    Style changes made by the job (rcParams) and all of its figures
+    are discarded afterwards, which keeps a reused worker process clean.
+    """
+    try:
+        with matplotlib.rc_context():
+            render()
+        return None
+    except Exception:  # pylint: disable=broad-except
+        return traceback.format_exc()
+    finally:
+        plt.close("all")
+
+
+def render_graphs(jobs, num_jobs):
+    """
+    Render every job (renderers by job name), using a process pool when num_jobs > 1.
+    Returns the list of jobs that failed.
+    """
+    errors = {}
+
+    if num_jobs <= 1 or len(jobs) <= 1:
+        init_graph_worker()
+        for job_name, renderer in jobs.items():
+            errors[job_name] = run_graph_job(renderer.render)
+    else:
+        with ProcessPoolExecutor(
+            max_workers=min(num_jobs, len(jobs)), initializer=init_graph_worker
+        ) as executor:
+            futures = {
+                executor.submit(run_graph_job, renderer.render): job_name
+                for job_name, renderer in jobs.items()
+            }
+            for future in as_completed(futures):
+                try:
+                    errors[futures[future]] = future.result()
+                except Exception:  # pylint: disable=broad-except
+                    # The worker itself died (e.g. was killed), not only the job
+                    errors[futures[future]] = traceback.format_exc()
+
+    failed_jobs = []
+    for job_name in jobs:
+        if errors[job_name] is None:
+            print(f"Graph job {job_name} finished")
+        else:
+            print(f"Graph job {job_name} failed:\n{errors[job_name]}")
+            failed_jobs.append(job_name)
+
+    return failed_jobs
+
+
+def main(_args=None):
+    """Record the perf test results and render their graphs, return the exit code"""
+
+    perf_files = discover_perf_files(f"{VT_BUILD_FOLDER}/tests")
+    graph_jobs = plan_graph_jobs(perf_files)
+    graph_jobs.update(record_histories(perf_files))
+    write_manifest(graph_jobs)
+
+    # The style of the graphs mustn't leak into the stages run later in the same process
+    with matplotlib.rc_context():
+        failed_jobs = render_graphs(graph_jobs, NUM_GRAPH_JOBS)
+
+    return 1 if failed_jobs else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,23 +1,65 @@
 import os
+import platform
+from itertools import groupby
+from operator import attrgetter
 import matplotlib.pyplot as plt
-import pandas as pd
-
-OUTPUT_DIR = os.getenv("INPUT_BUILD_STATS_OUTPUT")
-CLANG_BUILD_REPORT = f"{OUTPUT_DIR}/{os.getenv('INPUT_BUILD_RESULT_FILENAME')}"
+from compile_memory import read_compile_jobs
+from build_report_parser import HEADERS, TEMPLATE_SETS, TEMPLATES, read_report
+from build_matrix import get_build_settings, read_results as read_matrix_results
+from build_snapshot import collect_snapshot
+from changes_section import generate_changes_section
+from directory_section import generate_directory_section
+from directory_times import add_file_times
+from header_section import generate_edit_cost_section, generate_header_whatif_section
+from heaptrack_report import HEAPTRACK_FILENAME, read_reports
+from heaptrack_section import generate_heaptrack_section
+from history_store import BUILD_TIMES_TABLE, open_history_store
+from incremental_bench import read_results
+from matrix_section import generate_build_matrix_section
+from memory_stats import MEMORY_STATS_FILENAME, read_stats
+from ninja_log import BUILD_CORES, analyze_ninja_log
+from perf_manifest import PERF_MANIFEST_FILENAME, read_manifest
+from perf_regression import PERF_REGRESSION_FILENAME, read_verdicts
+from perf_sections import (
+    generate_memory_stats_table,
+    generate_perf_verdicts_table,
+    generate_transport_model_table,
+)
+from template_section import generate_template_groups_section
+from time_trace import collect_traces, to_records, write_tu_times
+from timeline_section import (
+    generate_build_timeline_section,
+    generate_compile_memory_section,
+)
+from transport_model import TRANSPORT_MODELS_FILENAME, read_models
+from wiki_common import (
+    BUILD_ANALYZER,
+    CONFIG,
+    NUM_TOP_RESULTS,
+    OUTPUT_DIR,
+    REPO_NAME,
+    convert_time,
+    create_image_hyperlink,
+    strip_relative_path,
+)
+
+CLANG_BUILD_REPORT = f"{OUTPUT_DIR}/{CONFIG.build_result_filename}"
+TU_TIMES_FILENAME = f"{OUTPUT_DIR}/tu_times.csv"
+VT_BUILD_FOLDER = CONFIG.build_folder
+MATRIX_BUILD_FOLDER = CONFIG.matrix_build_folder
 
 EXP_TEMPLATE_INST_DIR = f"{OUTPUT_DIR}/most_expensive_templates.png"
 EXP_TEMPLATE_SET_DIR = f"{OUTPUT_DIR}/most_expensive_templates_sets.png"
 EXP_HEADERS_DIR = f"{OUTPUT_DIR}/most_expensive_headers.png"
-GRAPH_FILENAME = f"{OUTPUT_DIR}/{os.getenv('INPUT_GRAPH_FILENAME')}"
-BADGE_FILENAME = f"{OUTPUT_DIR}/{os.getenv('INPUT_BADGE_FILENAME')}"
-
-NUM_TOP_RESULTS = 25
-REPO_NAME = os.getenv("GITHUB_REPOSITORY")
+GRAPH_FILENAME = f"{OUTPUT_DIR}/{CONFIG.graph_filename}"
+LONG_TERM_GRAPH_FILENAME = f"{OUTPUT_DIR}/{CONFIG.long_term_graph_filename}"
+EFFICIENCY_GRAPH_FILENAME = f"{OUTPUT_DIR}/{CONFIG.efficiency_graph_filename}"
+BADGE_FILENAME = f"{OUTPUT_DIR}/{CONFIG.badge_filename}"
 
 
-def get_name_times_avg(lines):
+def get_name_times_avg(records):
     """
-    Example input:
+    Example input (parsed from the following lines):
     26549 ms: some<template> (306 times, avg 86 ms)
     25000 ms: some<other_template> (500 times, avg 50 ms)
 
@@ -34,40 +76,25 @@ def get_name_times_avg(lines):
 
     index = 0
 
-    for line in lines:
-        # Stop if we parsed all lines for given action
-        # or we've reached the limit
-        if not line.endswith("ms)") or index >= NUM_TOP_RESULTS:
+    for record in records:
+        # Stop if we've reached the limit
+        if index >= NUM_TOP_RESULTS:
             break
 
-        avg_time = int(line[line.rfind("avg") + 3 : line.rfind("ms")])
-
         # Don't include very cheap templates
-        if avg_time < avg_ms_threshold:
+        if record.avg_ms < avg_ms_threshold:
             continue
 
-        # Total time spent for given template/function
-        delimiter = line.index("ms")
-        total_times.append(int(line[:delimiter]))
-
-        # Template/function name
-        tmp_text = line[delimiter + 3 :]
-        end_of_name = tmp_text.rfind("(")
-        name = tmp_text[: end_of_name - 1]
-
-        # Number of times given template/function was used
-        times_and_avg = tmp_text[end_of_name + 1 :]
-        times_used = int(times_and_avg[: times_and_avg.index(" ")])
-
-        name_times_avg[index] = (name, times_used, avg_time)
+        total_times.append(record.total_ms)
+        name_times_avg[index] = (record.name, record.times, record.avg_ms)
         index += 1
 
     return total_times, name_times_avg
 
 
-def get_headers(lines):
+def get_headers(records):
     """
-    Example input:
+    Example input (parsed from the following lines):
     26549 ms: some_header.h (included 237 times, avg 506 ms), included via:
         ... (some files)
     2400 ms: some_other_header.h (included 100 times, avg 240 ms), included via:
@@ -81,31 +108,14 @@ def get_headers(lines):
     header_times = []
     name_included_avg = {}
 
-    index = 0
-
-    for line in lines:
-        if line.endswith("included via:"):
-            delimiter = line.index("ms: ")
-            header_times.append(int(line[:delimiter]))
+    for index, record in enumerate(records):
+        header_times.append(record.total_ms)
 
-            tmp_text = line[delimiter + len("ms: ") :]
-            end_of_name = tmp_text.rfind("(included ")
-            name = tmp_text[: end_of_name - 1]
-
-            # Remove the relative path from the file names
-            while name.startswith("../"):
-                name = name[3:]
-
-            times_and_avg = tmp_text[end_of_name + len("(included ") :]
-            times_used = int(times_and_avg[: times_and_avg.index(" ")])
-            avg_time = int(
-                times_and_avg[
-                    times_and_avg.index("avg") + 3 : times_and_avg.index("ms")
-                ]
-            )
-
-            name_included_avg[index] = (name, times_used, avg_time)
-            index += 1
+        name_included_avg[index] = (
+            strip_relative_path(record.name),
+            record.times,
+            record.avg_ms,
+        )
 
     return header_times, name_included_avg
 
@@ -120,7 +130,44 @@ def generate_name_times_avg_table(templates_text):
     return templates_string
 
 
-def prepare_data():
+def read_build_records():
+    """
+    Read the compilation records either from ClangBuildAnalyzer's report or
+    directly from the -ftime-trace files in the build folder
+    """
+
+    if BUILD_ANALYZER == "time-trace":
+        aggregates = collect_traces(VT_BUILD_FOLDER)
+        write_tu_times(aggregates, TU_TIMES_FILENAME)
+        return to_records(aggregates)
+
+    return read_report(CLANG_BUILD_REPORT)
+
+
+def get_build_report_info():
+    """Return the link to the full report and the description of its source"""
+
+    if BUILD_ANALYZER == "time-trace":
+        return (
+            f"- [Per-file compile times]({TU_TIMES_FILENAME})\n",
+            "Following graphs were generated using data created by "
+            "[-ftime-trace](https://clang.llvm.org/docs/ClangCommandLineReference.html"
+            "#cmdoption-clang-ftime-trace)\n",
+        )
+
+    return (
+        f"- [ClangBuildAnalyzer full report]({CLANG_BUILD_REPORT})\n",
+        "Following graphs were generated using data created by "
+        "[ClangBuildAnalyzer](https://github.com/aras-p/ClangBuildAnalyzer)\n",
+    )
+
+
+def prepare_data(snapshot, directory_totals):
+    """
+    snapshot is filled with the aggregates of this run (see build_snapshot.py)
+    and directory_totals with the file times (see directory_times.py)
+    """
+
     # Expensive template instantiations
     templates_total_times = []
     templates = {}
@@ -132,21 +179,26 @@ def prepare_data():
     # Expensive headers
     headers_times = []
     headers = {}
-
-    with open(CLANG_BUILD_REPORT) as file:
-        lines = file.read().splitlines()
-
-        for idx, line in enumerate(lines):
-            if line.startswith("**** Templates that took longest to instantiate:"):
-                templates_total_times, templates = get_name_times_avg(lines[idx + 1 :])
-
-            if line.startswith("**** Template sets that took longest to instantiate:"):
-                template_sets_times, template_sets = get_name_times_avg(
-                    lines[idx + 1 :]
-                )
-
-            if line.startswith("**** Expensive headers:"):
-                headers_times, headers = get_headers(lines[idx + 1 :])
+    header_records = []
+
+    # Each section is consumed straight from the parser, so the report
+    # is read only once and never kept in memory
+    for section, records in groupby(
+        collect_snapshot(
+            add_file_times(read_build_records(), directory_totals), snapshot
+        ),
+        key=attrgetter("section"),
+    ):
+        if section == TEMPLATES:
+            templates_total_times, templates = get_name_times_avg(records)
+
+        if section == TEMPLATE_SETS:
+            template_sets_times, template_sets = get_name_times_avg(records)
+
+        if section == HEADERS:
+            # Headers are kept with their include chains for the what-if model
+            header_records = list(records)
+            headers_times, headers = get_headers(header_records)
 
     return (
         templates,
@@ -155,6 +207,7 @@ def prepare_data():
         templates_total_times,
         template_sets_times,
         headers_times,
+        header_records,
     )
 
 
@@ -212,14 +265,11 @@ def generate_graph(name, templates_total_times):
     plt.savefig(name)
 
 
-def convert_time(time_in_sec):
-    return f"{time_in_sec // 60}min {time_in_sec % 60}sec"
-
-
 def generate_last_build_table():
-    previous_builds_filename = f"{OUTPUT_DIR}/{os.getenv('INPUT_BUILD_TIMES_FILENAME')}"
-    data_frame = pd.read_csv(previous_builds_filename)
-    last_builds = data_frame.tail(int(os.getenv("INPUT_NUM_LAST_BUILD")) - 1)
+    store = open_history_store(
+        OUTPUT_DIR, {BUILD_TIMES_TABLE: CONFIG.build_times_filename}
+    )
+    last_builds = store.read_tail(BUILD_TIMES_TABLE, CONFIG.num_last_builds - 1)
 
     run_nums = last_builds["run_num"].tolist()
     vt_timings = last_builds["vt"].tolist()
@@ -257,9 +307,10 @@ def generate_last_build_table():
 
 
 def generate_last_runs_table():
-    previous_builds_filename = f"{OUTPUT_DIR}/{os.getenv('INPUT_BUILD_TIMES_FILENAME')}"
-    data_frame = pd.read_csv(previous_builds_filename)
-    last_builds = data_frame.tail(int(os.getenv("INPUT_NUM_LAST_BUILD")) - 1)
+    store = open_history_store(
+        OUTPUT_DIR, {BUILD_TIMES_TABLE: CONFIG.build_times_filename}
+    )
+    last_builds = store.read_tail(BUILD_TIMES_TABLE, CONFIG.num_last_builds - 1)
 
     run_nums = last_builds["run_num"].tolist()
     vt_timings = last_builds["vt"].tolist()
@@ -296,45 +347,76 @@ def generate_last_runs_table():
     return last_builds_table
 
 
-def create_image_hyperlink(image_link):
-    return f"[![]({image_link})]({image_link})"
+def get_total_memory_gb():
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / 1024**3
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def get_os_name():
+    try:
+        with open("/etc/os-release", encoding="utf-8") as file:
+            for line in file:
+                if line.startswith("PRETTY_NAME="):
+                    return line.split("=", 1)[1].strip().strip('"')
+    except OSError:
+        pass
+
+    return platform.system()
 
 
 def get_runner_info():
+    """Hardware of the runner and the configuration of the main build"""
+
+    memory_gb = get_total_memory_gb()
+    memory = f" and {memory_gb:.0f} GB RAM" if memory_gb else ""
+    settings = {"Linux": get_os_name(), **get_build_settings(VT_BUILD_FOLDER)}
+    configuration = "".join(
+        f"- {title}: **{value}**\n" for title, value in settings.items() if value
+    )
+
     return (
-        "**NOTE. The following builds were run on GitHub Action runners"
-        " that use [4-core CPU and 16 GB RAM]"
-        "(https://docs.github.com/en/actions/using-github-hosted-runners/"
-        "about-github-hosted-runners/"
-        "about-github-hosted-runners#supported-runners-and-hardware-resources)** <br><br> \n"
-        "Configuration:\n"
-        "- Compiler: **Clang-14**\n"
-        "- Linux: **Ubuntu 22.04**\n"
-        "- Build Type: **Release**\n"
-        "- Unity Build: **OFF**\n"
-        "- Production Mode: **OFF**\n"
+        f"**NOTE. The following builds were run on a runner with {BUILD_CORES}-core CPU"
+        f"{memory}** <br><br> \n"
+        f"Configuration:\n{configuration}"
     )
 
 
-def create_md_build_page(last_builds, exp_temp_inst, exp_temp_sets, exp_headers):
+def create_md_build_page(
+    last_builds, build_sections, exp_temp_inst, exp_temp_sets, exp_headers
+):
+    """build_sections is a list of (title, markdown) of the build analysis sections"""
 
     exp_templates_inst_string = generate_name_times_avg_table(exp_temp_inst)
     exp_templates_sets_string = generate_name_times_avg_table(exp_temp_sets)
     exp_headers_string = generate_name_times_avg_table(exp_headers)
+    build_report_link, build_report_source = get_build_report_info()
 
     page_name = "Build-Stats"
     wiki_url = f"https://github.com/{REPO_NAME}/wiki"
     wiki_page = f"{wiki_url}/{page_name}"
 
+    sections_links = "".join(
+        f"- [{title}]({wiki_page}#{title.lower().replace(' ', '-')})\n"
+        for title, _ in build_sections
+    )
+    sections_content = "".join(
+        f"# {title}\n{content}*** \n" for title, content in build_sections
+    )
+
     file_content = (
         f"- [Build History]({wiki_page}#build-history)\n"
         f"- [Past Builds]({wiki_page}#past-builds)\n"
+        f"- [Long-term Build History]({wiki_page}#long-term-build-history)\n"
+        f"- [Parallel Efficiency]({wiki_page}#parallel-efficiency)\n"
+        f"{sections_links}"
         f"- [Templates that took longest to instantiate]"
         f"({wiki_page}#templates-that-took-longest-to-instantiate)\n"
         f"- [Template sets that took longest to instantiate]"
         f"({wiki_page}#template-sets-that-took-longest-to-instantiate)\n"
         f"- [Most expensive headers]({wiki_page}#Most-expensive-headers)\n"
-        f"- [ClangBuildAnalyzer full report]({CLANG_BUILD_REPORT})\n"
+        f"{build_report_link}"
         "***\n"
         f"# Build History\n"
         f"{get_runner_info()}"
@@ -342,10 +424,16 @@ def create_md_build_page(last_builds, exp_temp_inst, exp_temp_sets, exp_headers)
         f"{create_image_hyperlink(f'{wiki_url}/{GRAPH_FILENAME}')}\n"
         "## Past Builds\n"
         f"{last_builds} \n"
+        "## Long-term Build History\n"
+        f"{create_image_hyperlink(f'{wiki_url}/{LONG_TERM_GRAPH_FILENAME}')}\n"
+        "## Parallel Efficiency\n"
+        "CPU utilisation of the build, i.e. (user + sys) / real / cores. A drop usually "
+        "means that some header or link step serialises the build.\n\n"
+        f"{create_image_hyperlink(f'{wiki_url}/{EFFICIENCY_GRAPH_FILENAME}')}\n"
         "*** \n"
+        f"{sections_content}"
         "# Build Stats\n"
-        "Following graphs were generated using data created by "
-        f"[ClangBuildAnalyzer](https://github.com/aras-p/ClangBuildAnalyzer)\n"
+        f"{build_report_source}"
         "## Templates that took longest to instantiate \n"
         f"{create_image_hyperlink(f'{wiki_url}/{EXP_TEMPLATE_INST_DIR}')}\n"
         f"{exp_templates_inst_string}"
@@ -366,50 +454,28 @@ def create_md_build_page(last_builds, exp_temp_inst, exp_temp_sets, exp_headers)
 
 def create_md_perf_page(last_builds):
     perf_test_url = f"https://github.com/{REPO_NAME}/wiki/perf_tests/"
-    content_with_all_tests = (
-        "# Test Results\n"
-        "## test_reduce\n"
-        f"{create_image_hyperlink(f'{perf_test_url}test_reduce_time.png')}\n"
-        f"{create_image_hyperlink(f'{perf_test_url}test_reduce_mem.png')}\n"
-        "## collection_local_send\n"
-        f"{create_image_hyperlink(f'{perf_test_url}test_collection_local_send_time.png')}\n"
-        f"{create_image_hyperlink(f'{perf_test_url}test_collection_local_send_time_history.png')}\n"
-        "## objgroup_local_send\n"
-        f"{create_image_hyperlink(f'{perf_test_url}test_objgroup_local_send_time.png')}\n"
-        f"{create_image_hyperlink(f'{perf_test_url}test_objgroup_local_send_time_history.png')}\n"
-        "## make_runnable_micro\n"
-        f"{create_image_hyperlink(f'{perf_test_url}test_make_runnable_micro_time.png')}\n"
-        f"{create_image_hyperlink(f'{perf_test_url}test_make_runnable_micro_time_history.png')}\n"
-        "## ping_pong\n"
-        f"{create_image_hyperlink(f'{perf_test_url}test_ping_pong_time.png')}\n"
-        f"{create_image_hyperlink(f'{perf_test_url}test_ping_pong_mem.png')}\n"
-        "## ping_pong_am\n"
-        f"{create_image_hyperlink(f'{perf_test_url}test_ping_pong_am_time.png')}\n"
-        f"{create_image_hyperlink(f'{perf_test_url}test_ping_pong_am_time_history.png')}\n"
-        "## send_cost\n"
-        f"{create_image_hyperlink(f'{perf_test_url}test_send_cost_small_time.png')}\n"
-        f"{create_image_hyperlink(f'{perf_test_url}test_send_cost_medium_time.png')}\n"
-        f"{create_image_hyperlink(f'{perf_test_url}test_send_cost_large_time.png')}\n"
-    )
+    sections = read_manifest(f"perf_tests/{PERF_MANIFEST_FILENAME}")
+
+    content_with_all_tests = "# Test Results\n"
+    if not sections:
+        content_with_all_tests += "No performance test results were found\n"
+    for title, images in sections or []:
+        content_with_all_tests += f"## {title}\n" + "".join(
+            f"{create_image_hyperlink(f'{perf_test_url}{image}')}\n" for image in images
+        )
 
     file_content = (
         f"# Performance Tests\n"
         f"{get_runner_info()}"
+        f"{generate_perf_verdicts_table(read_verdicts(f'perf_tests/{PERF_REGRESSION_FILENAME}'))}"
+        f"{generate_transport_model_table(read_models(f'perf_tests/{TRANSPORT_MODELS_FILENAME}'))}"
+        f"{generate_memory_stats_table(read_stats(f'perf_tests/{MEMORY_STATS_FILENAME}'))}"
         f"{content_with_all_tests}\n"
         "***\n"
         "## Past Builds\n"
         f"{last_builds} \n"
         "*** \n"
-        "# Heaptrack result\n"
-        "Following flamegraphs were generated using"
-        "[Heaptrack](https://github.com/KDE/heaptrack) and "
-        "[Flamegraph](https://github.com/brendangregg/FlameGraph)\n"
-        "## jacobi2d_vt node: 0\n"
-        f"{create_image_hyperlink(f'{perf_test_url}flame_heaptrack_jacobi_alloc_count_0.svg')}\n"
-        f"{create_image_hyperlink(f'{perf_test_url}flame_heaptrack_jacobi_leaked_0.svg')}\n"
-        "## jacobi2d_vt node: 1\n"
-        f"{create_image_hyperlink(f'{perf_test_url}flame_heaptrack_jacobi_alloc_count_1.svg')}\n"
-        f"{create_image_hyperlink(f'{perf_test_url}flame_heaptrack_jacobi_leaked_1.svg')}\n"
+        f"{generate_heaptrack_section(read_reports(f'perf_tests/{HEAPTRACK_FILENAME}'), perf_test_url)}"
     )
 
     page_name = "Perf-Tests"
@@ -417,20 +483,65 @@ def create_md_perf_page(last_builds):
         file.write(file_content)
 
 
-if __name__ == "__main__":
+def main(_args=None):
+    """Generate the build stats and the perf tests wiki pages"""
+
+    snapshot = {}
+    directory_totals = {}
     (
-        templates_in,
-        template_sets_in,
-        headers_in,
-        templates_total_times_in,
-        template_sets_times_in,
-        headers_times_in,
-    ) = prepare_data()
-
-    generate_graph(EXP_TEMPLATE_INST_DIR, templates_total_times_in)
-    generate_graph(EXP_TEMPLATE_SET_DIR, template_sets_times_in)
-    generate_graph(EXP_HEADERS_DIR, headers_times_in)
-
-    last_builds_in = generate_last_build_table()
-    create_md_build_page(last_builds_in, templates_in, template_sets_in, headers_in)
-    create_md_perf_page(last_builds_in)
+        templates,
+        template_sets,
+        headers,
+        templates_total_times,
+        template_sets_times,
+        headers_times,
+        header_records,
+    ) = prepare_data(snapshot, directory_totals)
+
+    generate_graph(EXP_TEMPLATE_INST_DIR, templates_total_times)
+    generate_graph(EXP_TEMPLATE_SET_DIR, template_sets_times)
+    generate_graph(EXP_HEADERS_DIR, headers_times)
+
+    timeline = analyze_ninja_log(VT_BUILD_FOLDER)
+    build_sections = [
+        ("Build Timeline", generate_build_timeline_section(timeline)),
+        (
+            "Compiler Memory",
+            generate_compile_memory_section(read_compile_jobs(VT_BUILD_FOLDER)),
+        ),
+        (
+            "Header What-if",
+            generate_header_whatif_section(
+                header_records,
+                timeline,
+                sum(len(files) for files in directory_totals.values()),
+            ),
+        ),
+        (
+            "Build Configurations",
+            generate_build_matrix_section(read_matrix_results(MATRIX_BUILD_FOLDER)),
+        ),
+        (
+            "Header Edit Cost",
+            generate_edit_cost_section(read_results(VT_BUILD_FOLDER)),
+        ),
+        (
+            "Compile Time by Directory",
+            generate_directory_section(directory_totals),
+        ),
+        (
+            "Templates by Primary Template",
+            generate_template_groups_section(snapshot),
+        ),
+        ("What changed since last run", generate_changes_section(snapshot)),
+    ]
+
+    last_builds = generate_last_build_table()
+    create_md_build_page(last_builds, build_sections, templates, template_sets, headers)
+    create_md_perf_page(last_builds)
+
+    return 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Header What-if and Header Edit Cost sections of the build stats page, from the
+what-if model (see header_whatif.py) and the incremental builds (see incremental_bench.py)
+"""
+
+from datetime import date
+from operator import attrgetter
+import pandas as pd
+from header_whatif import (
+    PCH_LOAD_FACTOR,
+    SPLIT_SAVED_FRACTION,
+    estimate_header_savings,
+    to_wall_time,
+)
+from history_store import open_history_store
+from incremental_bench import INCREMENTAL_BUDGET_S, OK, IncrementalBuild
+from ninja_log import BUILD_CORES
+from wiki_common import (
+    CONFIG,
+    NUM_TOP_RESULTS,
+    OUTPUT_DIR,
+    RUN_NUM,
+    strip_relative_path,
+)
+
+INCREMENTAL_BUILDS_TABLE = "incremental_builds"
+
+
+def generate_header_whatif_section(header_records, timeline, num_tus):
+    """
+    Ranked estimates of compile time saved by changing the expensive headers,
+    num_tus is the number of translation units of the build
+    """
+
+    # Average number of jobs running at the same time, if the build timeline is known
+    if timeline is not None:
+        parallelism = timeline.busy_ms / timeline.wall_ms
+        parallelism_source = f"measured average parallelism {parallelism:.2f}"
+    else:
+        parallelism = BUILD_CORES
+        parallelism_source = f"{BUILD_CORES} cores"
+
+    table = (
+        "| Label | Header | Included | Total (s) | Own (s) | Via headers | Includers "
+        "| PCH coverage | Precompiled header (s) | Forward declare (s) | Split (s) "
+        "| Best action | Wall time (s) |\n"
+        "|---|:---:|---|---|---|---|---|---|---|---|---|---|---|\n"
+    )
+    for idx, what_if in enumerate(
+        estimate_header_savings(header_records, num_tus)[:NUM_TOP_RESULTS]
+    ):
+        table += (
+            f"| **{idx}** | `{strip_relative_path(what_if.name)}` | {what_if.times} "
+            f"| {what_if.total_s:.1f} | {what_if.own_s:.1f} | {what_if.via_headers:.0%} "
+            f"| {what_if.includers} | {what_if.pch_coverage:.0%} | {what_if.pch_s:.1f} "
+            f"| {what_if.forward_declare_s:.1f} | {what_if.split_s:.1f} "
+            f"| {what_if.best_action} "
+            f"| **{to_wall_time(what_if.best_s, parallelism):.1f}** |\n"
+        )
+
+    return (
+        "Estimated compile time (CPU seconds) saved by changing how the header is "
+        "included, derived from its include chains:\n"
+        "- Precompiled header: the translation units which include the header (PCH "
+        "coverage) load it instead of parsing it, all other units pay for loading it too. "
+        f"Loading a PCH is assumed to cost {PCH_LOAD_FACTOR:.0%} of parsing the header.\n"
+        "- Forward declare: the inclusions through other headers (Via headers) are "
+        "removed.\n"
+        "- Split: the header's own time, without the expensive headers included through "
+        "it, is split between its distinct direct includers. With many includers each is "
+        f"assumed to skip {SPLIT_SAVED_FRACTION:.0%} of it, with one nothing.\n\n"
+        "Only the first include chains of a header are reported, they're extrapolated to "
+        "all of its inclusions. The estimates overlap, so they can't be added together.\n"
+        f"Wall time of the best action is the CPU time divided by the {parallelism_source}.\n\n"
+        f"{table}"
+    )
+
+
+def generate_edit_cost_section(results):
+    """Incremental rebuilds after touching the expensive headers, ranked by rebuild time"""
+
+    if results is None:
+        return (
+            "Incremental rebuilds are not measured (set `incremental_bench: true` "
+            "to measure them)\n"
+        )
+    if not results:
+        return "None of the expensive headers could be found for incremental rebuilds\n"
+
+    store = open_history_store(OUTPUT_DIR)
+    previous = {}
+    if store.exists(INCREMENTAL_BUILDS_TABLE):
+        history = store.read_last_runs(INCREMENTAL_BUILDS_TABLE, 1)
+        previous = dict(zip(history["header"], history["rebuild_s"]))
+
+    run_date = date.today().strftime("%d %B %Y")
+    store.append(
+        INCREMENTAL_BUILDS_TABLE,
+        pd.DataFrame(
+            [(RUN_NUM, run_date, CONFIG.commit, *result) for result in results],
+            columns=["run_num", "date", "commit", *IncrementalBuild._fields],
+        ),
+    )
+
+    table = (
+        "| Label | Header | Recompiled files | Relinked | Rebuild (s) "
+        "| Change since previous run (s) | Clean build parse time (s) |\n"
+        "|---|:---:|---|---|---|---|---|\n"
+    )
+    for idx, result in enumerate(
+        sorted(results, key=attrgetter("rebuild_s"), reverse=True)
+    ):
+        rebuild = f"**{result.rebuild_s:.1f}**"
+        if result.status != OK:
+            rebuild += f" ({result.status})"
+
+        change = "new"
+        if result.header in previous:
+            change = f"{result.rebuild_s - previous[result.header]:+.1f}"
+
+        table += (
+            f"| **{idx}** | `{strip_relative_path(result.header)}` | {result.recompiled} "
+            f"| {result.relinked} | {rebuild} | {change} | {result.total_ms / 1000:.1f} |\n"
+        )
+
+    return (
+        "Wall time of rebuilding after touching each of the most expensive headers, "
+        "i.e. what editing the header costs. Headers are measured in the order of "
+        f"their clean build cost until the budget of {INCREMENTAL_BUDGET_S:.0f}s "
+        "runs out.\n\n"
+        f"{table}"
+    )
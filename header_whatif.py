@@ -0,0 +1,188 @@
+"""
+"What-if" model of the compile time saved by changing how expensive headers are included
+
+For every expensive header the compile time that would be saved is estimated for:
+- precompiled header: the header goes into the PCH of the target, which every translation
+  unit (TU) loads. TUs which include the header only load it instead of parsing it, but
+  TUs which don't include it pay for loading it too, so a PCH pays off only for headers
+  included by a large part of the TUs.
+- forward declaration: includes of the header from other headers are replaced with
+  forward declarations, so only the sources which need the definitions include it
+- split: the header is split in parts, so each includer parses only the part it needs.
+  Only the header's own time is split (the other reported headers it includes are
+  estimated on their own), and a header with a single direct includer can't be split
+  between includers.
+
+All of it is derived from the include chains of the report:
+- the fraction of the inclusions which come through other headers
+- the distinct direct includers (the last header of a chain, or the TU for a source's
+  include)
+- the other reported headers included through the header, whose time is part of the
+  header's time (its own time is the rest)
+Only the first headerChain chains of each header are reported, so their split is
+extrapolated to all inclusions. The estimates of different headers and actions overlap,
+they can't be added together.
+"""
+
+from collections import Counter
+from typing import NamedTuple
+from ninja_log import BUILD_CORES
+
+PCH = "precompiled header"
+FORWARD_DECLARE = "forward declare"
+SPLIT = "split"
+
+# Cost of loading the header from a PCH relative to parsing it
+PCH_LOAD_FACTOR = 0.1
+# Part of the header's own code which an includer doesn't need after splitting it,
+# when each of many includers needs a different part
+SPLIT_SAVED_FRACTION = 0.5
+# Includer of the chains of a source's direct include reported without the source
+DIRECT_INCLUDER = "<source>"
+
+
+class HeaderWhatIf(NamedTuple):
+    """Estimated savings of the actions that reduce a header's cost"""
+
+    name: str
+    times: int
+    total_s: float
+    # Time of parsing the header without the other reported headers included through it
+    own_s: float
+    # Fraction of inclusions which come through other headers
+    via_headers: float
+    # Distinct direct includers in the chains
+    includers: int
+    # Fraction of the TUs which include the header, i.e. which would use it from a PCH
+    pch_coverage: float
+    # Estimated CPU time saved by each action, in seconds
+    pch_s: float
+    forward_declare_s: float
+    split_s: float
+
+    @property
+    def best_action(self):
+        savings = {
+            PCH: self.pch_s,
+            FORWARD_DECLARE: self.forward_declare_s,
+            SPLIT: self.split_s,
+        }
+        return max(savings, key=savings.get)
+
+    @property
+    def best_s(self):
+        return max(self.pch_s, self.forward_declare_s, self.split_s)
+
+
+def is_source(includer):
+    # Chains from -ftime-trace start with the object file of the translation unit
+    return includer.endswith((".o", ".obj"))
+
+
+def get_via_headers(chains):
+    """Fraction of the chains' inclusions in which the header is included by a header"""
+
+    total = sum(chain.times for chain in chains)
+    if total == 0:
+        return 0.0
+
+    via_headers = sum(
+        chain.times
+        for chain in chains
+        if any(not is_source(includer) for includer in chain.includers)
+    )
+
+    return via_headers / total
+
+
+def get_direct_includers(chains):
+    """
+    Inclusions by every direct includer of the chains
+
+    Example input: [IncludeChain(12, ("a.cc.o", "b.h")), IncludeChain(3, ())]
+    Output: Counter({"b.h": 12, "<source>": 3})
+    """
+
+    includers = Counter()
+    for chain in chains:
+        includers[
+            chain.includers[-1] if chain.includers else DIRECT_INCLUDER
+        ] += chain.times
+
+    return includers
+
+
+def get_nested_times(records):
+    """
+    Total time (in seconds) of the reported headers included through every header.
+    The inclusions of a header through another one are extrapolated from its chains.
+    """
+
+    nested = Counter()
+    for record in records:
+        sampled = sum(chain.times for chain in record.chains)
+        if sampled == 0:
+            continue
+
+        through = Counter()
+        for chain in record.chains:
+            for includer in set(chain.includers):
+                if not is_source(includer):
+                    through[includer] += chain.times
+
+        for includer, times in through.items():
+            nested[includer] += times / sampled * record.total_ms / 1000
+
+    return nested
+
+
+def estimate_header(record, nested_s, num_tus):
+    """Estimate the savings for a single HeaderTime record"""
+
+    total_s = record.total_ms / 1000
+    avg_s = record.avg_ms / 1000
+    own_s = max(total_s - nested_s, 0.0)
+    via_headers = get_via_headers(record.chains)
+    num_includers = len(get_direct_includers(record.chains))
+    # With include guards a header is parsed once by every TU which includes it
+    including_tus = min(record.times, num_tus)
+    # Parsed once for the PCH, loaded by every TU
+    pch_loads_s = (num_tus - including_tus) * avg_s * PCH_LOAD_FACTOR
+    pch_saved_s = including_tus * avg_s * (1 - PCH_LOAD_FACTOR) - pch_loads_s - avg_s
+
+    return HeaderWhatIf(
+        record.name,
+        record.times,
+        total_s,
+        own_s,
+        via_headers,
+        num_includers,
+        including_tus / num_tus if num_tus else 0.0,
+        max(pch_saved_s, 0.0),
+        total_s * via_headers,
+        own_s * SPLIT_SAVED_FRACTION * (1 - 1 / max(num_includers, 1)),
+    )
+
+
+def estimate_header_savings(records, num_tus=0):
+    """
+    Return the estimates for the HeaderTime records, the most promising first.
+    num_tus is the number of TUs of the build, at least the most included header's count.
+    """
+
+    nested = get_nested_times(records)
+    num_tus = max([num_tus, *(record.times for record in records)])
+
+    return sorted(
+        (estimate_header(record, nested[record.name], num_tus) for record in records),
+        key=lambda what_if: what_if.best_s,
+        reverse=True,
+    )
+
+
+def to_wall_time(cpu_s, parallelism=BUILD_CORES):
+    """
+    Wall time saved by removing cpu_s of compile time from a build which runs
+    on average `parallelism` jobs at the same time
+    """
+    return cpu_s / parallelism
@@ -0,0 +1,386 @@
+"""
+Post-processing of the heaptrack profiles of every rank
+
+Running a program with 'mpirun -n x heaptrack' writes one profile per rank
+(heaptrack.<program>.<pid>.gz). Every profile is turned into the folded stacks of
+each cost type (allocations and leaked bytes) with heaptrack_print and rendered
+with flamegraph.pl, all ranks and cost types concurrently.
+
+The folded stacks are kept (gzipped) in the output directory, so that the next run
+can compare with them:
+- allocation sites: the costs of the stacks summed by their innermost frame (the
+  function which allocated) across all ranks, the top INPUT_HEAPTRACK_TOP_SITES of
+  them and the sites that grew the most since the previous run
+- differential flamegraphs: the current stacks colored by their change (red grew,
+  blue shrank) since the previous run
+The results are listed in heaptrack.json, which the wiki page is generated from.
+
+Example: heaptrack_report.py -f FlameGraph/flamegraph.pl heaptrack.jacobi2d_vt.*
+"""
+
+import argparse
+import gzip
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from operator import attrgetter
+from typing import List, NamedTuple
+import numpy as np
+from config import get_config
+
+CONFIG = get_config()
+HEAPTRACK_TOP_SITES = CONFIG.heaptrack_top_sites
+HEAPTRACK_JOBS = CONFIG.num_graph_jobs
+
+HEAPTRACK_FILENAME = "heaptrack.json"
+HEAPTRACK_FILE_RE = re.compile(r"heaptrack\.(.+)\.(\d+)\.(?:gz|zst)$")
+
+ALLOCATIONS = "allocations"
+LEAKED = "leaked"
+# heaptrack_print's cost type: flamegraph title and unit
+COST_TYPES = {
+    ALLOCATIONS: ("number of allocations", "allocations"),
+    LEAKED: ("number of bytes leaked", "bytes"),
+}
+
+
+class AllocationSite(NamedTuple):
+    """Costs of a function which allocates, summed across the ranks"""
+
+    site: str
+    allocations: int
+    leaked: int
+    # Since the previous run, NaN when there is no previous run
+    allocations_change: float
+    leaked_change: float
+
+
+class HeaptrackReport(NamedTuple):
+    """Flamegraphs and allocation sites of a program's profiles"""
+
+    program: str
+    ranks: int
+    has_previous: bool
+    # Flamegraphs of every rank: one per cost type, then the differential ones
+    flamegraphs: List[List[str]]
+    top_sites: List[AllocationSite]
+    allocation_growth: List[AllocationSite]
+    leak_growth: List[AllocationSite]
+
+
+def find_profiles(file_names):
+    """
+    Group the heaptrack profiles by program, every program's profiles are ordered
+    by their process id (i.e. in the order the ranks were started)
+
+    Example input: heaptrack.jacobi2d_vt.1043.gz, heaptrack.jacobi2d_vt.1042.gz
+    Output: {"jacobi2d_vt": [heaptrack.jacobi2d_vt.1042.gz, heaptrack.jacobi2d_vt.1043.gz]}
+    """
+
+    profiles = {}
+    for file_name in file_names:
+        match = HEAPTRACK_FILE_RE.search(os.path.basename(file_name))
+        if match is not None:
+            profiles.setdefault(match[1], []).append((int(match[2]), file_name))
+
+    return {
+        program: [file_name for _, file_name in sorted(files)]
+        for program, files in sorted(profiles.items())
+    }
+
+
+def parse_folded(lines):
+    """
+    Sum the costs of the folded stacks
+
+    Example input: ["main;foo;bar 10", "main;foo;bar 5", "main;baz 3"]
+    Output: Counter({"main;foo;bar": 15, "main;baz": 3})
+    """
+
+    stacks = Counter()
+    for line in lines:
+        stack, _, cost = line.rstrip("\n").rpartition(" ")
+        if stack and cost.isdigit():
+            stacks[stack] += int(cost)
+
+    return stacks
+
+
+def read_folded(file_name):
+    """Return the stacks of the gzipped folded file, None if there is none"""
+
+    if not os.path.exists(file_name):
+        return None
+
+    with gzip.open(file_name, "rt", encoding="utf-8") as file:
+        return parse_folded(file)
+
+
+def write_folded(stacks, file_name):
+    with gzip.open(file_name, "wt", encoding="utf-8") as file:
+        file.writelines(f"{stack} {cost}\n" for stack, cost in stacks.items())
+
+
+def get_sites(stacks):
+    """Sum the costs of the stacks by their innermost frame"""
+
+    sites = Counter()
+    for stack, cost in stacks.items():
+        sites[stack.rpartition(";")[2]] += cost
+
+    return sites
+
+
+def render_flamegraph(flamegraph, folded_text, title, unit, file_name):
+    """Render the folded stacks (with two costs per stack for a differential one)"""
+
+    with open(file_name, "w", encoding="utf-8") as file:
+        subprocess.run(
+            [
+                flamegraph,
+                f"--title={title}",
+                "--width=1920",
+                "--colors=mem",
+                f"--countname={unit}",
+            ],
+            input=folded_text,
+            stdout=file,
+            text=True,
+            check=True,
+        )
+
+
+def process_profile(profile, program, rank, cost_type, options):
+    """
+    Fold the rank's profile by the cost type and render its flamegraphs.
+    Returns the current and the previous stacks and the rendered files.
+    """
+
+    output_dir, flamegraph = options
+    name = f"{program}_{cost_type}_{rank}"
+    folded_file = os.path.join(output_dir, f"heaptrack_{name}.folded.gz")
+    previous = read_folded(folded_file)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        folded_out = os.path.join(temp_dir, "folded")
+        # The text report on stdout isn't used
+        subprocess.run(
+            [
+                "heaptrack_print",
+                "-f",
+                profile,
+                "-F",
+                folded_out,
+                "--flamegraph-cost-type",
+                cost_type,
+            ],
+            stdout=subprocess.DEVNULL,
+            check=True,
+        )
+        with open(folded_out, encoding="utf-8", errors="replace") as file:
+            stacks = parse_folded(file)
+
+    write_folded(stacks, folded_file)
+
+    description, unit = COST_TYPES[cost_type]
+    images = [f"flame_heaptrack_{name}.svg"]
+    render_flamegraph(
+        flamegraph,
+        "".join(f"{stack} {cost}\n" for stack, cost in stacks.items()),
+        f"{program} rank:{rank} {description}",
+        unit,
+        os.path.join(output_dir, images[0]),
+    )
+
+    if previous is not None:
+        images.append(f"flame_heaptrack_{name}_diff.svg")
+        render_flamegraph(
+            flamegraph,
+            "".join(
+                f"{stack} {previous.get(stack, 0)} {stacks.get(stack, 0)}\n"
+                for stack in {**previous, **stacks}
+            ),
+            f"{program} rank:{rank} {description}, change since previous run",
+            unit,
+            os.path.join(output_dir, images[1]),
+        )
+
+    print(f"Processed {cost_type} of {program} rank {rank}")
+    return stacks, previous, images
+
+
+def compare_sites(current, previous, num_sites=HEAPTRACK_TOP_SITES):
+    """
+    Return the top sites by allocations, and the sites whose allocations and
+    leaked bytes grew the most. current and previous map cost types to the sites'
+    costs summed across the ranks, previous is None without a previous run.
+    """
+
+    def get_change(cost_type, site):
+        if previous is None:
+            return np.nan
+        return current[cost_type][site] - previous[cost_type][site]
+
+    # Sites which disappeared since the previous run aren't listed
+    sites = [
+        AllocationSite(
+            site,
+            current[ALLOCATIONS][site],
+            current[LEAKED][site],
+            get_change(ALLOCATIONS, site),
+            get_change(LEAKED, site),
+        )
+        for site in sorted(current[ALLOCATIONS].keys() | current[LEAKED].keys())
+    ]
+
+    def get_top(field):
+        # NaN changes (without a previous run) aren't > 0
+        return sorted(
+            (site for site in sites if getattr(site, field) > 0),
+            key=attrgetter(field),
+            reverse=True,
+        )[:num_sites]
+
+    return (
+        get_top("allocations"),
+        get_top("allocations_change"),
+        get_top("leaked_change"),
+    )
+
+
+def process_program(program, profiles, options, num_jobs=HEAPTRACK_JOBS):
+    """Process every rank's profile of the program concurrently"""
+
+    jobs = [
+        (rank, cost_type) for rank in range(len(profiles)) for cost_type in COST_TYPES
+    ]
+
+    # The work is done by heaptrack_print and flamegraph.pl, threads suffice
+    with ThreadPoolExecutor(max_workers=max(num_jobs, 1)) as executor:
+        results = list(
+            executor.map(
+                lambda job: process_profile(
+                    profiles[job[0]], program, job[0], job[1], options
+                ),
+                jobs,
+            )
+        )
+
+    current = {cost_type: Counter() for cost_type in COST_TYPES}
+    previous = {cost_type: Counter() for cost_type in COST_TYPES}
+    has_previous = True
+    flamegraphs = [[] for _ in profiles]
+
+    for (rank, cost_type), (stacks, previous_stacks, images) in zip(jobs, results):
+        current[cost_type].update(get_sites(stacks))
+        if previous_stacks is None:
+            has_previous = False
+        else:
+            previous[cost_type].update(get_sites(previous_stacks))
+        flamegraphs[rank].extend(images)
+
+    # Keep the flamegraphs of every rank ordered by cost type, differential ones last
+    flamegraphs = [
+        sorted(images, key=lambda image: image.endswith("_diff.svg"))
+        for images in flamegraphs
+    ]
+
+    return HeaptrackReport(
+        program,
+        len(profiles),
+        has_previous,
+        flamegraphs,
+        *compare_sites(current, previous if has_previous else None),
+    )
+
+
+def site_to_json(site):
+    return {
+        key: None if isinstance(value, float) and np.isnan(value) else value
+        for key, value in site._asdict().items()
+    }
+
+
+def write_reports(reports, file_name):
+    with open(file_name, "w", encoding="utf-8") as file:
+        json.dump(
+            [
+                {
+                    **report._asdict(),
+                    "top_sites": list(map(site_to_json, report.top_sites)),
+                    "allocation_growth": list(
+                        map(site_to_json, report.allocation_growth)
+                    ),
+                    "leak_growth": list(map(site_to_json, report.leak_growth)),
+                }
+                for report in reports
+            ],
+            file,
+            indent=2,
+        )
+
+
+def read_reports(file_name):
+    """Return the reports stored in the file or None if there are none"""
+
+    if not os.path.exists(file_name):
+        return None
+
+    def to_sites(sites):
+        return [
+            AllocationSite(
+                **{
+                    key: np.nan if value is None else value
+                    for key, value in site.items()
+                }
+            )
+            for site in sites
+        ]
+
+    with open(file_name, encoding="utf-8") as file:
+        return [
+            report._replace(
+                top_sites=to_sites(report.top_sites),
+                allocation_growth=to_sites(report.allocation_growth),
+                leak_growth=to_sites(report.leak_growth),
+            )
+            for report in (HeaptrackReport(**report) for report in json.load(file))
+        ]
+
+
+def add_arguments(parser):
+    parser.add_argument("profiles", nargs="*", help="heaptrack profiles of every rank")
+    parser.add_argument(
+        "-f", "--flamegraph", help="Path to flamegraph.pl", default="flamegraph.pl"
+    )
+    parser.add_argument(
+        "-o",
+        "--output_dir",
+        help="Directory of the flamegraphs and the folded stacks of the previous run",
+        default=".",
+    )
+
+
+def main(args):
+    write_reports(
+        [
+            process_program(program, profiles, (args.output_dir, args.flamegraph))
+            for program, profiles in find_profiles(args.profiles).items()
+        ],
+        os.path.join(args.output_dir, HEAPTRACK_FILENAME),
+    )
+
+    return 0
+
+
+if __name__ == "__main__":
+    parser_in = argparse.ArgumentParser(
+        description="Render flamegraphs of heaptrack profiles and compare their allocation sites with the previous run"
+    )
+    add_arguments(parser_in)
+    sys.exit(main(parser_in.parse_args()))
@@ -0,0 +1,64 @@
+"""
+Heaptrack section of the perf tests page (see heaptrack_report.py)
+"""
+
+from heaptrack_report import HEAPTRACK_TOP_SITES
+from wiki_common import create_image_hyperlink, format_bytes, format_number
+
+
+def generate_allocation_sites_table(sites):
+    table = (
+        "| | Allocation site | Allocations | Leaked "
+        "| Allocations since previous run | Leaked since previous run |\n"
+        "|---|---|---|---|---|---|\n"
+    )
+    for idx, site in enumerate(sites):
+        name = site.site.replace("|", r"\|")
+        table += (
+            f"| **{idx}** | `{name}` | **{site.allocations}** | {format_bytes(site.leaked)} "
+            f"| {format_number(site.allocations_change, '+,.0f')} "
+            f"| {format_number(site.leaked_change / 1024, '+,.1f', ' KiB')} |\n"
+        )
+
+    return table
+
+
+def generate_heaptrack_section(reports, perf_test_url):
+    """Allocation sites summed across the ranks and the flamegraphs of every rank"""
+
+    if not reports:
+        return ""
+
+    content = (
+        "# Heaptrack result\n"
+        "Following flamegraphs were generated using "
+        "[Heaptrack](https://github.com/KDE/heaptrack) and "
+        "[Flamegraph](https://github.com/brendangregg/FlameGraph). "
+        "Allocation sites are the innermost frames of the allocating stacks, "
+        "summed across the ranks. Differential flamegraphs show the change since "
+        "the previous run (red grew, blue shrank).\n"
+    )
+
+    for report in reports:
+        content += (
+            f"## {report.program} ({report.ranks} ranks)\n"
+            f"### Top {HEAPTRACK_TOP_SITES} allocation sites\n"
+            f"{generate_allocation_sites_table(report.top_sites)}"
+        )
+
+        if not report.has_previous:
+            content += "No previous run to compare with\n"
+        for title, sites in (
+            ("Biggest growth in allocations", report.allocation_growth),
+            ("Biggest growth in leaked bytes", report.leak_growth),
+        ):
+            if sites:
+                content += f"### {title}\n{generate_allocation_sites_table(sites)}"
+
+        for rank, images in enumerate(report.flamegraphs):
+            content += f"### {report.program} rank: {rank}\n" + "".join(
+                f"{create_image_hyperlink(f'{perf_test_url}{image}')}\n"
+                for image in images
+            )
+
+    return content
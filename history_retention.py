@@ -0,0 +1,171 @@
+"""
+Tiered retention of the build times history
+
+The most recent runs are kept at full resolution. Whole days which fall out of that
+window are replaced with daily rollups (median, p10, p90 and count) and daily rollups
+older than INPUT_DAILY_ROLLUP_DAYS are merged into weekly ones. The size of the
+history therefore stays bounded while still covering years of builds.
+"""
+
+import pandas as pd
+from config import get_config
+from history_store import BUILD_TIMES_TABLE
+
+CONFIG = get_config()
+FULL_RESOLUTION_RUNS = CONFIG.full_resolution_runs
+DAILY_ROLLUP_DAYS = CONFIG.daily_rollup_days
+
+DAILY_TABLE = f"{BUILD_TIMES_TABLE}_daily"
+WEEKLY_TABLE = f"{BUILD_TIMES_TABLE}_weekly"
+
+DATE_FORMAT = "%d %B %Y"
+ROLLUP_METRICS = ["vt", "tests", "total", "efficiency"]
+
+
+def get_dates(frame, column="date"):
+    return pd.to_datetime(frame[column], format=DATE_FORMAT, errors="coerce")
+
+
+def rollup_runs(history):
+    """
+    Example input:
+    vt,tests,run_num,date,commit
+    561,2290,2,16 April 2021,971fa98f
+    565,2310,3,16 April 2021,05d3b1c2
+
+    Output:
+    period,vt_median,vt_p10,vt_p90,...,total_p90,count,first_run,last_run
+    2021-04-16,563.0,561.4,564.6,...,2874.2,2,2,3
+    """
+
+    history = history.assign(
+        total=history["vt"] + history["tests"],
+        period=get_dates(history).dt.strftime("%Y-%m-%d"),
+    )
+    if "efficiency" not in history:
+        # Builds recorded before CPU times were captured
+        history["efficiency"] = float("nan")
+
+    grouped = history.groupby("period", sort=True)
+
+    rollups = {}
+    for metric in ROLLUP_METRICS:
+        rollups[f"{metric}_median"] = grouped[metric].median()
+        rollups[f"{metric}_p10"] = grouped[metric].quantile(0.1)
+        rollups[f"{metric}_p90"] = grouped[metric].quantile(0.9)
+
+    rollups["count"] = grouped.size()
+    rollups["first_run"] = grouped["run_num"].min()
+    rollups["last_run"] = grouped["run_num"].max()
+
+    return pd.DataFrame(rollups).reset_index()
+
+
+def weighted_quantile(values, weights, quantile):
+    valid = values.notna()
+    if not valid.any():
+        return float("nan")
+
+    values, weights = values[valid], weights[valid]
+    order = values.argsort()
+    cumulative = weights.iloc[order].cumsum()
+    return values.iloc[order][cumulative >= weights.sum() * quantile].iloc[0]
+
+
+def combine_rollups(rollups, periods):
+    """
+    Merge rollup rows which belong to the same period. Exact quantiles can't be
+    recovered from rollups, so they're approximated with count-weighted quantiles
+    of the rolled up ones, e.g. p10 of the p10 values. This is exact when each
+    rollup holds a single run.
+    """
+
+    combined = []
+    for period, group in rollups.assign(period=periods).groupby("period", sort=True):
+        row = {"period": period}
+        for metric in ROLLUP_METRICS:
+            for name, quantile in (("median", 0.5), ("p10", 0.1), ("p90", 0.9)):
+                row[f"{metric}_{name}"] = weighted_quantile(
+                    group[f"{metric}_{name}"], group["count"], quantile
+                )
+
+        row["count"] = group["count"].sum()
+        row["first_run"] = group["first_run"].min()
+        row["last_run"] = group["last_run"].max()
+        combined.append(row)
+
+    return pd.DataFrame(combined, columns=rollups.columns)
+
+
+def read_table(store, table):
+    return store.read(table) if store.exists(table) else None
+
+
+def apply_retention(
+    store, full_resolution_runs=FULL_RESOLUTION_RUNS, daily_days=DAILY_ROLLUP_DAYS
+):
+    """Move the expired runs from the build times history to the rollup tables"""
+
+    history = store.read(BUILD_TIMES_TABLE)
+    if len(history) <= full_resolution_runs:
+        return
+
+    # Only whole days are rolled up, so that every day is rolled up exactly once
+    dates = get_dates(history)
+    first_kept_date = dates.iloc[-full_resolution_runs]
+    expired = (history.index < len(history) - full_resolution_runs) & (
+        dates < first_kept_date
+    )
+
+    if not expired.any():
+        return
+
+    daily = rollup_runs(history[expired])
+    previous_daily = read_table(store, DAILY_TABLE)
+    if previous_daily is not None:
+        daily = pd.concat([previous_daily, daily], ignore_index=True)
+        daily = combine_rollups(daily, daily["period"])
+
+    # Merge whole weeks of old daily rollups into weekly ones
+    days = pd.to_datetime(daily["period"])
+    weeks = days.dt.to_period("W").dt.start_time
+    cutoff = days.max() - pd.Timedelta(days=daily_days)
+    to_weekly = (weeks + pd.Timedelta(days=7)) <= cutoff
+
+    if to_weekly.any():
+        weekly = daily[to_weekly]
+        weekly_periods = weeks[to_weekly].dt.strftime("%Y-%m-%d")
+        previous_weekly = read_table(store, WEEKLY_TABLE)
+        if previous_weekly is not None:
+            weekly = pd.concat([previous_weekly, weekly], ignore_index=True)
+            weekly_periods = pd.concat(
+                [previous_weekly["period"], weekly_periods], ignore_index=True
+            )
+
+        store.write(WEEKLY_TABLE, combine_rollups(weekly, weekly_periods))
+        daily = daily[~to_weekly]
+
+    print(
+        f"Rolled up {expired.sum()} runs older than {first_kept_date:%d %B %Y}, "
+        f"{to_weekly.sum()} daily rollups merged into weekly ones"
+    )
+
+    store.write(DAILY_TABLE, daily)
+    store.write(BUILD_TIMES_TABLE, history[~expired])
+
+
+def read_long_term_history(store):
+    """
+    Return rollups covering the whole history: the weekly and daily tables followed
+    by daily rollups of the runs which are still kept at full resolution
+    """
+
+    rollups = [
+        read_table(store, WEEKLY_TABLE),
+        read_table(store, DAILY_TABLE),
+        rollup_runs(store.read(BUILD_TIMES_TABLE)),
+    ]
+
+    return pd.concat(
+        [rollup for rollup in rollups if rollup is not None], ignore_index=True
+    )
@@ -0,0 +1,298 @@
+"""
+Storage for the results of previous runs (build times and performance tests)
+
+Each kind of history is kept in a separate table and two backends are available:
+- csv: one CSV file per table (the original format), new rows are appended to the end
+  of the file, so neither the file nor its diff in the wiki repo is rewritten
+- sqlite: one SQLite database for all tables, indexed by run number, commit and test
+  name. Existing CSV files are imported the first time a table is accessed.
+
+Both backends provide reading of the last N rows/runs without parsing the whole history.
+"""
+
+import argparse
+import glob
+import io
+import os
+import sqlite3
+from contextlib import closing
+import pandas as pd
+from config import get_config
+
+CONFIG = get_config()
+HISTORY_BACKEND = CONFIG.history_backend
+HISTORY_DB_FILENAME = CONFIG.history_db_filename
+
+BUILD_TIMES_TABLE = "build_times"
+INDEX_COLUMNS = ("run_num", "commit", "name")
+
+# Size of the chunk read from the end of CSV file when looking for the last rows
+TAIL_CHUNK_SIZE = 64 * 1024
+
+
+def get_history_table(test_file_name):
+    return f"{test_file_name}_history"
+
+
+def keep_last_rows(frame, keep_last):
+    return frame if keep_last is None else frame.tail(keep_last)
+
+
+def read_csv_tail(file_name, num_rows):
+    """Read only the header and the last num_rows rows of a CSV file"""
+
+    with open(file_name, "rb") as file:
+        header = file.readline()
+        header_end = file.tell()
+
+        file.seek(0, os.SEEK_END)
+        position = file.tell()
+        data = b""
+
+        # Read the file backwards until it contains enough lines
+        while position > header_end and data.count(b"\n") <= num_rows:
+            chunk_size = min(TAIL_CHUNK_SIZE, position - header_end)
+            position -= chunk_size
+            file.seek(position)
+            data = file.read(chunk_size) + data
+
+    lines = data.splitlines(keepends=True)[-num_rows:] if num_rows > 0 else []
+    return pd.read_csv(io.BytesIO(header + b"".join(lines)))
+
+
+class CsvHistoryStore:
+    """History tables stored as CSV files in a directory"""
+
+    def __init__(self, directory, file_names=None):
+        self.directory = directory
+        self.file_names = file_names or {}
+
+    def path(self, table):
+        return os.path.join(self.directory, self.file_names.get(table, f"{table}.csv"))
+
+    def exists(self, table):
+        return os.path.exists(self.path(table))
+
+    def append(self, table, frame, keep_last=None):
+        """
+        Append the rows to the table. When keep_last is set, only that many
+        last rows are kept and the file is rewritten.
+        """
+
+        file_name = self.path(table)
+
+        if not os.path.exists(file_name):
+            keep_last_rows(frame, keep_last).to_csv(file_name, index=False)
+            return
+
+        with open(file_name, encoding="utf-8") as file:
+            columns = file.readline().strip().split(",")
+
+        if keep_last is None and columns == list(frame.columns):
+            frame.to_csv(file_name, mode="a", header=False, index=False)
+            return
+
+        # Either the history is truncated or the columns have changed
+        updated = pd.concat([self.read(table), frame], ignore_index=True)
+        keep_last_rows(updated, keep_last).to_csv(file_name, index=False)
+
+    def write(self, table, frame):
+        """Replace the whole content of the table"""
+        frame.to_csv(self.path(table), index=False)
+
+    def read(self, table):
+        return pd.read_csv(self.path(table))
+
+    def read_tail(self, table, num_rows):
+        return read_csv_tail(self.path(table), num_rows)
+
+    def list_tables(self):
+        file_tables = {name: table for table, name in self.file_names.items()}
+        return [
+            file_tables.get(file_name, file_name[: -len(".csv")])
+            for file_name in sorted(os.listdir(self.directory))
+            if file_name.endswith(".csv")
+        ]
+
+    def read_last_runs(self, table, num_runs):
+        data_frame = self.read(table)
+        last_runs = data_frame["run_num"].drop_duplicates().tail(num_runs)
+        return data_frame[data_frame["run_num"].isin(last_runs)]
+
+
+class SqliteHistoryStore:
+    """History tables stored in a single SQLite database"""
+
+    def __init__(self, db_path, legacy_store=None):
+        self.db_path = db_path
+        self.legacy_store = legacy_store
+
+    def connect(self):
+        # Perf test graphs are rendered by concurrent processes
+        return closing(sqlite3.connect(self.db_path, timeout=60))
+
+    @staticmethod
+    def has_table(connection, table):
+        cursor = connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+        )
+        return cursor.fetchone() is not None
+
+    @staticmethod
+    def add_missing_columns(connection, table, frame):
+        """Create the table, its index or its new columns if needed"""
+
+        columns = [
+            row[1] for row in connection.execute(f'PRAGMA table_info("{table}")')
+        ]
+
+        if not columns:
+            frame.head(0).to_sql(table, connection, index=False)
+            index_columns = [name for name in INDEX_COLUMNS if name in frame.columns]
+            if index_columns:
+                quoted_columns = ", ".join(f'"{name}"' for name in index_columns)
+                connection.execute(
+                    f'CREATE INDEX "{table}_index" ON "{table}" ({quoted_columns})'
+                )
+            return
+
+        for column in frame.columns:
+            if column not in columns:
+                connection.execute(f'ALTER TABLE "{table}" ADD COLUMN "{column}"')
+
+    def import_csv(self, connection, table, file_name):
+        print(f"Importing {file_name} into {self.db_path} table {table}")
+        for chunk in pd.read_csv(file_name, chunksize=10000):
+            self.add_missing_columns(connection, table, chunk)
+            chunk.to_sql(table, connection, if_exists="append", index=False)
+
+    def ensure_imported(self, connection, table):
+        if self.has_table(connection, table):
+            return True
+
+        if self.legacy_store is not None and self.legacy_store.exists(table):
+            self.import_csv(connection, table, self.legacy_store.path(table))
+            connection.commit()
+            return True
+
+        return False
+
+    def exists(self, table):
+        with self.connect() as connection:
+            return self.ensure_imported(connection, table)
+
+    def append(self, table, frame, keep_last=None):
+        with self.connect() as connection:
+            self.ensure_imported(connection, table)
+            self.add_missing_columns(connection, table, frame)
+            frame.to_sql(table, connection, if_exists="append", index=False)
+
+            if keep_last is not None:
+                connection.execute(
+                    f'DELETE FROM "{table}" WHERE rowid NOT IN '
+                    f'(SELECT rowid FROM "{table}" ORDER BY rowid DESC LIMIT ?)',
+                    (keep_last,),
+                )
+
+            connection.commit()
+
+    def write(self, table, frame):
+        """Replace the whole content of the table"""
+
+        with self.connect() as connection:
+            connection.execute(f'DROP TABLE IF EXISTS "{table}"')
+            self.add_missing_columns(connection, table, frame)
+            frame.to_sql(table, connection, if_exists="append", index=False)
+            connection.commit()
+
+    def list_tables(self):
+        """Tables of the database and the CSV files which weren't imported yet"""
+
+        with self.connect() as connection:
+            tables = [
+                row[0]
+                for row in connection.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name"
+                )
+            ]
+
+        if self.legacy_store is not None:
+            tables += [
+                table
+                for table in self.legacy_store.list_tables()
+                if table not in tables
+            ]
+
+        return tables
+
+    def query(self, table, query, params=()):
+        with self.connect() as connection:
+            self.ensure_imported(connection, table)
+            return pd.read_sql_query(query, connection, params=params)
+
+    def read(self, table):
+        return self.query(table, f'SELECT * FROM "{table}" ORDER BY rowid')
+
+    def read_tail(self, table, num_rows):
+        data_frame = self.query(
+            table,
+            f'SELECT * FROM (SELECT rowid AS _rowid, * FROM "{table}" '
+            "ORDER BY rowid DESC LIMIT ?) ORDER BY _rowid",
+            (num_rows,),
+        )
+        return data_frame.drop(columns="_rowid").reset_index(drop=True)
+
+    def read_last_runs(self, table, num_runs):
+        return self.query(
+            table,
+            f'SELECT * FROM "{table}" WHERE run_num IN '
+            f'(SELECT DISTINCT run_num FROM "{table}" '
+            "ORDER BY CAST(run_num AS INTEGER) DESC LIMIT ?) ORDER BY rowid",
+            (num_runs,),
+        )
+
+
+def open_history_store(directory, file_names=None, backend=None):
+    """
+    Create the history store configured with INPUT_HISTORY_BACKEND.
+    file_names maps table names to CSV file names, when they differ from '<table>.csv'
+    """
+
+    csv_store = CsvHistoryStore(directory, file_names)
+
+    if (backend or HISTORY_BACKEND) == "sqlite":
+        return SqliteHistoryStore(
+            os.path.join(directory, HISTORY_DB_FILENAME), csv_store
+        )
+
+    return csv_store
+
+
+def import_histories(directory, build_times_filename):
+    """Import the build times and all '*_history.csv' files from directory"""
+
+    file_names = {BUILD_TIMES_TABLE: build_times_filename}
+    for file_name in glob.glob(os.path.join(directory, "*_history.csv")):
+        file_names[os.path.basename(file_name)[: -len(".csv")]] = os.path.basename(
+            file_name
+        )
+
+    store = open_history_store(directory, file_names, backend="sqlite")
+    for table in file_names:
+        store.exists(table)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Import CSV history files into SQLite history store"
+    )
+    parser.add_argument("directory", help="Directory with the CSV files")
+    parser.add_argument(
+        "-b",
+        "--build_times_filename",
+        help="Name of build times file",
+        default=CONFIG.build_times_filename,
+    )
+    args = parser.parse_args()
+
+    import_histories(args.directory, args.build_times_filename)
@@ -0,0 +1,263 @@
+"""
+Incremental rebuild benchmark of the most expensive headers
+
+For each of the top headers of the "Expensive headers" report the header is touched
+and the build is run again, recording how many translation units were recompiled and
+how long the rebuild took. That's the cost of editing the header, which is what
+developers wait for every day, so it shows where splitting headers pays off most.
+
+The number of recompiled files is taken from a ninja dry run (`ninja -n`) before each
+rebuild, so the benchmark needs the Ninja generator. Headers are benchmarked until the
+time budget runs out. The ninja and compile monitor logs are restored afterwards, so
+the build timeline and compiler memory reports show only the clean build.
+"""
+
+import argparse
+import csv
+import os
+import re
+import shutil
+import signal
+import subprocess
+import time
+from typing import NamedTuple
+from build_report_parser import HEADERS, read_report
+from compile_memory import COMPILE_MONITOR_FILENAME
+from config import get_config
+from ninja_log import NINJA_LOG_FILENAME
+from time_trace import collect_traces, to_records
+
+CONFIG = get_config()
+NUM_INCREMENTAL_HEADERS = CONFIG.num_incremental_headers
+INCREMENTAL_BUDGET_S = CONFIG.incremental_budget_s
+INCREMENTAL_BUILDS_FILENAME = "incremental_builds.csv"
+
+OK = "ok"
+FAILED = "failed"
+TIMEOUT = "timeout"
+
+# Ninja's status line, e.g. '[3/120] Building CXX object src/CMakeFiles/vt.dir/...'
+NINJA_STATUS_RE = re.compile(r"^\[\d+/\d+\] (\w+)")
+COMPILE_STATUS = "Building"
+LINK_STATUS = "Linking"
+
+
+class IncrementalBuild(NamedTuple):
+    """Rebuild after touching an expensive header"""
+
+    header: str
+    # Inclusions and total parse time of the header in the clean build
+    times: int
+    total_ms: int
+    recompiled: int
+    relinked: int
+    rebuild_s: float
+    status: str
+
+
+def read_expensive_headers(
+    build_folder, report=None, num_headers=NUM_INCREMENTAL_HEADERS
+):
+    """Return the HeaderTime records of the top headers, from the report or the traces"""
+
+    if report is not None:
+        records = read_report(report)
+    else:
+        records = to_records(collect_traces(build_folder))
+
+    headers = [record for record in records if record.section == HEADERS]
+    return sorted(headers, key=lambda header: header.total_ms, reverse=True)[
+        :num_headers
+    ]
+
+
+def resolve_header(name, build_folder, source_folder):
+    """
+    Find the header on disk. Names in the report are either absolute or relative to
+    the build folder, if neither exists the name (without leading '../') is looked up
+    relative to the source folder and its parent.
+    """
+
+    candidates = [name, os.path.join(build_folder, name)]
+
+    stripped = name
+    while stripped.startswith("../"):
+        stripped = stripped[3:]
+    candidates += [
+        os.path.join(source_folder, stripped),
+        os.path.join(os.path.dirname(source_folder), stripped),
+    ]
+
+    for candidate in candidates:
+        if os.path.isfile(candidate):
+            return os.path.normpath(candidate)
+
+    return None
+
+
+def count_pending_jobs(build_folder):
+    """Return the number of compile and link jobs which the next build would run"""
+
+    output = subprocess.run(
+        ["cmake", "--build", build_folder, "--", "-n"],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+
+    statuses = [
+        match[1] for match in map(NINJA_STATUS_RE.match, output.splitlines()) if match
+    ]
+
+    return statuses.count(COMPILE_STATUS), statuses.count(LINK_STATUS)
+
+
+def rebuild(build_folder, timeout):
+    """
+    Run the build and return its status and wall time. The build runs in its own
+    process group, so that on timeout ninja and the compilers are killed with cmake
+    and don't overlap the following builds or write the restored logs.
+    """
+
+    start = time.perf_counter()
+    with subprocess.Popen(
+        ["cmake", "--build", build_folder],
+        stdout=subprocess.DEVNULL,
+        start_new_session=True,
+    ) as process:
+        try:
+            status = OK if process.wait(timeout=timeout) == 0 else FAILED
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+            process.wait()
+            status = TIMEOUT
+
+    return status, round(time.perf_counter() - start, 3)
+
+
+def touch(file_name):
+    os.utime(file_name)
+
+
+def run_benchmark(headers, build_folder, source_folder, budget_s=INCREMENTAL_BUDGET_S):
+    """Touch each header and time the rebuild, until the budget is exceeded"""
+
+    # Start from an up-to-date build, so only the header's dependents are rebuilt
+    rebuild(build_folder, None)
+
+    results = []
+    deadline = time.perf_counter() + budget_s
+
+    for header in headers:
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            print(
+                f"Time budget of {budget_s:.0f}s exceeded, skipping remaining headers"
+            )
+            break
+
+        file_name = resolve_header(header.name, build_folder, source_folder)
+        if file_name is None:
+            print(f"Header {header.name} not found, skipping")
+            continue
+
+        touch(file_name)
+        recompiled, relinked = count_pending_jobs(build_folder)
+        status, rebuild_s = rebuild(build_folder, remaining)
+
+        print(
+            f"{file_name}: {recompiled} files recompiled, {relinked} relinked in "
+            f"{rebuild_s:.1f}s ({status})"
+        )
+        results.append(
+            IncrementalBuild(
+                header.name,
+                header.times,
+                header.total_ms,
+                recompiled,
+                relinked,
+                rebuild_s,
+                status,
+            )
+        )
+
+        # An interrupted build would be finished by the next header's rebuild
+        if status == TIMEOUT:
+            break
+
+    return results
+
+
+def write_results(results, file_name):
+    with open(file_name, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(IncrementalBuild._fields)
+        writer.writerows(results)
+
+
+def read_results(build_folder):
+    """Return the results stored in the build folder or None if there are none"""
+
+    file_name = os.path.join(build_folder, INCREMENTAL_BUILDS_FILENAME)
+    if not os.path.exists(file_name):
+        return None
+
+    with open(file_name, newline="", encoding="utf-8") as file:
+        return [
+            IncrementalBuild(
+                row["header"],
+                int(row["times"]),
+                int(row["total_ms"]),
+                int(row["recompiled"]),
+                int(row["relinked"]),
+                float(row["rebuild_s"]),
+                row["status"],
+            )
+            for row in csv.DictReader(file)
+        ]
+
+
+def backup_logs(build_folder):
+    """Copy the logs which the rebuilds append to, return (log, backup) pairs"""
+
+    backups = []
+    for log in (NINJA_LOG_FILENAME, COMPILE_MONITOR_FILENAME):
+        file_name = os.path.join(build_folder, log)
+        if os.path.exists(file_name):
+            shutil.copy2(file_name, f"{file_name}.bak")
+            backups.append((file_name, f"{file_name}.bak"))
+
+    return backups
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measure incremental rebuilds after touching the most expensive headers"
+    )
+    parser.add_argument(
+        "-b",
+        "--build_folder",
+        help="Build folder",
+        default=CONFIG.build_folder,
+    )
+    parser.add_argument("-s", "--source_folder", help="Source folder", required=True)
+    parser.add_argument(
+        "-r",
+        "--report",
+        help="ClangBuildAnalyzer's report (the -ftime-trace files are read without it)",
+    )
+    args = parser.parse_args()
+
+    logs = backup_logs(args.build_folder)
+    try:
+        write_results(
+            run_benchmark(
+                read_expensive_headers(args.build_folder, args.report),
+                args.build_folder,
+                args.source_folder,
+            ),
+            os.path.join(args.build_folder, INCREMENTAL_BUILDS_FILENAME),
+        )
+    finally:
+        for log_file, backup in logs:
+            os.replace(backup, log_file)
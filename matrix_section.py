@@ -0,0 +1,121 @@
+"""
+Build Configurations section of the build stats page (see build_matrix.py)
+"""
+
+import json
+from datetime import date
+import matplotlib.pyplot as plt
+import pandas as pd
+from build_matrix import OK as BUILD_OK
+from history_store import open_history_store
+from wiki_common import (
+    CONFIG,
+    OUTPUT_DIR,
+    REPO_NAME,
+    RUN_NUM,
+    convert_time,
+    create_image_hyperlink,
+)
+
+BUILD_MATRIX_GRAPH = f"{OUTPUT_DIR}/build_matrix.png"
+BUILD_MATRIX_TABLE = "build_matrix"
+
+
+def generate_build_matrix_graph(history):
+    """Build time of every configuration over the last runs"""
+
+    _, axis = plt.subplots(figsize=(19, 10))
+    for name, builds in history.groupby("name", sort=False):
+        axis.plot(builds["run_num"], builds["real"] / 60, marker="o", label=name)
+
+    axis.set_title("Build time by configuration")
+    axis.set_xlabel("Run number")
+    axis.set_ylabel("Build time (min)")
+    axis.grid(True)
+    axis.legend(fontsize=12)
+
+    plt.tight_layout()
+    plt.savefig(BUILD_MATRIX_GRAPH)
+    plt.close()
+
+
+def generate_build_matrix_section(builds):
+    """Configurations built by build_matrix.py side by side"""
+
+    if not builds:
+        return "No build configurations were built (set `build_matrix` to build them)\n"
+
+    store = open_history_store(OUTPUT_DIR)
+    num_runs = CONFIG.num_last_builds
+    previous = {}
+    if store.exists(BUILD_MATRIX_TABLE):
+        history = store.read_last_runs(BUILD_MATRIX_TABLE, num_runs)
+        history = history[
+            (history["run_num"] < RUN_NUM) & (history["status"] == BUILD_OK)
+        ]
+        previous = dict(zip(history["name"], history["real"]))
+
+    store.append(
+        BUILD_MATRIX_TABLE,
+        pd.DataFrame(
+            [
+                (
+                    RUN_NUM,
+                    date.today().strftime("%d %B %Y"),
+                    CONFIG.commit,
+                    *build[:-1],
+                    json.dumps(build.settings),
+                )
+                for build in builds
+            ],
+            columns=["run_num", "date", "commit", *builds[0]._fields],
+        ),
+    )
+    history = store.read_last_runs(BUILD_MATRIX_TABLE, num_runs)
+    generate_build_matrix_graph(history[history["status"] == BUILD_OK])
+
+    # Settings which differ between the configurations come first
+    titles = list(dict.fromkeys(title for build in builds for title in build.settings))
+    titles.sort(
+        key=lambda title: len({build.settings.get(title) for build in builds}) == 1
+    )
+
+    table = "".join(
+        [
+            "| Configuration | Target | Jobs | Build time | CPU time | Change since previous run ",
+            *(f"| {title} " for title in titles),
+            "|\n",
+            "|---" * (6 + len(titles)),
+            "|\n",
+        ]
+    )
+    for build in builds:
+        if build.status != BUILD_OK:
+            build_time, change = f"**{build.status}**", ""
+        else:
+            build_time = f"**{convert_time(build.real)}**"
+            change = (
+                f"{build.real - previous[build.name]:+.0f}s"
+                if build.name in previous
+                else "new"
+            )
+
+        cpu_time = (
+            convert_time(build.user + build.sys) if build.status == BUILD_OK else ""
+        )
+        settings = "".join(f"| {build.settings.get(title, '')} " for title in titles)
+        table += (
+            f"| **{build.name}** | {build.target} | {build.jobs} | {build_time} "
+            f"| {cpu_time} | {change} {settings}|\n"
+        )
+
+    wiki_url = f"https://github.com/{REPO_NAME}/wiki"
+
+    return (
+        f"Every configuration was built with **{builds[0].jobs}** jobs, so their times "
+        "are comparable with each other but not with the main build. Configurations "
+        "built at the same time share the memory bandwidth and caches. Settings are read "
+        "from the CMake cache of each build.\n\n"
+        f"{table}\n"
+        f"{create_image_hyperlink(f'{wiki_url}/{BUILD_MATRIX_GRAPH}')}\n"
+    )
@@ -0,0 +1,198 @@
+"""
+Analysis of the memory usage series written by the perf tests (*_mem.csv)
+
+For the series of every rank:
+- peak: the highest memory usage
+- steady state: the median usage after the warm-up (the first INPUT_MEMORY_WARMUP
+  fraction of the iterations, where the allocations of the setup happen)
+- slope: growth per iteration after the warm-up, fitted with the Theil-Sen
+  estimator (median of the pairwise slopes), so single spikes don't skew it
+Ranks whose memory grows faster than INPUT_LEAK_THRESHOLD KiB per iteration are
+flagged as suspected leaks. The results of every run are appended to the
+memory_stats history table.
+
+Long series are downsampled for plotting with Largest-Triangle-Three-Buckets.
+"""
+
+import json
+import os
+from typing import NamedTuple
+import numpy as np
+import pandas as pd
+from config import get_config
+from rank_stats import add_iterations
+
+CONFIG = get_config()
+MEMORY_WARMUP = CONFIG.memory_warmup
+LEAK_THRESHOLD_KIB = CONFIG.leak_threshold_kib
+# Series longer than this are downsampled for plotting
+MAX_PLOT_POINTS = CONFIG.max_plot_points
+# The Theil-Sen slope is computed from at most this many (evenly spaced) samples
+MAX_SLOPE_SAMPLES = 1000
+
+MEMORY_STATS_TABLE = "memory_stats"
+MEMORY_STATS_FILENAME = "memory_stats.json"
+
+
+class MemoryStats(NamedTuple):
+    """Peak, steady state and growth of a rank's memory usage"""
+
+    test: str
+    node: int
+    iterations: int
+    peak_mib: float
+    steady_mib: float
+    slope_kib: float
+    leak: bool
+
+
+def theil_sen_slope(x_values, y_values):
+    """Median of the slopes between all pairs of points"""
+
+    x_values = np.asarray(x_values, dtype=float)
+    y_values = np.asarray(y_values, dtype=float)
+
+    if len(x_values) > MAX_SLOPE_SAMPLES:
+        samples = np.linspace(0, len(x_values) - 1, MAX_SLOPE_SAMPLES).astype(int)
+        x_values, y_values = x_values[samples], y_values[samples]
+
+    first, second = np.triu_indices(len(x_values), 1)
+    run = x_values[second] - x_values[first]
+    valid = run != 0
+    if not valid.any():
+        return np.nan
+
+    return float(np.median((y_values[second] - y_values[first])[valid] / run[valid]))
+
+
+def analyze_series(test, node, iterations, memory):
+    """Return MemoryStats of one rank's memory usage (in bytes) over the iterations"""
+
+    steady = iterations >= iterations.min() + MEMORY_WARMUP * np.ptp(iterations)
+    slope = (
+        theil_sen_slope(iterations[steady], memory[steady]) / 1024
+        if steady.sum() >= 2
+        else np.nan
+    )
+
+    return MemoryStats(
+        test,
+        int(node),
+        len(memory),
+        float(memory.max()) / 1024 / 1024,
+        float(np.median(memory[steady])) / 1024 / 1024,
+        slope,
+        bool(slope > LEAK_THRESHOLD_KIB),
+    )
+
+
+def analyze_memory(test, memory_df):
+    """Return MemoryStats of every rank of the memory file"""
+
+    memory_df = add_iterations(memory_df)
+
+    return [
+        analyze_series(
+            test,
+            node,
+            series["iteration"].to_numpy(),
+            series["mem"].to_numpy(dtype=float),
+        )
+        for node, series in memory_df.groupby("node")
+    ]
+
+
+def lttb_indices(x_values, y_values, num_points=MAX_PLOT_POINTS):
+    """
+    Indices of the points kept by Largest-Triangle-Three-Buckets downsampling.
+    The first and last points are kept, from each bucket in between the point which
+    forms the largest triangle with the averages of the neighbouring buckets (the
+    original algorithm uses the point selected in the previous bucket, the averages
+    allow selecting all points at once).
+    """
+
+    num_values = len(x_values)
+    if num_points >= num_values or num_points < 3:
+        return np.arange(num_values)
+
+    x_values = np.asarray(x_values, dtype=float)
+    y_values = np.asarray(y_values, dtype=float)
+
+    # Buckets of the inner points, bucket_starts are relative to the second point
+    edges = np.linspace(1, num_values - 1, num_points - 1).astype(int)
+    bucket_starts = edges[:-1] - 1
+    bucket_sizes = np.diff(edges)
+    buckets = np.repeat(np.arange(num_points - 2), bucket_sizes)
+
+    inner_x, inner_y = x_values[1:-1], y_values[1:-1]
+    mean_x = np.add.reduceat(inner_x, bucket_starts) / bucket_sizes
+    mean_y = np.add.reduceat(inner_y, bucket_starts) / bucket_sizes
+
+    # Averages of the previous and next bucket (the end points at the edges)
+    prev_x = np.concatenate([[x_values[0]], mean_x[:-1]])[buckets]
+    prev_y = np.concatenate([[y_values[0]], mean_y[:-1]])[buckets]
+    next_x = np.concatenate([mean_x[1:], [x_values[-1]]])[buckets]
+    next_y = np.concatenate([mean_y[1:], [y_values[-1]]])[buckets]
+
+    areas = np.abs(
+        (prev_x - next_x) * (inner_y - prev_y) - (prev_x - inner_x) * (next_y - prev_y)
+    )
+
+    # First point with the largest area in every bucket
+    largest = np.flatnonzero(
+        areas == np.maximum.reduceat(areas, bucket_starts)[buckets]
+    )
+    _, first = np.unique(buckets[largest], return_index=True)
+
+    return np.concatenate([[0], largest[first] + 1, [num_values - 1]])
+
+
+def append_history(store, stats, run_num, commit):
+    if not stats:
+        return
+
+    history = pd.DataFrame(stats, columns=MemoryStats._fields)
+    history.insert(0, "commit", commit)
+    history.insert(0, "run_num", run_num)
+
+    store.append(MEMORY_STATS_TABLE, history)
+
+
+def read_history(store, num_runs):
+    if not store.exists(MEMORY_STATS_TABLE):
+        return pd.DataFrame()
+
+    return store.read_last_runs(MEMORY_STATS_TABLE, num_runs)
+
+
+def write_stats(stats, file_name):
+    with open(file_name, "w", encoding="utf-8") as file:
+        json.dump(
+            [
+                {
+                    key: None if isinstance(value, float) and np.isnan(value) else value
+                    for key, value in memory_stats._asdict().items()
+                }
+                for memory_stats in stats
+            ],
+            file,
+            indent=2,
+        )
+
+
+def read_stats(file_name):
+    """Return the stats stored in the file or None if there are none"""
+
+    if not os.path.exists(file_name):
+        return None
+
+    with open(file_name, encoding="utf-8") as file:
+        return [
+            MemoryStats(
+                **{
+                    key: np.nan if value is None else value
+                    for key, value in memory_stats.items()
+                }
+            )
+            for memory_stats in json.load(file)
+        ]
@@ -0,0 +1,312 @@
+"""
+Analysis of the build timeline recorded by ninja in .ninja_log
+
+Every finished job is logged with its start and end time, so the log shows how
+the build was scheduled on the available cores: how long each object file took to
+compile or each binary to link, how many jobs were running at any time and which
+chain of jobs determined the total build time (the critical path).
+"""
+
+import csv
+import heapq
+import os
+from bisect import bisect_right
+from operator import attrgetter
+from typing import List, NamedTuple, Tuple
+import numpy as np
+from config import get_config
+
+NINJA_LOG_FILENAME = ".ninja_log"
+BUILD_CORES = get_config().build_cores
+
+COMPILE = "compile"
+LINK = "link"
+OTHER = "other"
+
+COMPILE_SUFFIXES = (".o", ".obj")
+LINK_SUFFIXES = (".a", ".so", ".dylib", ".lib", ".dll", ".exe")
+
+# Shorter periods with idle cores are not reported as gaps
+MIN_IDLE_GAP_MS = 5000
+NUM_GAP_TARGETS = 3
+
+
+class Job(NamedTuple):
+    """Build step recorded in .ninja_log"""
+
+    target: str
+    kind: str
+    session: int
+    # Times in milliseconds since the start of the first ninja session
+    start_ms: int
+    end_ms: int
+
+    @property
+    def duration_ms(self):
+        return self.end_ms - self.start_ms
+
+
+class IdleGap(NamedTuple):
+    """Period of the build in which cores were left idle"""
+
+    start_ms: int
+    end_ms: int
+    idle_core_ms: int
+    # Longest jobs running during the gap
+    targets: Tuple[str, ...]
+
+
+class BuildTimeline(NamedTuple):
+    """Jobs of the build with their parallelism over time"""
+
+    jobs: List[Job]
+    critical_path: List[Job]
+    # Number of running jobs from times[i] until times[i + 1]
+    times: np.ndarray
+    parallelism: np.ndarray
+    idle_gaps: List[IdleGap]
+    cores: int
+
+    @property
+    def wall_ms(self):
+        return int(self.times[-1] - self.times[0]) if len(self.times) else 0
+
+    @property
+    def busy_ms(self):
+        return sum(job.duration_ms for job in self.jobs)
+
+
+def get_kind(target):
+    name = os.path.basename(target)
+
+    if name.endswith(COMPILE_SUFFIXES):
+        return COMPILE
+
+    # Executables have no extension, shared libraries may be versioned (libfoo.so.1)
+    if name.endswith(LINK_SUFFIXES) or ".so." in name or "." not in name:
+        return LINK
+
+    return OTHER
+
+
+def read_ninja_log(file_name):
+    """
+    Parse .ninja_log and return list of sessions (ninja invocations),
+    each one a list of (start_ms, end_ms, target) entries.
+
+    Example input:
+    # ninja log v5
+    1	2051	1681312526000000000	src/CMakeFiles/vt.dir/vt/runtime.cc.o	8c8d0e8a0f31d1a5
+    3	1960	1681312526000000000	src/CMakeFiles/vt.dir/vt/context.cc.o	1f3b62cd9a1b04e7
+    """
+
+    sessions = []
+    last_end = 0
+
+    with open(file_name, encoding="utf-8") as file:
+        header = file.readline()
+        if not header.startswith("# ninja log v"):
+            raise ValueError(f"{file_name} is not a ninja log")
+
+        for line in file:
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) != 5:
+                continue
+
+            start, end, _, target, command_hash = fields
+            start, end = int(start), int(end)
+
+            # Jobs are logged when they finish and times restart with every ninja run
+            if not sessions or end < last_end:
+                sessions.append({})
+            last_end = end
+
+            # Outputs of the same job share times and command hash
+            sessions[-1].setdefault((start, end, command_hash), target)
+
+    return [
+        [(start, end, target) for (start, end, _), target in session.items()]
+        for session in sessions
+    ]
+
+
+def get_jobs(sessions):
+    """Place the sessions one after another on a single timeline"""
+
+    jobs = []
+    offset = 0
+
+    for session_index, session in enumerate(sessions):
+        for start, end, target in session:
+            jobs.append(
+                Job(
+                    target,
+                    get_kind(target),
+                    session_index,
+                    offset + start,
+                    offset + end,
+                )
+            )
+
+        offset += max(end for _, end, _ in session)
+
+    return sorted(jobs, key=attrgetter("start_ms"))
+
+
+def get_critical_path(jobs):
+    """
+    .ninja_log doesn't contain the dependencies, so the critical path is approximated:
+    starting with the job which finished last, the predecessor of each job is the job
+    which finished latest before it started
+    """
+
+    by_end = sorted(jobs, key=attrgetter("end_ms"))
+    ends = [job.end_ms for job in by_end]
+
+    path = []
+    index = len(by_end) - 1
+    while index >= 0:
+        job = by_end[index]
+        path.append(job)
+        index = bisect_right(ends, job.start_ms, hi=index) - 1
+
+    return path[::-1]
+
+
+def get_parallelism(jobs):
+    """Return the times at which the number of running jobs changes, and that number"""
+
+    times = np.array(
+        [job.start_ms for job in jobs] + [job.end_ms for job in jobs], dtype=np.int64
+    )
+    deltas = np.concatenate([np.ones(len(jobs)), -np.ones(len(jobs))]).astype(int)
+
+    unique_times, inverse = np.unique(times, return_inverse=True)
+    changes = np.zeros(len(unique_times), dtype=int)
+    np.add.at(changes, inverse, deltas)
+
+    return unique_times, np.cumsum(changes)
+
+
+def get_idle_gaps(jobs, times, parallelism, cores, min_gap_ms=MIN_IDLE_GAP_MS):
+    """Find periods in which fewer than `cores` jobs were running"""
+
+    durations = np.diff(times)
+    idle = np.maximum(cores - parallelism[:-1], 0)
+
+    gaps = []
+    gap_start = None
+
+    for index, idle_cores in enumerate(np.append(idle, 0)):
+        if idle_cores > 0 and gap_start is None:
+            gap_start = index
+        elif idle_cores == 0 and gap_start is not None:
+            start_ms, end_ms = int(times[gap_start]), int(times[index])
+            if end_ms - start_ms >= min_gap_ms:
+                running = sorted(
+                    (
+                        job
+                        for job in jobs
+                        if job.start_ms < end_ms and job.end_ms > start_ms
+                    ),
+                    key=attrgetter("duration_ms"),
+                    reverse=True,
+                )
+                gaps.append(
+                    IdleGap(
+                        start_ms,
+                        end_ms,
+                        int(np.dot(idle[gap_start:index], durations[gap_start:index])),
+                        tuple(job.target for job in running[:NUM_GAP_TARGETS]),
+                    )
+                )
+            gap_start = None
+
+    return gaps
+
+
+def analyze_ninja_log(build_folder, cores=BUILD_CORES):
+    """Return BuildTimeline of the build, or None when there's no usable .ninja_log"""
+
+    file_name = os.path.join(build_folder, NINJA_LOG_FILENAME)
+    if not os.path.exists(file_name):
+        print(f"{file_name} not found, skipping build timeline")
+        return None
+
+    jobs = get_jobs(read_ninja_log(file_name))
+    if not jobs:
+        print(f"{file_name} is empty, skipping build timeline")
+        return None
+
+    times, parallelism = get_parallelism(jobs)
+    timeline = BuildTimeline(
+        jobs,
+        get_critical_path(jobs),
+        times,
+        parallelism,
+        get_idle_gaps(jobs, times, parallelism, cores),
+        cores,
+    )
+
+    print(
+        f"Parsed {len(jobs)} jobs from {file_name}, wall time {timeline.wall_ms} ms, "
+        f"{len(timeline.critical_path)} jobs on critical path"
+    )
+
+    return timeline
+
+
+def assign_lanes(jobs):
+    """Assign each job to the lowest free lane (row of the Gantt chart)"""
+
+    free_lanes: List[int] = []
+    busy_lanes: List[Tuple[int, int]] = []
+    lanes = []
+    num_lanes = 0
+
+    for job in jobs:
+        while busy_lanes and busy_lanes[0][0] <= job.start_ms:
+            heapq.heappush(free_lanes, heapq.heappop(busy_lanes)[1])
+
+        if free_lanes:
+            lane = heapq.heappop(free_lanes)
+        else:
+            lane = num_lanes
+            num_lanes += 1
+
+        lanes.append(lane)
+        heapq.heappush(busy_lanes, (job.end_ms, lane))
+
+    return lanes
+
+
+def write_jobs(timeline, file_name):
+    """Store the per-target times as CSV"""
+
+    critical = set(timeline.critical_path)
+
+    with open(file_name, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(
+            [
+                "target",
+                "kind",
+                "session",
+                "start_ms",
+                "end_ms",
+                "duration_ms",
+                "critical",
+            ]
+        )
+        for job in timeline.jobs:
+            writer.writerow(
+                [
+                    job.target,
+                    job.kind,
+                    job.session,
+                    job.start_ms,
+                    job.end_ms,
+                    job.duration_ms,
+                    int(job in critical),
+                ]
+            )
@@ -0,0 +1,37 @@
+"""
+Manifest of the perf tests wiki page: the sections (title and images) rendered by
+generate_perf_graph.py, read by generate_wiki_pages.py without importing the graphs
+"""
+
+import json
+import os
+
+PERF_MANIFEST_FILENAME = "perf_manifest.json"
+
+
+def write_manifest(jobs, file_name=PERF_MANIFEST_FILENAME):
+    """Write the sections of the wiki page (title and images), ordered by title"""
+
+    sections = {}
+    for renderer in jobs.values():
+        sections.setdefault(renderer.title, []).extend(renderer.images)
+
+    with open(file_name, "w", encoding="utf-8") as file:
+        json.dump(
+            [
+                {"title": title, "images": images}
+                for title, images in sorted(sections.items())
+            ],
+            file,
+            indent=2,
+        )
+
+
+def read_manifest(file_name):
+    """Return the (title, images) sections or None if there is no manifest"""
+
+    if not os.path.exists(file_name):
+        return None
+
+    with open(file_name, encoding="utf-8") as file:
+        return [(section["title"], section["images"]) for section in json.load(file)]
@@ -0,0 +1,279 @@
+"""
+Detection of performance test regressions
+
+The latest result of every benchmark in the perf test histories is compared with the
+baseline formed by the results of the previous INPUT_PERF_BASELINE_RUNS runs, using
+Welch's t-test on the summary statistics:
+- baseline: the mean and variance of the previous runs' means
+- current: the run's mean and the variance of its repetitions (see perf_runner.py);
+  a single repetition is assumed to vary as much as the baseline runs, which turns
+  the test into a check whether the result lies in the baseline's prediction interval
+A change is significant when its p-value is below INPUT_PERF_ALPHA and it's at least
+INPUT_PERF_MIN_CHANGE percent. Higher times are regressions.
+
+Usage (from the directory with the histories): perf_regression.py
+"""
+
+import json
+import math
+import os
+import sys
+from typing import NamedTuple
+import numpy as np
+from build_regression import IMPROVED, REGRESSED, UNCHANGED, write_verdicts
+from config import get_config
+from history_store import open_history_store
+
+CONFIG = get_config()
+PERF_BASELINE_RUNS = CONFIG.perf_baseline_runs
+PERF_ALPHA = CONFIG.perf_alpha
+PERF_MIN_CHANGE = CONFIG.perf_min_change
+FAIL_ON_PERF_REGRESSION = CONFIG.fail_on_perf_regression
+
+PERF_REGRESSION_FILENAME = "perf_regression.json"
+HISTORY_SUFFIX = "_history"
+# Too few baseline runs to estimate their variance
+INSUFFICIENT = "insufficient history"
+
+# Continued fraction of the incomplete beta function
+MAX_ITERATIONS = 200
+EPSILON = 3e-14
+TINY = 1e-300
+
+
+class PerfVerdict(NamedTuple):
+    """Outcome of the t-test of a benchmark against its past runs"""
+
+    test: str
+    benchmark: str
+    status: str
+    change_percent: float
+    current: float
+    baseline: float
+    t_value: float
+    dof: float
+    p_value: float
+    baseline_runs: int
+
+
+def beta_continued_fraction(x, a, b):
+    """Continued fraction of the incomplete beta function (modified Lentz's method)"""
+
+    c = 1.0
+    d = 1.0 - (a + b) * x / (a + 1.0)
+    d = 1.0 / (d if abs(d) > TINY else TINY)
+    result = d
+
+    for m in range(1, MAX_ITERATIONS + 1):
+        # Even and odd steps of the fraction
+        for numerator in (
+            m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+            -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1)),
+        ):
+            d = 1.0 + numerator * d
+            d = 1.0 / (d if abs(d) > TINY else TINY)
+            c = 1.0 + numerator / c
+            c = c if abs(c) > TINY else TINY
+            delta = c * d
+            result *= delta
+
+        if abs(delta - 1.0) < EPSILON:
+            break
+
+    return result
+
+
+def incomplete_beta(x, a, b):
+    """Regularized incomplete beta function I_x(a, b)"""
+
+    if x <= 0.0:
+        return 0.0
+    if x >= 1.0:
+        return 1.0
+
+    log_front = math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b)
+    log_front += a * math.log(x)
+    log_front += b * math.log1p(-x)
+
+    # The continued fraction converges quickly only for x < (a + 1) / (a + b + 2)
+    if x < (a + 1.0) / (a + b + 2.0):
+        return math.exp(log_front) * beta_continued_fraction(x, a, b) / a
+
+    return 1.0 - math.exp(log_front) * beta_continued_fraction(1.0 - x, b, a) / b
+
+
+def t_test_p_value(t_value, dof):
+    """Two-sided p-value of Student's t distribution with dof degrees of freedom"""
+
+    if math.isinf(t_value):
+        return 0.0
+
+    return incomplete_beta(dof / (dof + t_value**2), dof / 2.0, 0.5)
+
+
+def welch_t_test(sample_1, sample_2):
+    """
+    Return t, degrees of freedom and two-sided p-value of Welch's t-test for two
+    samples given as (mean, variance, size). The size of the second sample may be 1
+    (its variance is then an assumption), the degrees of freedom are then those of
+    the first sample.
+    """
+
+    mean_1, var_1, n_1 = sample_1
+    mean_2, var_2, n_2 = sample_2
+    error_1 = var_1 / n_1
+    error_2 = var_2 / n_2
+    standard_error = math.sqrt(error_1 + error_2)
+
+    if standard_error == 0.0:
+        t_value = 0.0 if mean_2 == mean_1 else math.copysign(math.inf, mean_2 - mean_1)
+        return t_value, float(n_1 + n_2 - 2), 1.0 if t_value == 0.0 else 0.0
+
+    t_value = (mean_2 - mean_1) / standard_error
+
+    if n_2 > 1:
+        dof = (error_1 + error_2) ** 2 / (
+            error_1**2 / (n_1 - 1) + error_2**2 / (n_2 - 1)
+        )
+    else:
+        dof = float(n_1 - 1)
+
+    return t_value, dof, t_test_p_value(t_value, dof)
+
+
+def judge_benchmark(test, benchmark, history):
+    """
+    Judge the latest run of a benchmark. history holds its rows (mean, stdev and
+    optionally reps and rep_stdev) of the baseline runs followed by the current one.
+    """
+
+    current = history.iloc[-1]
+    baseline = history["mean"].to_numpy(dtype=float)[:-1]
+    baseline_mean = float(np.mean(baseline)) if len(baseline) else np.nan
+
+    if len(baseline) < 2:
+        return PerfVerdict(
+            test,
+            benchmark,
+            INSUFFICIENT,
+            np.nan,
+            float(current["mean"]),
+            baseline_mean,
+            np.nan,
+            np.nan,
+            np.nan,
+            len(baseline),
+        )
+
+    baseline_var = float(np.var(baseline, ddof=1))
+    # Results of older runs (or of a single repetition) have no spread of repetitions
+    reps = current.get("reps", np.nan)
+    rep_stdev = current.get("rep_stdev", np.nan)
+
+    if reps > 1 and not np.isnan(rep_stdev):
+        reps, current_var = int(reps), float(rep_stdev) ** 2
+    else:
+        reps, current_var = 1, baseline_var
+
+    t_value, dof, p_value = welch_t_test(
+        (baseline_mean, baseline_var, len(baseline)),
+        (float(current["mean"]), current_var, reps),
+    )
+    change = (current["mean"] - baseline_mean) / baseline_mean * 100.0
+
+    status = UNCHANGED
+    if p_value < PERF_ALPHA and abs(change) >= PERF_MIN_CHANGE:
+        status = REGRESSED if change > 0 else IMPROVED
+
+    return PerfVerdict(
+        test,
+        benchmark,
+        status,
+        float(change),
+        float(current["mean"]),
+        baseline_mean,
+        float(t_value),
+        float(dof),
+        float(p_value),
+        len(baseline),
+    )
+
+
+def get_benchmark_name(row):
+    if "node" in row and not np.isnan(row["node"]):
+        return f"{row['name']} (node {int(row['node'])})"
+    return str(row["name"])
+
+
+def detect_perf_regressions(store, tests, baseline_runs=PERF_BASELINE_RUNS):
+    """Return verdicts for every benchmark of the tests' history tables"""
+
+    verdicts = {}
+    for test in tests:
+        history = store.read_last_runs(f"{test}{HISTORY_SUFFIX}", baseline_runs + 1)
+        if history.empty:
+            continue
+
+        # Runs rerun with the same number keep only their last result
+        history = history.assign(
+            benchmark=history.apply(get_benchmark_name, axis=1)
+        ).drop_duplicates(subset=["run_num", "benchmark"], keep="last")
+        current_run = history["run_num"].iloc[-1]
+
+        for benchmark, rows in history.groupby("benchmark", sort=False):
+            if rows["run_num"].iloc[-1] != current_run:
+                continue
+
+            verdict = judge_benchmark(test, benchmark, rows)
+            verdicts[f"{test}/{benchmark}"] = verdict
+            print(f"Perf verdict: {verdict}")
+
+    return verdicts
+
+
+def read_verdicts(file_name):
+    """Return the verdicts stored in the file or None if there are none"""
+
+    if not os.path.exists(file_name):
+        return None
+
+    with open(file_name, encoding="utf-8") as file:
+        return [
+            PerfVerdict(
+                **{
+                    key: np.nan if value is None else value
+                    for key, value in verdict.items()
+                }
+            )
+            for verdict in json.load(file).values()
+        ]
+
+
+def list_perf_tests(store):
+    return sorted(
+        table[: -len(HISTORY_SUFFIX)]
+        for table in store.list_tables()
+        if table.endswith(HISTORY_SUFFIX)
+    )
+
+
+def main(_args=None):
+    """Judge the latest perf test results, return the exit code"""
+
+    store = open_history_store(".")
+    verdicts = detect_perf_regressions(store, list_perf_tests(store))
+    write_verdicts(verdicts, PERF_REGRESSION_FILENAME)
+
+    regressions = [
+        name for name, verdict in verdicts.items() if verdict.status == REGRESSED
+    ]
+    if regressions:
+        print(f"Performance regressed: {', '.join(regressions)}")
+        if FAIL_ON_PERF_REGRESSION:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,219 @@
+"""
+Repeated runs of the performance tests, merged into robust aggregates
+
+A single run of the perf tests on a shared runner can be ruined by a noisy neighbour.
+The suite is run K times instead, every repetition in a different random order, so
+that a slow period affects different tests in different repetitions. The CSV files
+written by each run are kept per repetition and merged into the files read by
+generate_perf_graph.py, per test row (name and node):
+- mean: median of the repetitions' means
+- stdev: pooled standard deviation of the repetitions
+- min: the lowest of the means
+- reps: number of repetitions
+- rep_stdev: standard deviation of the repetitions' means
+Memory samples (mem) are merged with the median of the same sample (rank and
+iteration) of every repetition, so the series keep their length.
+
+Example: perf_runner.py -b /build/vt -k 5 --cpus 0-3
+"""
+
+import argparse
+import glob
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import time
+import numpy as np
+import pandas as pd
+from config import get_config
+from rank_stats import add_iterations
+
+CONFIG = get_config()
+PERF_REPETITIONS = CONFIG.perf_repetitions
+PERF_CPUS = CONFIG.perf_cpus
+PERF_TEST_LABEL = "perf_test"
+
+REPETITIONS_DIR = "repetitions"
+TEST_RE = re.compile(r"^\s*Test\s+#\d+: (\S+)$")
+STAT_COLUMNS = ("mean", "stdev", "mem")
+
+
+def parse_cpu_list(cpus):
+    """
+    Parse the CPU list in taskset's format
+
+    Example input: 0-3,6
+    Output: {0, 1, 2, 3, 6}
+    """
+
+    cpu_set = set()
+    for part in filter(None, cpus.split(",")):
+        first, _, last = part.partition("-")
+        cpu_set.update(range(int(first), int(last or first) + 1))
+
+    return cpu_set
+
+
+def list_perf_tests(build_folder):
+    output = subprocess.run(
+        ["ctest", "-N", "-L", PERF_TEST_LABEL],
+        cwd=build_folder,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+
+    return [match[1] for match in map(TEST_RE.match, output.splitlines()) if match]
+
+
+def run_test(build_folder, test, cpus=None):
+    """Run a single test with ctest, pinned to the cpus when given"""
+
+    return subprocess.run(
+        [
+            "ctest",
+            "--output-on-failure",
+            "--verbose",
+            "-L",
+            PERF_TEST_LABEL,
+            "-R",
+            f"^{re.escape(test)}$",
+        ],
+        cwd=build_folder,
+        check=False,
+        # The affinity is inherited by mpirun and the ranks, unless MPI binds them itself
+        preexec_fn=(lambda: os.sched_setaffinity(0, cpus)) if cpus else None,
+    ).returncode
+
+
+def collect_csv_files(tests_folder, since, destination):
+    """Move the CSV files written after since to destination"""
+
+    os.makedirs(destination, exist_ok=True)
+    for file_name in glob.glob(os.path.join(tests_folder, "*.csv")):
+        if os.path.getmtime(file_name) >= since:
+            shutil.move(
+                file_name, os.path.join(destination, os.path.basename(file_name))
+            )
+
+
+def run_repetitions(build_folder, repetitions, cpus=None, seed=None):
+    """
+    Run every perf test repetitions times, each repetition in a new random order.
+    Returns the names of the tests which failed.
+    """
+
+    tests = list_perf_tests(build_folder)
+    tests_folder = os.path.join(build_folder, "tests")
+    rng = random.Random(seed)
+    failed = set()
+
+    for repetition in range(repetitions):
+        order = rng.sample(tests, len(tests))
+        print(f"Repetition {repetition + 1}/{repetitions}: {' '.join(order)}")
+
+        for test in order:
+            # mtime resolution of some file systems is a second
+            start = time.time() - 1
+            if run_test(build_folder, test, cpus) != 0:
+                failed.add(test)
+
+            collect_csv_files(
+                tests_folder,
+                start,
+                os.path.join(tests_folder, REPETITIONS_DIR, str(repetition)),
+            )
+
+    return sorted(failed)
+
+
+def merge_frames(frames):
+    """
+    Merge the frames of one CSV file from all repetitions, keeping the row order.
+    Memory samples are numbered per rank and merged sample by sample:
+
+    >>> rep = pd.DataFrame({"node": [0, 0, 0, 1, 1, 1], "mem": [1, 2, 3, 4, 5, 6]})
+    >>> merged = merge_frames([rep, rep + [0, 2]])
+    >>> merged["mem"].tolist()
+    [2.0, 3.0, 4.0, 5.0, 6.0, 7.0]
+    """
+
+    if "mean" not in frames[0]:
+        combined = pd.concat(map(add_iterations, frames), ignore_index=True)
+        keys = [column for column in combined.columns if column not in STAT_COLUMNS]
+        merged = combined.groupby(keys, sort=False).median().reset_index()
+        return merged[frames[0].columns]
+
+    combined = pd.concat(frames, ignore_index=True)
+    keys = [column for column in combined.columns if column not in STAT_COLUMNS]
+    groups = combined.groupby(keys, sort=False)
+
+    merged = groups.agg(
+        mean=("mean", "median"),
+        stdev=("stdev", lambda stdev: np.sqrt(np.mean(np.square(stdev)))),
+        min=("mean", "min"),
+        reps=("mean", "size"),
+        rep_stdev=("mean", "std"),
+    )
+
+    return merged.reset_index()
+
+
+def merge_repetitions(tests_folder):
+    """Write the merged CSV files of all repetitions to tests_folder"""
+
+    repetition_files = {}
+    for file_name in sorted(
+        glob.glob(os.path.join(tests_folder, REPETITIONS_DIR, "*", "*.csv"))
+    ):
+        repetition_files.setdefault(os.path.basename(file_name), []).append(file_name)
+
+    for base_name, file_names in repetition_files.items():
+        merge_frames([pd.read_csv(file_name) for file_name in file_names]).to_csv(
+            os.path.join(tests_folder, base_name), index=False
+        )
+        print(f"Merged {len(file_names)} repetitions of {base_name}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run the perf tests several times in random order and merge the results"
+    )
+    parser.add_argument(
+        "-b",
+        "--build_folder",
+        help="vt build folder",
+        default=CONFIG.build_folder,
+    )
+    parser.add_argument(
+        "-k",
+        "--repetitions",
+        help="Number of runs of every test",
+        type=int,
+        default=PERF_REPETITIONS,
+    )
+    parser.add_argument(
+        "--cpus", help="CPUs the tests are pinned to, e.g. 0-3", default=PERF_CPUS
+    )
+    parser.add_argument(
+        "--seed", help="Seed of the random test order", type=int, default=None
+    )
+    args = parser.parse_args()
+
+    tests_dir = os.path.join(args.build_folder, "tests")
+    shutil.rmtree(os.path.join(tests_dir, REPETITIONS_DIR), ignore_errors=True)
+
+    failed_tests = run_repetitions(
+        args.build_folder,
+        max(args.repetitions, 1),
+        parse_cpu_list(args.cpus) or None,
+        args.seed,
+    )
+    merge_repetitions(tests_dir)
+
+    if failed_tests:
+        print(f"Failed tests: {' '.join(failed_tests)}")
+        sys.exit(1)
@@ -0,0 +1,135 @@
+"""
+Summaries of the perf tests on the perf tests page: regression verdicts (see
+perf_regression.py), transport models (see transport_model.py) and memory usage
+(see memory_stats.py)
+"""
+
+from itertools import groupby
+from operator import attrgetter
+import numpy as np
+from build_regression import IMPROVED, REGRESSED
+from memory_stats import LEAK_THRESHOLD_KIB, MEMORY_WARMUP
+from perf_regression import (
+    INSUFFICIENT,
+    PERF_ALPHA,
+    PERF_BASELINE_RUNS,
+    PERF_MIN_CHANGE,
+)
+from wiki_common import format_bytes, format_number
+
+
+def generate_perf_verdicts_table(verdicts):
+    """Verdicts of the perf regression gate, regressions first"""
+
+    if verdicts is None:
+        return ""
+    if not verdicts:
+        return "No perf test results to compare with their history\n"
+
+    status_icons = {REGRESSED: ":red_circle:", IMPROVED: ":green_circle:"}
+    status_order = [REGRESSED, IMPROVED]
+
+    table = (
+        "| | Test | Benchmark | Current | Baseline | Change (%) | p-value |\n"
+        "|---|---|---|---|---|---|---|\n"
+    )
+    for verdict in sorted(
+        verdicts,
+        key=lambda verdict: (
+            (
+                status_order.index(verdict.status)
+                if verdict.status in status_order
+                else len(status_order)
+            ),
+            verdict.test,
+        ),
+    ):
+        if verdict.status == INSUFFICIENT:
+            change, p_value = f"({INSUFFICIENT})", ""
+        else:
+            change = f"{verdict.change_percent:+.1f}"
+            p_value = f"{verdict.p_value:.3g}"
+
+        table += (
+            f"| {status_icons.get(verdict.status, ':white_circle:')} | {verdict.test} "
+            f"| {verdict.benchmark} | {verdict.current:.4g} | {verdict.baseline:.4g} "
+            f"| {change} | {p_value} |\n"
+        )
+
+    return (
+        "## Regression check\n"
+        f"The latest results compared with the previous {PERF_BASELINE_RUNS} runs "
+        f"using Welch's t-test. Changes with p < {PERF_ALPHA} by at least "
+        f"{PERF_MIN_CHANGE:g}% are marked as :red_circle: regressed or "
+        ":green_circle: improved.\n\n"
+        f"{table}"
+        "***\n"
+    )
+
+
+def generate_transport_model_table(models):
+    """Fitted latency and bandwidth of the transports, compared with raw MPI"""
+
+    if not models:
+        return ""
+
+    table = (
+        "| Transport | Latency (us) | Bandwidth (GB/s) | Half bandwidth payload "
+        "| Latency overhead vs MPI (us) | Bandwidth vs MPI | Cheaper than MPI above |\n"
+        "|---|---|---|---|---|---|---|\n"
+    )
+    for model in models:
+        table += (
+            f"| **{model.group}** | {model.latency_ms * 1000:.2f} | {model.bandwidth_gb_s:.2f} "
+            f"| {format_bytes(model.half_bandwidth_bytes)} "
+            f"| {format_number(model.latency_overhead_ms * 1000, '+.2f')} "
+            f"| {format_number(model.bandwidth_ratio, '.2f', 'x')} "
+            f"| {format_bytes(model.mpi_crossover_bytes)} |\n"
+        )
+
+    return (
+        "## Transport model\n"
+        "Least squares fit of time = latency + payload / bandwidth to the send_cost "
+        "and ping_pong results.\n\n"
+        f"{table}"
+        "***\n"
+    )
+
+
+def generate_memory_stats_table(stats):
+    """Memory usage of every test summarized across its ranks"""
+
+    if not stats:
+        return ""
+
+    table = (
+        "| | Test | Ranks | Peak (MiB) | Steady state (MiB) "
+        "| Growth (KiB / iteration) | Suspected leaks |\n"
+        "|---|---|---|---|---|---|---|\n"
+    )
+    for test, test_stats in groupby(stats, key=attrgetter("test")):
+        test_stats = list(test_stats)
+        leaks = [
+            str(memory_stats.node) for memory_stats in test_stats if memory_stats.leak
+        ]
+        slopes = [
+            memory_stats.slope_kib
+            for memory_stats in test_stats
+            if not np.isnan(memory_stats.slope_kib)
+        ]
+        table += (
+            f"| {':red_circle:' if leaks else ':white_circle:'} | {test} | {len(test_stats)} "
+            f"| {max(memory_stats.peak_mib for memory_stats in test_stats):.1f} "
+            f"| {np.median([memory_stats.steady_mib for memory_stats in test_stats]):.1f} "
+            f"| {format_number(max(slopes, default=np.nan), '+.2f')} "
+            f"| {'ranks ' + ', '.join(leaks) if leaks else '-'} |\n"
+        )
+
+    return (
+        "## Memory usage\n"
+        f"Growth is the Theil-Sen slope after the first {MEMORY_WARMUP:.0%} of the "
+        f"iterations (of the fastest growing rank). Ranks growing by more than "
+        f"{LEAK_THRESHOLD_KIB:g} KiB per iteration are suspected to leak.\n\n"
+        f"{table}"
+        "***\n"
+    )
@@ -0,0 +1,78 @@
+"""
+Aggregation of the results of multi-node perf tests across ranks
+
+Every benchmark (or iteration) of a test run on several ranks has one result per rank.
+The results are aggregated with a single groupby into the min, median, max and mean
+across the ranks, and the load imbalance max / mean (1.0 is perfectly balanced).
+Ranks don't need to be numbered 0..N-1, nor to have the same number of results.
+
+The imbalance of every benchmark is appended to the rank_imbalance history table.
+"""
+
+import pandas as pd
+from config import get_config
+
+# Up to this many ranks are shown as one bar (line) per rank, more ranks as a band
+MAX_RANK_BARS = get_config().max_rank_bars
+
+RANK_IMBALANCE_TABLE = "rank_imbalance"
+RANK_STATS = ["min", "median", "max", "mean"]
+
+
+def add_iterations(data_frame):
+    """Number the rows of every rank in their order, unless they're numbered already"""
+
+    if "iteration" in data_frame:
+        return data_frame
+
+    return data_frame.assign(iteration=data_frame.groupby("node").cumcount())
+
+
+def aggregate_ranks(data_frame, key, value="mean"):
+    """
+    Return the statistics of value across the ranks for every key (in the order of
+    first appearance): min, median, max, mean, ranks and imbalance.
+
+    Example input (key=name): name,node,mean = [a,0,1.0], [a,1,3.0]
+    Output: name=a, min=1.0, median=2.0, max=3.0, mean=2.0, ranks=2, imbalance=1.5
+    """
+
+    stats = data_frame.groupby(key, sort=False)[value].agg([*RANK_STATS, "count"])
+    stats = stats.rename(columns={"count": "ranks"})
+    stats["imbalance"] = stats["max"] / stats["mean"]
+
+    return stats
+
+
+def get_num_ranks(data_frame):
+    return data_frame["node"].nunique() if "node" in data_frame else 1
+
+
+def append_imbalance_history(store, test, time_df, run_num, commit):
+    """Append the imbalance of every benchmark of the multi-node test to the history"""
+
+    if get_num_ranks(time_df) <= 1:
+        return
+
+    stats = aggregate_ranks(time_df, "name").reset_index()
+    stats.insert(0, "test", test)
+    stats.insert(0, "commit", commit)
+    stats.insert(0, "run_num", run_num)
+
+    store.append(RANK_IMBALANCE_TABLE, stats)
+
+
+def read_imbalance_history(store, num_runs):
+    """
+    Return the worst imbalance of every test's benchmarks in the last num_runs runs,
+    as a frame indexed by run number with a column for every test
+    """
+
+    if not store.exists(RANK_IMBALANCE_TABLE):
+        return pd.DataFrame()
+
+    history = store.read_last_runs(RANK_IMBALANCE_TABLE, num_runs)
+
+    return history.pivot_table(
+        index="run_num", columns="test", values="imbalance", aggfunc="max"
+    )
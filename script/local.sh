@@ -16,7 +16,7 @@ export INPUT_X_LABEL="Run number"
 export INPUT_Y_LABEL="Build time (min)"
 export INPUT_GRAPH_WIDTH=20
 export INPUT_GRAPH_HEIGHT=20
-export INPUT_BADGE_LOGO="logo"
+export INPUT_BADGE_LOGO=""
 export INPUT_BADGE_FILENAME="badge_file"
 export CXX=clang++-15
 export CC=clang-15
@@ -27,7 +27,9 @@ BUILD_STATS_DIR=$3
 cd "$WORKSPACE"
 
 export RUN_NUMBER=$2
+export GITHUB_RUN_NUMBER=$RUN_NUMBER
 export VT_BUILD_FOLDER="$WORKSPACE/build/vt"
+export VT_MATRIX_BUILD_FOLDER="$WORKSPACE/build/matrix"
 
 ########################
 ## CLONE DEPENDENCIES ##
@@ -58,50 +60,42 @@ GITHUB_SHA=$(git rev-parse HEAD)
 export GITHUB_SHA=$GITHUB_SHA
 cd -
 eval "$BUILD_STATS_DIR/build_vt.sh" "$WORKSPACE/vt" "$WORKSPACE/build" "-ftime-trace" vt
-vt_build_time=$(grep -oP 'real\s+\K\d+m\d+\,\d+s' "$VT_BUILD_FOLDER/build_time.txt")
+vt_build_time="$WORKSPACE/vt_build_time.txt"
+cp "$VT_BUILD_FOLDER/build_time.txt" "$vt_build_time"
 
 
 # Build tests and examples
 eval "$BUILD_STATS_DIR/build_vt.sh" "$WORKSPACE/vt" "$WORKSPACE/build" "-ftime-trace" all
-tests_and_examples_build=$(grep -oP 'real\s+\K\d+m\d+\,\d+s' "$VT_BUILD_FOLDER/build_time.txt")
+tests_and_examples_build="$WORKSPACE/tests_build_time.txt"
+cp "$VT_BUILD_FOLDER/build_time.txt" "$tests_and_examples_build"
 
 cp "$BUILD_STATS_DIR/ClangBuildAnalyzer.ini" .
 $ClangBuildTool --all "$VT_BUILD_FOLDER" vt-build
 $ClangBuildTool --analyze vt-build > build_result.txt
 
+if [ "${INPUT_INCREMENTAL_BENCH:-false}" == "true" ]; then
+    python3 "$BUILD_STATS_DIR/incremental_bench.py" -b "$VT_BUILD_FOLDER" -s "$WORKSPACE/vt" -r "$WORKSPACE/build_result.txt"
+fi
+
+if [ -n "${INPUT_BUILD_MATRIX:-}" ]; then
+    python3 "$BUILD_STATS_DIR/build_matrix.py" -s "$WORKSPACE/vt" -b "$VT_BUILD_FOLDER" -m "$VT_MATRIX_BUILD_FOLDER"
+fi
+
 #######################
 ## PERFORMANCE TESTS ##
 #######################
 
-cd "$VT_BUILD_FOLDER"
-ctest --output-on-failure --verbose -L perf_test
-cd -
+python3 "$BUILD_STATS_DIR/perf_runner.py" -b "$VT_BUILD_FOLDER" --seed "$RUN_NUMBER"
 
 ##########################
 ## GENERATE FLAMEGRAPHS ##
 ##########################
 
 # Running 'mpirun -n x heaptrack' will generate x number of separate files, one for each node/rank
+# Profiles of earlier runs would be taken for additional ranks
+rm -f heaptrack.jacobi2d_vt.*
 mpirun -n 2 heaptrack "$WORKSPACE/build/vt/examples/collection/jacobi2d_vt" 10 10 200
-jacobi_output_list=$(ls -- *heaptrack.jacobi2d_vt.*.zst)
-
-node_num=0
-for file in ${jacobi_output_list}
-do
-    file_name="flame$node_num"
-
-    # number of allocations
-    heaptrack_print -f "$file" -F "alloc_count_$file_name"
-    "$WORKSPACE/FlameGraph/flamegraph.pl" --title="jacobi2d_vt node:$node_num number of allocations"\
-    --width=1920 --colors mem --countname allocations < "alloc_count_$file_name" > "flame_heaptrack_jacobi_alloc_count_$node_num.svg"
-
-    # leaked
-    heaptrack_print -f "$file" -F "leaked_$file_name" --flamegraph-cost-type leaked
-    "$WORKSPACE/FlameGraph/flamegraph.pl" --title="jacobi2d_vt node:$node_num number of bytes leaked"\
-    --width=1920 --colors mem --countname bytes < "leaked_$file_name" > "flame_heaptrack_jacobi_leaked_$node_num.svg"
-
-    ((node_num=node_num+1))
-done
+# The profiles are processed in the wiki's perf_tests, next to the previous run's results
 
 #####################
 ## GENERATE GRAPHS ##
@@ -109,16 +103,9 @@ done
 
 cd "$WIKI_DIR" || exit 1
 
-# Generate graph
-python3 "$BUILD_STATS_DIR/generate_build_graph.py" -vt "$vt_build_time" -te "$tests_and_examples_build" -r "$RUN_NUMBER"
-
-cd perf_tests
-python3 "$BUILD_STATS_DIR/generate_perf_graph.py"
-cd -
-
 cp "$WORKSPACE/build_result.txt" "$INPUT_BUILD_STATS_OUTPUT"
-eval cp "$WORKSPACE/flame_heaptrack*" "./perf_tests/"
 
-python3 "$BUILD_STATS_DIR/generate_wiki_pages.py"
+python3 "$BUILD_STATS_DIR/build_stats.py" all -vt "$vt_build_time" -te "$tests_and_examples_build" -r "$RUN_NUMBER" \
+    -f "$WORKSPACE/FlameGraph/flamegraph.pl" "$WORKSPACE"/heaptrack.jacobi2d_vt.*
 
 exit 0
@@ -0,0 +1,759 @@
+"""
+Benchmark of the build stats stages on synthetic inputs
+
+Inputs of the given sizes are generated first:
+- ClangBuildAnalyzer report with thousands of templates, and expensive headers with
+  deep include chains
+- build_times.csv and the perf test histories (*_history.csv) with 10^5 rows
+- perf test results of 64 ranks, with 10^5 memory samples of every rank
+The stages are then run on a fresh copy of the wiki, in the order of
+'build_stats.py all'. Every stage is timed (the median of the repetitions), its
+peak of traced memory is measured with tracemalloc in an extra run (tracing slows
+the stages down, so it isn't timed).
+
+The results are written as JSON. With --baseline they're compared with the results
+of an earlier run, a stage which got slower or used more memory by more than
+--threshold percent is reported as a regression and the exit code is 1.
+
+Example: self_benchmark.py -o bench.json --scale 0.1
+Example: self_benchmark.py -o bench.json --baseline bench_main.json
+"""
+
+import argparse
+import importlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from datetime import date, timedelta
+from functools import partial
+from typing import List, NamedTuple
+import numpy as np
+import pandas as pd
+from build_stats import PERF_TESTS_DIR, working_directory
+
+BENCH_FILENAME = "self_benchmark.json"
+BENCH_THRESHOLD = 20.0
+# Time changes of faster stages are noise
+MIN_TIME_CHANGE_S = 0.05
+# Memory changes of stages which use less are noise
+MIN_PEAK_CHANGE_MIB = 1.0
+
+BUILD_STATS_DIR = "build_stats"
+REPORT_FILENAME = "build_result.txt"
+BUILD_TIMES_FILENAME = "build_times.csv"
+BENCH_REPO = "bench/bench"
+
+
+class BenchSizes(NamedTuple):
+    """Sizes of the generated inputs"""
+
+    templates: int
+    headers: int
+    # Number of headers in every include chain
+    chain_depth: int
+    files: int
+    # Rows of build_times.csv and of every perf test history
+    history_rows: int
+    ranks: int
+    # Memory samples of every rank
+    memory_samples: int
+    # Benchmarks of the generic perf test
+    benchmarks: int
+
+
+DEFAULT_SIZES = BenchSizes(5000, 1000, 20, 2000, 100_000, 64, 100_000, 20)
+
+
+def scale_sizes(sizes, factor):
+    """Scale the sizes of the inputs, except the ranks and the depth of the chains"""
+
+    return sizes._replace(
+        **{
+            field: max(int(getattr(sizes, field) * factor), 2)
+            for field in (
+                "templates",
+                "headers",
+                "files",
+                "history_rows",
+                "memory_samples",
+            )
+        }
+    )
+
+
+class StageResult(NamedTuple):
+    """Time and memory of a benchmarked stage"""
+
+    stage: str
+    time_s: float
+    times_s: List[float]
+    # Peak of the memory traced by tracemalloc, NaN when it wasn't measured
+    peak_mib: float
+
+
+class StageComparison(NamedTuple):
+    """Change of a stage's time and memory since the baseline"""
+
+    stage: str
+    time_s: float
+    baseline_time_s: float
+    time_change_percent: float
+    peak_mib: float
+    baseline_peak_mib: float
+    peak_change_percent: float
+    regressed: bool
+
+
+# Imported before the stages are run, so that the imports aren't timed
+TOOL_MODULES = (
+    "matplotlib.pyplot",
+    "history_store",
+    "build_report_parser",
+    "build_regression",
+    "generate_build_graph",
+    "generate_perf_graph",
+    "perf_regression",
+    "generate_wiki_pages",
+    "directory_section",
+    "template_section",
+    "changes_section",
+)
+
+
+def tool(module):
+    """Modules of the tool are imported after the environment of the inputs is set"""
+    return importlib.import_module(module)
+
+
+def get_template_name(index):
+    return (
+        f"vt::ns{index % 37}::Template{index}<vt::Arg{index % 101}<int, {index % 7}>>"
+    )
+
+
+def get_header_name(index):
+    return f"../../vt/src/vt/dir{index % 40}/header{index}.h"
+
+
+def get_object_name(index):
+    return f"src/CMakeFiles/vt.dir/vt/dir{index % 40}/sub{index % 7}/file{index}.cc.o"
+
+
+def get_name_times_avg_lines(names, rng):
+    """Entries with times and average, sorted by their total time"""
+
+    times = rng.integers(1, 1000, len(names))
+    averages = rng.integers(1, 200, len(names))
+    order = np.argsort(-times * averages, kind="stable")
+
+    return [
+        f"{times[i] * averages[i]:6d} ms: {names[i]} ({times[i]} times, avg {averages[i]} ms)"
+        for i in order
+    ]
+
+
+def get_header_lines(sizes, rng):
+    """Expensive headers, every one with a few include chains"""
+
+    lines = []
+    for index in np.argsort(-rng.integers(1, 100_000, sizes.headers)):
+        times = int(rng.integers(1, 500))
+        average = int(rng.integers(1, 1000))
+        lines.append(
+            f"{times * average} ms: {get_header_name(index)} "
+            f"(included {times} times, avg {average} ms), included via:"
+        )
+
+        for _ in range(int(rng.integers(1, 6))):
+            if rng.random() < 0.1:
+                lines.append(f"  {int(rng.integers(1, 50))}x: <direct include>")
+                continue
+
+            chain = " ".join(
+                get_header_name(int(include))
+                for include in rng.integers(0, sizes.headers, sizes.chain_depth)
+            )
+            lines.append(
+                f"  {int(rng.integers(1, 50))}x: "
+                f"{get_object_name(int(rng.integers(sizes.files)))} {chain}"
+            )
+        lines.append("")
+
+    return lines
+
+
+def generate_report(file_name, sizes, rng):
+    """ClangBuildAnalyzer report with all of its sections"""
+
+    def get_file_lines():
+        times = np.sort(rng.integers(100, 100_000, sizes.files))[::-1]
+        return [
+            f"{time_ms:6d} ms: {get_object_name(index)}"
+            for index, time_ms in enumerate(times)
+        ]
+
+    num_functions = max(sizes.templates // 4, 2)
+    lines = [
+        "Analyzing build trace from 'vt-build'...",
+        "**** Time summary:",
+        f"Compilation ({sizes.files} times):",
+        "  Parsing (frontend):         1234.5 s",
+        "  Codegen & opts (backend):    456.7 s",
+        "",
+        "**** Files that took longest to parse (compiler frontend):",
+        *get_file_lines(),
+        "",
+        "**** Files that took longest to codegen (compiler backend):",
+        *get_file_lines(),
+        "",
+        "**** Templates that took longest to instantiate:",
+        *get_name_times_avg_lines(
+            [get_template_name(index) for index in range(sizes.templates)], rng
+        ),
+        "",
+        "**** Template sets that took longest to instantiate:",
+        *get_name_times_avg_lines(
+            [
+                f"vt::ns{index % 37}::Template{index}<$>"
+                for index in range(num_functions)
+            ],
+            rng,
+        ),
+        "",
+        "**** Functions that took longest to compile:",
+        *(
+            f"{int(time_ms):6d} ms: vt::function{index}(int) (src/vt/file{index}.cc)"
+            for index, time_ms in enumerate(
+                np.sort(rng.integers(10, 5000, num_functions))[::-1]
+            )
+        ),
+        "",
+        "**** Function sets that took longest to compile / optimize:",
+        *get_name_times_avg_lines(
+            [f"vt::function{index}<$>(int)" for index in range(num_functions)], rng
+        ),
+        "",
+        "**** Expensive headers:",
+        *get_header_lines(sizes, rng),
+        "  done in 1.2s.",
+    ]
+
+    with open(file_name, "w", encoding="utf-8") as file:
+        file.write("\n".join(lines) + "\n")
+
+
+def generate_build_times(file_name, sizes, rng):
+    """Build times history of several runs a day"""
+
+    num_rows = sizes.history_rows
+    real = rng.normal(600, 20, (2, num_rows))
+    first_day = date(2000, 1, 1)
+
+    pd.DataFrame(
+        {
+            "vt": real[0],
+            "tests": real[1],
+            "run_num": np.arange(1, num_rows + 1),
+            "date": [
+                (first_day + timedelta(days=int(day))).strftime("%d %B %Y")
+                for day in np.arange(num_rows) // 20
+            ],
+            "commit": [f"{run:040x}" for run in range(num_rows)],
+            "vt_user": real[0] * 6,
+            "vt_sys": real[0] / 10,
+            "tests_user": real[1] * 6,
+            "tests_sys": real[1] / 10,
+            "cores": 8,
+            "efficiency": rng.uniform(0.5, 0.9, num_rows),
+        }
+    ).to_csv(file_name, index=False)
+
+
+def get_rank_results(names, sizes, rng, time_ms=1.0):
+    """Time results of every name on every rank"""
+
+    return pd.DataFrame(
+        {
+            "name": np.tile(names, sizes.ranks),
+            "node": np.repeat(np.arange(sizes.ranks), len(names)),
+            "mean": rng.gamma(4.0, time_ms / 4, len(names) * sizes.ranks),
+            "stdev": rng.gamma(2.0, time_ms / 20, len(names) * sizes.ranks),
+        }
+    )
+
+
+def get_memory_samples(sizes, rng):
+    """Memory usage of every rank, with a slow growth on the last rank"""
+
+    iterations = np.arange(sizes.memory_samples)
+    usage = 100e6 + rng.normal(0, 1e5, (sizes.ranks, sizes.memory_samples))
+    usage[-1] += iterations * 4096
+
+    return pd.DataFrame(
+        {
+            "name": np.tile(
+                [f"{iteration} mem" for iteration in iterations], sizes.ranks
+            ),
+            "node": np.repeat(np.arange(sizes.ranks), sizes.memory_samples),
+            "mem": usage.ravel().round(),
+        }
+    )
+
+
+def generate_perf_results(tests_folder, sizes, rng):
+    """
+    Results of the perf tests with a tailored graph (send_cost, ping_pong, reduce)
+    and of a generic test, return them by name
+    """
+
+    payloads = [2**exponent for exponent in range(0, 21)]
+    results = {
+        **{
+            name: get_rank_results(
+                [f"payload size {size}" for size in payloads], sizes, rng
+            )
+            for name in (
+                "test_send_time",
+                "test_objgroup_send_time",
+                "test_collection_send_time",
+            )
+        },
+        "test_ping_pong_time": get_rank_results(
+            [f"{size} bytes" for size in payloads], sizes, rng
+        ),
+        "test_reduce_time": get_rank_results(
+            [f"{iteration} reduce" for iteration in range(100)], sizes, rng
+        ),
+        "test_bench_time": get_rank_results(
+            [f"benchmark {index}" for index in range(sizes.benchmarks)], sizes, rng
+        ),
+    }
+
+    for name, results_df in results.items():
+        results_df.to_csv(os.path.join(tests_folder, f"{name}.csv"), index=False)
+
+    memory_df = get_memory_samples(sizes, rng)
+    for name in ("test_ping_pong_mem", "test_reduce_mem", "test_bench_mem"):
+        memory_df.to_csv(os.path.join(tests_folder, f"{name}.csv"), index=False)
+
+    return results
+
+
+def generate_perf_histories(perf_tests_folder, results, sizes, rng):
+    """History of every time result, of at least two runs. Returns the last run."""
+
+    last_run = 2
+    for name, results_df in results.items():
+        num_runs = max(sizes.history_rows // len(results_df), 2)
+        history = pd.concat([results_df] * num_runs, ignore_index=True)
+        history["mean"] *= rng.normal(1.0, 0.02, len(history))
+        history["commit"] = np.repeat(
+            [f"{run:040x}" for run in range(num_runs)], len(results_df)
+        )
+        history["run_num"] = np.repeat(np.arange(1, num_runs + 1), len(results_df))
+        history.to_csv(
+            os.path.join(perf_tests_folder, f"{name}_history.csv"), index=False
+        )
+        last_run = max(last_run, num_runs)
+
+    return last_run
+
+
+def generate_inputs(directory, sizes, seed):
+    """Generate the build folder and the wiki, return the number of the next run"""
+
+    rng = np.random.default_rng(seed)
+    tests_folder = os.path.join(directory, "build", "tests")
+    build_stats_folder = os.path.join(directory, "wiki", BUILD_STATS_DIR)
+    perf_tests_folder = os.path.join(directory, "wiki", PERF_TESTS_DIR)
+    for folder in (tests_folder, build_stats_folder, perf_tests_folder):
+        os.makedirs(folder, exist_ok=True)
+
+    generate_report(os.path.join(build_stats_folder, REPORT_FILENAME), sizes, rng)
+    generate_build_times(
+        os.path.join(build_stats_folder, BUILD_TIMES_FILENAME), sizes, rng
+    )
+    results = generate_perf_results(tests_folder, sizes, rng)
+    last_run = generate_perf_histories(perf_tests_folder, results, sizes, rng)
+
+    return max(last_run, sizes.history_rows) + 1
+
+
+def set_environment(directory, run_num):
+    """Point the tool to the generated inputs, before any of its modules is imported"""
+
+    os.environ.update(
+        {
+            "INPUT_BUILD_STATS_OUTPUT": BUILD_STATS_DIR,
+            "INPUT_BUILD_RESULT_FILENAME": REPORT_FILENAME,
+            "INPUT_BUILD_TIMES_FILENAME": BUILD_TIMES_FILENAME,
+            "INPUT_BUILD_ANALYZER": "ClangBuildAnalyzer",
+            "INPUT_HISTORY_BACKEND": "csv",
+            "INPUT_PERF_GRAPH_JOBS": "1",
+            "VT_BUILD_FOLDER": os.path.join(directory, "build"),
+            "VT_MATRIX_BUILD_FOLDER": os.path.join(directory, "matrix"),
+            "GITHUB_REPOSITORY": BENCH_REPO,
+            "GITHUB_RUN_NUMBER": str(run_num),
+            "GITHUB_SHA": f"{run_num:040x}",
+            "MPLBACKEND": "Agg",
+        }
+    )
+
+
+def bench_build_graph_prepare_data(context):
+    context["build_times"] = tool("generate_build_graph").prepare_data(
+        "600", "1800", int(os.environ["GITHUB_RUN_NUMBER"])
+    )
+
+
+def bench_detect_build_regressions(context):
+    build_graph = tool("generate_build_graph")
+    context["verdicts"] = tool("build_regression").detect_build_regressions(
+        build_graph.open_build_times_store().read(
+            tool("history_store").BUILD_TIMES_TABLE
+        )
+    )
+
+
+def bench_build_graph(context):
+    tool("generate_build_graph").generate_graph(
+        *context["build_times"], context["verdicts"]
+    )
+
+
+def bench_discover_perf_files(context):
+    perf_graph = tool("generate_perf_graph")
+    context["perf_files"] = perf_graph.discover_perf_files(
+        f"{perf_graph.VT_BUILD_FOLDER}/tests"
+    )
+
+
+def bench_plan_graph_jobs(context):
+    perf_graph = tool("generate_perf_graph")
+    with working_directory(PERF_TESTS_DIR):
+        context["graph_jobs"] = perf_graph.plan_graph_jobs(context["perf_files"])
+        context["graph_jobs"].update(perf_graph.record_histories(context["perf_files"]))
+        tool("perf_manifest").write_manifest(context["graph_jobs"])
+
+
+def bench_render(job_name, context):
+    perf_graph = tool("generate_perf_graph")
+    with working_directory(PERF_TESTS_DIR), tool("matplotlib").rc_context():
+        perf_graph.set_graph_properties()
+        error = perf_graph.run_graph_job(context["graph_jobs"][job_name].render)
+
+    if error is not None:
+        raise RuntimeError(f"Graph job {job_name} failed:\n{error}")
+
+
+def bench_detect_perf_regressions(_context):
+    perf_regression = tool("perf_regression")
+    with working_directory(PERF_TESTS_DIR):
+        store = tool("history_store").open_history_store(".")
+        perf_regression.detect_perf_regressions(
+            store, perf_regression.list_perf_tests(store)
+        )
+
+
+def bench_parse_report(_context):
+    for _ in tool("build_report_parser").read_report(
+        tool("generate_wiki_pages").CLANG_BUILD_REPORT
+    ):
+        pass
+
+
+def bench_wiki_prepare_data(context):
+    context["snapshot"], context["directory_totals"] = {}, {}
+    context["build_data"] = tool("generate_wiki_pages").prepare_data(
+        context["snapshot"], context["directory_totals"]
+    )
+
+
+def bench_get_headers(context):
+    # The header records with their include chains
+    tool("generate_wiki_pages").get_headers(context["build_data"][6])
+
+
+def bench_wiki_graphs(context):
+    wiki = tool("generate_wiki_pages")
+    for graph_name, times in zip(
+        (wiki.EXP_TEMPLATE_INST_DIR, wiki.EXP_TEMPLATE_SET_DIR, wiki.EXP_HEADERS_DIR),
+        context["build_data"][3:6],
+    ):
+        wiki.generate_graph(graph_name, times)
+
+
+def bench_build_sections(context):
+    context["build_sections"] = [
+        (
+            "Directories",
+            tool("directory_section").generate_directory_section(
+                context["directory_totals"]
+            ),
+        ),
+        (
+            "Templates",
+            tool("template_section").generate_template_groups_section(
+                context["snapshot"]
+            ),
+        ),
+        (
+            "Changes",
+            tool("changes_section").generate_changes_section(context["snapshot"]),
+        ),
+    ]
+
+
+def bench_build_page(context):
+    wiki = tool("generate_wiki_pages")
+    context["last_builds"] = wiki.generate_last_build_table()
+    wiki.create_md_build_page(
+        context["last_builds"], context["build_sections"], *context["build_data"][:3]
+    )
+
+
+def bench_perf_page(context):
+    tool("generate_wiki_pages").create_md_perf_page(context["last_builds"])
+
+
+def get_stages(context):
+    """
+    The stages in the order of 'build_stats.py all', as (name, function of the
+    context). The graph jobs are known once they're planned.
+    """
+
+    build_graph = tool("generate_build_graph")
+    yield "build_graph.prepare_data", bench_build_graph_prepare_data
+    yield "build_graph.detect_build_regressions", bench_detect_build_regressions
+    yield "build_graph.generate_graph", bench_build_graph
+    yield "build_graph.generate_long_term_graph", lambda _: build_graph.generate_long_term_graph()
+    yield "build_graph.generate_efficiency_graph", lambda _: build_graph.generate_efficiency_graph()
+
+    yield "perf_graph.discover_perf_files", bench_discover_perf_files
+    yield "perf_graph.plan_graph_jobs", bench_plan_graph_jobs
+    for job_name in context["graph_jobs"]:
+        yield f"perf_graph.render.{job_name}", partial(bench_render, job_name)
+    yield "perf_regression.detect_perf_regressions", bench_detect_perf_regressions
+
+    yield "wiki.parse_report", bench_parse_report
+    yield "wiki.prepare_data", bench_wiki_prepare_data
+    yield "wiki.get_headers", bench_get_headers
+    yield "wiki.generate_graph", bench_wiki_graphs
+    yield "wiki.build_sections", bench_build_sections
+    yield "wiki.create_md_build_page", bench_build_page
+    yield "wiki.create_md_perf_page", bench_perf_page
+
+
+def run_stages(inputs_dir, trace_memory):
+    """
+    Run every stage on a fresh copy of the wiki, return the time (or the peak of the
+    traced memory) of every stage
+    """
+
+    measurements = {}
+    context = {}
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        wiki_dir = os.path.join(work_dir, "wiki")
+        shutil.copytree(os.path.join(inputs_dir, "wiki"), wiki_dir)
+
+        with working_directory(wiki_dir):
+            for stage, function in get_stages(context):
+                # The stages' own logging would bury the results
+                with open(os.devnull, "w", encoding="utf-8") as devnull:
+                    with redirect_stdout(devnull):
+                        if trace_memory:
+                            tracemalloc.start()
+                            function(context)
+                            peak = tracemalloc.get_traced_memory()[1]
+                            measurements[stage] = peak / 1024**2
+                            tracemalloc.stop()
+                        else:
+                            start = time.perf_counter()
+                            function(context)
+                            measurements[stage] = time.perf_counter() - start
+
+                tool("matplotlib.pyplot").close("all")
+
+    return measurements
+
+
+def run_benchmark(inputs_dir, repetitions, trace_memory=True):
+    for module in TOOL_MODULES:
+        tool(module)
+
+    times = [run_stages(inputs_dir, False) for _ in range(repetitions)]
+    peaks = run_stages(inputs_dir, True) if trace_memory else {}
+
+    return [
+        StageResult(
+            stage,
+            statistics.median(run[stage] for run in times),
+            [run[stage] for run in times],
+            peaks.get(stage, np.nan),
+        )
+        for stage in times[0]
+    ]
+
+
+def get_change(value, baseline):
+    return (value - baseline) / baseline * 100.0 if baseline > 0 else np.nan
+
+
+def compare_results(results, baseline, threshold=BENCH_THRESHOLD):
+    """Compare the results with the baseline results of the same stages"""
+
+    comparisons = []
+    for result in results:
+        if result.stage not in baseline:
+            continue
+
+        base = baseline[result.stage]
+        time_change = get_change(result.time_s, base.time_s)
+        peak_change = get_change(result.peak_mib, base.peak_mib)
+        time_grew = result.time_s - base.time_s >= MIN_TIME_CHANGE_S
+        peak_grew = result.peak_mib - base.peak_mib >= MIN_PEAK_CHANGE_MIB
+
+        comparisons.append(
+            StageComparison(
+                result.stage,
+                result.time_s,
+                base.time_s,
+                time_change,
+                result.peak_mib,
+                base.peak_mib,
+                peak_change,
+                any(
+                    [
+                        time_change > threshold and time_grew,
+                        peak_change > threshold and peak_grew,
+                    ]
+                ),
+            )
+        )
+
+    return comparisons
+
+
+def print_comparisons(comparisons):
+    print(
+        f"{'Stage':<50} {'Time (s)':>20} {'Change':>8} {'Peak (MiB)':>22} {'Change':>8}"
+    )
+    for comparison in comparisons:
+        print(
+            f"{comparison.stage:<50} "
+            f"{comparison.baseline_time_s:9.3f} -> {comparison.time_s:7.3f} "
+            f"{comparison.time_change_percent:+7.1f}% "
+            f"{comparison.baseline_peak_mib:9.1f} -> {comparison.peak_mib:9.1f} "
+            f"{comparison.peak_change_percent:+7.1f}%"
+            f"{'  REGRESSED' if comparison.regressed else ''}"
+        )
+
+
+def to_json(value):
+    return None if isinstance(value, float) and np.isnan(value) else value
+
+
+def write_results(results, sizes, repetitions, file_name):
+    with open(file_name, "w", encoding="utf-8") as file:
+        json.dump(
+            {
+                "python": platform.python_version(),
+                "sizes": sizes._asdict(),
+                "repetitions": repetitions,
+                "stages": [
+                    {key: to_json(value) for key, value in result._asdict().items()}
+                    for result in results
+                ],
+            },
+            file,
+            indent=2,
+        )
+
+
+def read_results(file_name):
+    """Return the sizes of the inputs and the results by stage"""
+
+    with open(file_name, encoding="utf-8") as file:
+        content = json.load(file)
+
+    return BenchSizes(**content["sizes"]), {
+        stage["stage"]: StageResult(
+            **{key: np.nan if value is None else value for key, value in stage.items()}
+        )
+        for stage in content["stages"]
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the stages of the tool on synthetic inputs"
+    )
+    parser.add_argument("-o", "--output", help="Results file", default=BENCH_FILENAME)
+    parser.add_argument(
+        "-n", "--repetitions", help="Timed runs of every stage", type=int, default=3
+    )
+    parser.add_argument(
+        "--scale",
+        help="Factor of the input sizes (except ranks and include chain depth)",
+        type=float,
+        default=1.0,
+    )
+    parser.add_argument("--seed", help="Seed of the inputs", type=int, default=0)
+    parser.add_argument(
+        "--no_memory", help="Don't measure the traced memory", action="store_true"
+    )
+    parser.add_argument("--baseline", help="Results file to compare with")
+    parser.add_argument(
+        "--threshold",
+        help="Change (in percent) of time or memory reported as a regression",
+        type=float,
+        default=BENCH_THRESHOLD,
+    )
+    parser.add_argument(
+        "--inputs_dir", help="Keep the generated inputs in this directory"
+    )
+    args = parser.parse_args()
+
+    bench_sizes = scale_sizes(DEFAULT_SIZES, args.scale)
+    inputs = args.inputs_dir or tempfile.mkdtemp(prefix="self_benchmark_")
+
+    try:
+        start_time = time.perf_counter()
+        next_run = generate_inputs(inputs, bench_sizes, args.seed)
+        print(
+            f"Generated inputs {bench_sizes} in {time.perf_counter() - start_time:.1f}s"
+        )
+
+        set_environment(inputs, next_run)
+        bench_results = run_benchmark(
+            inputs, max(args.repetitions, 1), not args.no_memory
+        )
+    finally:
+        if args.inputs_dir is None:
+            shutil.rmtree(inputs, ignore_errors=True)
+
+    write_results(bench_results, bench_sizes, max(args.repetitions, 1), args.output)
+    for bench_result in bench_results:
+        print(
+            f"{bench_result.stage:<50} {bench_result.time_s:8.3f}s {bench_result.peak_mib:9.1f} MiB"
+        )
+
+    if args.baseline:
+        baseline_sizes, baseline_results = read_results(args.baseline)
+        if baseline_sizes != bench_sizes:
+            print(f"Baseline was run with different sizes: {baseline_sizes}")
+
+        bench_comparisons = compare_results(
+            bench_results, baseline_results, args.threshold
+        )
+        print_comparisons(bench_comparisons)
+        if any(comparison.regressed for comparison in bench_comparisons):
+            sys.exit(1)
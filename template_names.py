@@ -0,0 +1,164 @@
+"""
+Tokenizer and normaliser of C++ template names
+
+Names of template instantiations are grouped by their primary template, i.e. the name
+with the template arguments collapsed to '$', and by their namespace. Angle brackets
+are matched with a stack and '<' only opens template arguments right after a name,
+so comparisons (e.g. `Foo<(N > 1)>`) and operators like `operator<<` don't break
+the nesting.
+
+Example input: vt::objgroup::proxy::Proxy<Foo<int>>::send<&Foo::handler>
+Primary template: vt::objgroup::proxy::Proxy<$>::send<$>
+With depth=1: vt::objgroup::proxy::Proxy<Foo<$>>::send<&Foo::handler>
+Namespace: vt::objgroup
+"""
+
+import re
+from typing import NamedTuple
+from config import get_config
+
+CONFIG = get_config()
+TEMPLATE_COLLAPSE_DEPTH = CONFIG.template_collapse_depth
+TEMPLATE_NAMESPACE_DEPTH = CONFIG.template_namespace_depth
+
+GLOBAL_NAMESPACE = "(global)"
+
+TOKEN_RE = re.compile(
+    r"operator\s*(?:<=>|<<=?|>>=?|<=|>=|->\*?|<|>|\(\)|\[\])"
+    r"|->|::|[<>()\[\],]|\s+|[^<>()\[\],:\-\s]+|[:\-]"
+)
+
+
+class TemplateGroup(NamedTuple):
+    """Instantiations of a primary template"""
+
+    name: str
+    total_ms: int
+    times: int
+    # Number of distinct instantiations in the group
+    count: int
+
+    @property
+    def avg_ms(self):
+        return self.total_ms / self.times if self.times else 0.0
+
+
+def tokenize(name):
+    return TOKEN_RE.findall(name)
+
+
+def iter_levels(name):
+    """
+    Yield (token, level, is_bracket) for every token of the name, where level is the
+    number of template argument lists the token is in (brackets are at the level of
+    their content). '<' opens template arguments only right after a name, as clang
+    prints comparisons with spaces around them.
+    """
+
+    stack = []
+    previous = ""
+
+    for token in tokenize(name):
+        top = stack[-1] if stack else None
+        last = previous[-1:]
+        after_name = any(
+            [last.isalnum(), last in ("_", "$"), previous.startswith("operator")]
+        )
+
+        if token == "<" and after_name:
+            stack.append(token)
+            yield token, stack.count("<"), True
+        elif token == ">" and top == "<":
+            yield token, stack.count("<"), True
+            stack.pop()
+        elif token in ("(", "["):
+            stack.append("(")
+            yield token, stack.count("<"), False
+        elif token in (")", "]") and top == "(":
+            stack.pop()
+            yield token, stack.count("<"), False
+        else:
+            yield token, stack.count("<"), False
+
+        previous = token
+
+
+def collapse_template_args(name, depth=0):
+    """
+    Replace the template arguments nested deeper than depth with '$'
+
+    Example input: std::map<int, std::vector<int>>::insert<int>
+    Output (depth=0): std::map<$>::insert<$>
+    Output (depth=1): std::map<int, std::vector<$>>::insert<int>
+    """
+
+    collapsed = []
+
+    for token, level, is_bracket in iter_levels(name):
+        if level <= depth:
+            collapsed.append(token)
+        elif level == depth + 1 and is_bracket:
+            collapsed.append("<$" if token == "<" else ">")
+
+    return "".join(collapsed)
+
+
+def split_scope(name):
+    """Split the name on '::' which aren't inside template arguments or parentheses"""
+
+    components = [""]
+    nesting = 0
+
+    for token, level, _ in iter_levels(name):
+        if token == "::" and level == 0 and nesting == 0:
+            components.append("")
+            continue
+
+        # Parentheses outside of template arguments, e.g. function parameters
+        if level == 0 and token in ("(", "["):
+            nesting += 1
+        elif level == 0 and token in (")", "]") and nesting > 0:
+            nesting -= 1
+
+        components[-1] += token
+
+    return components
+
+
+def get_namespace(name, depth=TEMPLATE_NAMESPACE_DEPTH):
+    """
+    Return the first depth components of the name's scope which aren't templates.
+    Classes can't be told apart from namespaces by the name alone.
+    """
+
+    namespace = []
+    for component in split_scope(collapse_template_args(name))[:-1]:
+        if "<" in component or "(" in component or len(namespace) == depth:
+            break
+        namespace.append(component.strip())
+
+    return "::".join(namespace) or GLOBAL_NAMESPACE
+
+
+def aggregate_templates(entries, get_key):
+    """
+    Aggregate entries {name: (total_ms, times)} by get_key(name)
+    and return the groups ordered by total time
+    """
+
+    groups = {}
+    for name, (total_ms, times) in entries.items():
+        group = groups.setdefault(get_key(name), [0, 0, 0])
+        group[0] += total_ms
+        group[1] += times
+        group[2] += 1
+
+    return sorted(
+        (TemplateGroup(key, *values) for key, values in groups.items()),
+        key=lambda group: group.total_ms,
+        reverse=True,
+    )
+
+
+def get_primary_template(name, depth=TEMPLATE_COLLAPSE_DEPTH):
+    return collapse_template_args(name, depth)
@@ -0,0 +1,85 @@
+"""
+Templates by Primary Template section of the build stats page (see template_names.py)
+"""
+
+from build_report_parser import TEMPLATES
+from template_names import (
+    TEMPLATE_COLLAPSE_DEPTH,
+    TEMPLATE_NAMESPACE_DEPTH,
+    aggregate_templates,
+    get_namespace,
+    get_primary_template,
+)
+from treemap import save_treemap
+from wiki_common import (
+    BUILD_ANALYZER,
+    NUM_TOP_RESULTS,
+    OUTPUT_DIR,
+    REPO_NAME,
+    create_image_hyperlink,
+)
+
+TEMPLATE_TREEMAP_GRAPH = f"{OUTPUT_DIR}/template_treemap.png"
+
+
+def generate_template_treemap(groups):
+    """Treemap of the primary templates' total time, colored by their namespace"""
+
+    groups = [group for group in groups[:NUM_TOP_RESULTS] if group.total_ms > 0]
+    if groups:
+        save_treemap(
+            TEMPLATE_TREEMAP_GRAPH,
+            "Primary templates by total instantiation time",
+            [group.total_ms for group in groups],
+            [f"{group.name} ({group.total_ms / 1000:.0f}s)" for group in groups],
+            [get_namespace(group.name) for group in groups],
+        )
+
+
+def generate_template_groups_table(groups):
+    table = (
+        "| Label | Name | Total (s) | Times | Instantiations | Avg (ms) |\n"
+        "|---|:---:|---|---|---|---|\n"
+    )
+    for idx, group in enumerate(groups[:NUM_TOP_RESULTS]):
+        # Escape '|' to not break markdown table
+        name = group.name.replace("|", r"\|")
+        table += (
+            f"| **{idx}** | `{name}` | **{group.total_ms / 1000:.1f}** | {group.times} "
+            f"| {group.count} | {group.avg_ms:.0f} |\n"
+        )
+
+    return table
+
+
+def generate_template_groups_section(snapshot):
+    """Template instantiations of this run aggregated by primary template and namespace"""
+
+    # name -> [total time in ms, times]
+    templates = snapshot.get(TEMPLATES, {})
+    if not templates:
+        return "There are no template instantiations in the build report\n"
+
+    primary_templates = aggregate_templates(templates, get_primary_template)
+    namespaces = aggregate_templates(templates, get_namespace)
+    generate_template_treemap(primary_templates)
+
+    source_note = (
+        "all instantiations recorded by -ftime-trace"
+        if BUILD_ANALYZER == "time-trace"
+        else "the most expensive instantiations listed in ClangBuildAnalyzer's report, "
+        "so the totals are lower bounds"
+    )
+    wiki_url = f"https://github.com/{REPO_NAME}/wiki"
+
+    return (
+        "Template instantiations grouped by their primary template (template arguments "
+        f"nested deeper than {TEMPLATE_COLLAPSE_DEPTH} levels replaced with `$`) and by "
+        f"the first {TEMPLATE_NAMESPACE_DEPTH} components of their namespace. "
+        f"Aggregated from {source_note}.\n\n"
+        f"{create_image_hyperlink(f'{wiki_url}/{TEMPLATE_TREEMAP_GRAPH}')}\n"
+        "## Primary templates \n"
+        f"{generate_template_groups_table(primary_templates)}"
+        "## Namespaces \n"
+        f"{generate_template_groups_table(namespaces)}"
+    )
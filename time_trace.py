@@ -0,0 +1,274 @@
+"""
+Ingestion of the JSON trace files generated by clang's `-ftime-trace` flag
+
+Every translation unit is parsed in a separate worker process, which reduces its
+trace to per-name totals right away, so only the compact aggregates travel back to
+the parent process. The aggregates are exposed as the same records that
+build_report_parser creates for ClangBuildAnalyzer's report.
+"""
+
+import csv
+import json
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Tuple
+from build_report_parser import (
+    FILE_CODEGEN,
+    FILE_PARSE,
+    FUNCTION_SETS,
+    FUNCTIONS,
+    HEADERS,
+    TEMPLATE_SETS,
+    TEMPLATES,
+    TIME_SUMMARY,
+    FileTime,
+    FunctionTime,
+    HeaderTime,
+    IncludeChain,
+    NameTimesAvg,
+    SummaryTime,
+)
+from template_names import collapse_template_args
+
+TEMPLATE_EVENTS = ("InstantiateClass", "InstantiateFunction")
+FUNCTION_EVENTS = ("CodeGen Function", "OptFunction")
+HEADER_EVENT = "Source"
+FRONTEND_EVENT = "Frontend"
+BACKEND_EVENT = "Backend"
+
+# Same defaults as in ClangBuildAnalyzer.ini
+MIN_FILE_TIME_US = 20 * 1000
+NUM_HEADER_CHAINS = 10
+
+
+class TraceAggregates(NamedTuple):
+    """Totals of the -ftime-trace events of the translation units"""
+
+    # Exact (not rounded) frontend and backend times in microseconds for each TU
+    tu_times: Dict[str, Tuple[int, int]]
+    # name -> [total time in microseconds, count]
+    templates: Dict[str, List[int]]
+    # (name, TU) -> [total time in microseconds, count]
+    functions: Dict[Tuple[str, str], List[int]]
+    # name -> [total time in microseconds, count, Counter of include chains,
+    #          number of inclusions directly by a TU]
+    headers: Dict[str, list]
+
+
+def find_trace_files(build_folder):
+    for root, _, files in os.walk(build_folder):
+        for file_name in files:
+            if file_name.endswith(".json") and file_name != "compile_commands.json":
+                yield os.path.join(root, file_name)
+
+
+def add_time(totals, name, duration):
+    total = totals.setdefault(name, [0, 0])
+    total[0] += duration
+    total[1] += 1
+
+
+def parse_trace_file(file_name, build_folder):
+    """
+    Reduce a single trace file to the aggregates of its translation unit.
+    Returns None for JSON files that aren't time traces.
+    """
+
+    with open(file_name, encoding="utf-8") as file:
+        try:
+            trace = json.load(file)
+        except json.JSONDecodeError:
+            return None
+
+    if not isinstance(trace, dict) or "traceEvents" not in trace:
+        return None
+
+    # Clang writes 'foo.cc.json' next to 'foo.cc.o'
+    tu_name = os.path.relpath(file_name, build_folder)[: -len(".json")] + ".o"
+
+    frontend_us = backend_us = 0
+    templates: Dict[str, List[int]] = {}
+    functions: Dict[Tuple[str, str], List[int]] = {}
+    sources = []
+
+    for event in trace["traceEvents"]:
+        if event.get("ph") != "X":
+            continue
+
+        name = event.get("name")
+        duration = event.get("dur", 0)
+
+        if name in TEMPLATE_EVENTS:
+            add_time(templates, event["args"]["detail"], duration)
+        elif name in FUNCTION_EVENTS:
+            add_time(functions, (event["args"]["detail"], tu_name), duration)
+        elif name == HEADER_EVENT:
+            sources.append((event["ts"], duration, event["args"]["detail"]))
+        elif name == FRONTEND_EVENT:
+            frontend_us += duration
+        elif name == BACKEND_EVENT:
+            backend_us += duration
+
+    # Nested 'Source' events are headers included by other headers
+    headers: Dict[str, list] = {}
+    stack: List[Tuple[int, str]] = []
+
+    for start, duration, name in sorted(sources):
+        while stack and stack[-1][0] <= start:
+            stack.pop()
+
+        chain = (tu_name,) + tuple(header for _, header in stack)
+        header = headers.setdefault(name, [0, 0, Counter(), 0])
+        header[0] += duration
+        header[1] += 1
+        header[2][chain] += 1
+        header[3] += not stack
+
+        stack.append((start + duration, name))
+
+    return TraceAggregates(
+        {tu_name: (frontend_us, backend_us)}, templates, functions, headers
+    )
+
+
+def merge_aggregates(into, other):
+    into.tu_times.update(other.tu_times)
+
+    for totals, other_totals in (
+        (into.templates, other.templates),
+        (into.functions, other.functions),
+    ):
+        for name, (duration, count) in other_totals.items():
+            total = totals.setdefault(name, [0, 0])
+            total[0] += duration
+            total[1] += count
+
+    for name, (duration, count, chains, root_count) in other.headers.items():
+        header = into.headers.setdefault(name, [0, 0, Counter(), 0])
+        header[0] += duration
+        header[1] += count
+        header[2].update(chains)
+        header[3] += root_count
+
+
+def collect_traces(build_folder, num_jobs=None):
+    """
+    Parse all trace files found in build_folder using a pool of num_jobs
+    processes (defaults to number of CPUs) and merge their aggregates.
+    """
+
+    aggregates = TraceAggregates({}, {}, {}, {})
+    trace_files = list(find_trace_files(build_folder))
+
+    with ProcessPoolExecutor(max_workers=num_jobs) as executor:
+        for result in executor.map(
+            parse_trace_file,
+            trace_files,
+            [build_folder] * len(trace_files),
+            chunksize=8,
+        ):
+            if result is not None:
+                merge_aggregates(aggregates, result)
+
+    print(
+        f"Parsed {len(aggregates.tu_times)} time traces "
+        f"out of {len(trace_files)} JSON files in {build_folder}"
+    )
+
+    return aggregates
+
+
+def us_to_ms(duration):
+    return int(duration // 1000)
+
+
+def get_name_times_avg_records(section, totals):
+    for name, (duration, count) in sorted(
+        totals.items(), key=lambda item: item[1][0], reverse=True
+    ):
+        yield NameTimesAvg(
+            section, name, us_to_ms(duration), count, us_to_ms(duration // count)
+        )
+
+
+def get_set_totals(totals, get_name=lambda key: key):
+    sets: Dict[str, List[int]] = {}
+    for key, (duration, count) in totals.items():
+        total = sets.setdefault(collapse_template_args(get_name(key)), [0, 0])
+        total[0] += duration
+        total[1] += count
+
+    return sets
+
+
+def to_records(aggregates, only_root_headers=True):
+    """
+    Convert the aggregates to build_report_parser records, in the same
+    section order as in ClangBuildAnalyzer's report. The times and include chains
+    of a header cover all its inclusions, with only_root_headers the headers which
+    are never included directly by a TU are left out.
+    """
+
+    yield SummaryTime(
+        TIME_SUMMARY,
+        "Parsing (frontend)",
+        sum(times[0] for times in aggregates.tu_times.values()) / 1e6,
+    )
+    yield SummaryTime(
+        TIME_SUMMARY,
+        "Codegen & opts (backend)",
+        sum(times[1] for times in aggregates.tu_times.values()) / 1e6,
+    )
+
+    for section, index in ((FILE_PARSE, 0), (FILE_CODEGEN, 1)):
+        for tu_name, times in sorted(
+            aggregates.tu_times.items(),
+            key=lambda item, index=index: item[1][index],
+            reverse=True,
+        ):
+            if times[index] < MIN_FILE_TIME_US:
+                break
+            yield FileTime(section, tu_name, us_to_ms(times[index]))
+
+    yield from get_name_times_avg_records(TEMPLATES, aggregates.templates)
+    yield from get_name_times_avg_records(
+        TEMPLATE_SETS, get_set_totals(aggregates.templates)
+    )
+
+    for (name, tu_name), (duration, _) in sorted(
+        aggregates.functions.items(), key=lambda item: item[1][0], reverse=True
+    ):
+        yield FunctionTime(FUNCTIONS, name, us_to_ms(duration), tu_name)
+
+    yield from get_name_times_avg_records(
+        FUNCTION_SETS, get_set_totals(aggregates.functions, lambda key: key[0])
+    )
+
+    for name, (duration, count, chains, root_count) in sorted(
+        aggregates.headers.items(), key=lambda item: item[1][0], reverse=True
+    ):
+        if only_root_headers and not root_count:
+            continue
+
+        yield HeaderTime(
+            HEADERS,
+            name,
+            us_to_ms(duration),
+            count,
+            us_to_ms(duration // count),
+            tuple(
+                IncludeChain(times, includers)
+                for includers, times in chains.most_common(NUM_HEADER_CHAINS)
+            ),
+        )
+
+
+def write_tu_times(aggregates, file_name):
+    """Store exact per-TU frontend and backend times (in microseconds) as CSV"""
+
+    with open(file_name, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(["file", "frontend_us", "backend_us"])
+        for tu_name, (frontend_us, backend_us) in sorted(aggregates.tu_times.items()):
+            writer.writerow([tu_name, frontend_us, backend_us])
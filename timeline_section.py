@@ -0,0 +1,198 @@
+"""
+Build Timeline and Compiler Memory sections of the build stats page, from the ninja
+log (see ninja_log.py) and the compile monitor log (see compile_memory.py)
+"""
+
+from operator import attrgetter
+import matplotlib.pyplot as plt
+import numpy as np
+from compile_memory import MEMORY_BUDGET_GB, get_memory_profile, recommend_jobs
+from ninja_log import COMPILE, LINK, MIN_IDLE_GAP_MS, OTHER, assign_lanes, write_jobs
+from wiki_common import (
+    NUM_TOP_RESULTS,
+    OUTPUT_DIR,
+    REPO_NAME,
+    convert_time,
+    create_image_hyperlink,
+)
+
+BUILD_TIMELINE_GRAPH = f"{OUTPUT_DIR}/build_timeline.png"
+BUILD_TARGETS_FILENAME = f"{OUTPUT_DIR}/build_targets.csv"
+COMPILE_MEMORY_GRAPH = f"{OUTPUT_DIR}/compile_memory.png"
+
+
+def generate_timeline_graph(timeline):
+    """Gantt chart of the build jobs and the number of running jobs over time"""
+
+    _, (ax_1, ax_2) = plt.subplots(
+        figsize=(19, 14), nrows=2, sharex=True, gridspec_kw={"height_ratios": [3, 1]}
+    )
+
+    lanes = np.array(assign_lanes(timeline.jobs))
+    starts = np.array([job.start_ms for job in timeline.jobs]) / 60000
+    durations = np.array([job.duration_ms for job in timeline.jobs]) / 60000
+    kinds = np.array([job.kind for job in timeline.jobs])
+
+    for kind, color in ((COMPILE, "tab:blue"), (LINK, "tab:orange"), (OTHER, "grey")):
+        selected = kinds == kind
+        if selected.any():
+            ax_1.barh(
+                lanes[selected],
+                durations[selected],
+                left=starts[selected],
+                height=0.8,
+                color=color,
+                label=kind,
+            )
+
+    critical_path = set(timeline.critical_path)
+    critical = np.array([job in critical_path for job in timeline.jobs])
+    ax_1.barh(
+        lanes[critical],
+        durations[critical],
+        left=starts[critical],
+        height=0.8,
+        fill=False,
+        edgecolor="red",
+        linewidth=2,
+        label="critical path",
+    )
+
+    ax_1.set_title("Build timeline")
+    ax_1.set_ylabel("Job slot")
+    ax_1.invert_yaxis()
+    ax_1.legend()
+
+    ax_2.step(timeline.times / 60000, timeline.parallelism, where="post")
+    ax_2.axhline(timeline.cores, color="red", linestyle="--", label="cores")
+    ax_2.set_ylabel("Running jobs")
+    ax_2.set_xlabel("Time (min)")
+    ax_2.grid(True)
+    ax_2.legend()
+
+    plt.tight_layout()
+    plt.savefig(BUILD_TIMELINE_GRAPH)
+    plt.close()
+
+
+def generate_critical_path_table(timeline):
+    critical_path = sorted(
+        timeline.critical_path, key=attrgetter("duration_ms"), reverse=True
+    )
+
+    table = "| Label | Target | Kind | Duration (s) | Start (s) |\n|---|:---:|---|---|---|\n"
+    for idx, job in enumerate(critical_path[:NUM_TOP_RESULTS]):
+        table += (
+            f"| **{idx}** | `{job.target}` | {job.kind} | **{job.duration_ms / 1000:.1f}** "
+            f"| {job.start_ms / 1000:.1f} |\n"
+        )
+
+    return table
+
+
+def generate_idle_gaps_table(timeline):
+    gaps = sorted(timeline.idle_gaps, key=attrgetter("idle_core_ms"), reverse=True)
+
+    table = "| Start (s) | Duration (s) | Idle core time (s) | Longest running jobs |\n|---|---|---|:---:|\n"
+    for gap in gaps[:NUM_TOP_RESULTS]:
+        targets = "<br>".join(f"`{target}`" for target in gap.targets)
+        table += (
+            f"| {gap.start_ms / 1000:.1f} | {(gap.end_ms - gap.start_ms) / 1000:.1f} "
+            f"| **{gap.idle_core_ms / 1000:.1f}** | {targets} |\n"
+        )
+
+    return table
+
+
+def generate_build_timeline_section(timeline):
+    """Summary, critical path and idle gaps of the build read from .ninja_log"""
+
+    if timeline is None:
+        return "Build timeline is not available (no .ninja_log in the build folder)\n"
+
+    write_jobs(timeline, BUILD_TARGETS_FILENAME)
+    generate_timeline_graph(timeline)
+
+    wall_ms, busy_ms = timeline.wall_ms, timeline.busy_ms
+    critical_times = {
+        kind: sum(job.duration_ms for job in timeline.critical_path if job.kind == kind)
+        for kind in (COMPILE, LINK, OTHER)
+    }
+    wiki_url = f"https://github.com/{REPO_NAME}/wiki"
+
+    return (
+        "Following data were read from ninja's `.ninja_log`. The log doesn't contain the "
+        "dependencies between targets, so the critical path is approximated by following "
+        "each job back to the job which finished latest before it started.\n"
+        f"- Wall time: **{convert_time(round(wall_ms / 1000))}**\n"
+        f"- Sum of job times: **{convert_time(round(busy_ms / 1000))}**\n"
+        f"- Average parallelism: **{busy_ms / wall_ms:.2f}** jobs on {timeline.cores} cores\n"
+        f"- Idle core time: **{100 * (1 - busy_ms / (wall_ms * timeline.cores)):.1f}%**\n"
+        f"- Critical path: **{len(timeline.critical_path)}** jobs, "
+        f"compile {critical_times[COMPILE] / 1000:.1f}s, link {critical_times[LINK] / 1000:.1f}s, "
+        f"other {critical_times[OTHER] / 1000:.1f}s\n"
+        f"- [Per-target build times]({BUILD_TARGETS_FILENAME})\n\n"
+        f"{create_image_hyperlink(f'{wiki_url}/{BUILD_TIMELINE_GRAPH}')}\n"
+        "## Top critical path targets \n"
+        f"{generate_critical_path_table(timeline)}"
+        "## Idle core gaps \n"
+        f"Periods of at least {MIN_IDLE_GAP_MS // 1000} seconds in which fewer than "
+        f"{timeline.cores} jobs were running\n\n"
+        f"{generate_idle_gaps_table(timeline)}"
+    )
+
+
+def generate_memory_graph(jobs):
+    """Memory of the compiler jobs running at the same time over the build"""
+
+    times, memory = get_memory_profile(jobs)
+
+    _, axis = plt.subplots(figsize=(19, 10))
+    axis.step(times / 60, memory, where="post", label="running jobs (sum of peaks)")
+    axis.axhline(MEMORY_BUDGET_GB, color="red", linestyle="--", label="budget")
+    axis.set_title("Compiler memory")
+    axis.set_xlabel("Time (min)")
+    axis.set_ylabel("Memory (GB)")
+    axis.grid(True)
+    axis.legend()
+
+    plt.tight_layout()
+    plt.savefig(COMPILE_MEMORY_GRAPH)
+    plt.close()
+
+
+def generate_compile_memory_section(jobs):
+    """Heaviest jobs and recommended parallelism from compile_monitor.py's records"""
+
+    if jobs is None:
+        return (
+            "Compiler memory is not available (build with VT_COMPILE_MONITOR_ENABLED=1 "
+            "to record it)\n"
+        )
+
+    generate_memory_graph(jobs)
+
+    heaviest = sorted(jobs, key=attrgetter("max_rss_kb"), reverse=True)
+    _, memory = get_memory_profile(jobs)
+    recommended_jobs = recommend_jobs(jobs)
+    wiki_url = f"https://github.com/{REPO_NAME}/wiki"
+
+    table = "| Label | Target | Kind | Peak memory (MB) | Duration (s) |\n|---|:---:|---|---|---|\n"
+    for idx, job in enumerate(heaviest[:NUM_TOP_RESULTS]):
+        table += (
+            f"| **{idx}** | `{job.target}` | {job.kind} | **{job.max_rss_kb // 1024}** "
+            f"| {job.duration_s:.1f} |\n"
+        )
+
+    return (
+        "Peak memory (RSS) of every compiler and linker job, recorded by the compiler "
+        "launcher. The memory over time is the sum of the peaks of the running jobs, "
+        "so it's an upper bound of the real usage.\n"
+        f"- Highest memory of running jobs: **{memory.max():.1f} GB**\n"
+        f"- Recommended maximum parallelism for {MEMORY_BUDGET_GB:g} GB: "
+        f"**-j {recommended_jobs}** (the {recommended_jobs} heaviest jobs together need "
+        f"{sum(job.max_rss_gb for job in heaviest[:recommended_jobs]):.1f} GB)\n\n"
+        f"{create_image_hyperlink(f'{wiki_url}/{COMPILE_MEMORY_GRAPH}')}\n"
+        "## Memory-heaviest targets \n"
+        f"{table}"
+    )
@@ -0,0 +1,238 @@
+"""
+Alpha-beta (latency-bandwidth) model of the messaging perf tests
+
+The time of sending a message of n bytes is modelled as time = latency + n / bandwidth.
+The model is fitted by weighted least squares to the send_cost results of every
+transport (MPI, ObjGroup, Collection) and to the ping_pong results. The weights are
+1 / time, i.e. the relative errors are minimized, so that the small payloads (which
+determine the latency) aren't drowned out by the large ones.
+
+Derived from the fits:
+- half bandwidth payload: the payload at which transferring the data takes as long
+  as the latency (latency * bandwidth)
+- overhead of vt's transports relative to raw MPI: the extra latency, the bandwidth
+  ratio and the payload above which the transport becomes cheaper than MPI (if ever)
+The models of every run are appended to the transport_models history table.
+"""
+
+import json
+import os
+from typing import NamedTuple
+import numpy as np
+import pandas as pd
+from rank_stats import aggregate_ranks
+
+MPI = "MPI"
+PING_PONG = "ping_pong"
+# send_cost results of the transports, their payload is in 32-bit elements
+SEND_COST_FILES = {
+    MPI: "test_send_time",
+    "ObjGroup": "test_objgroup_send_time",
+    "Collection": "test_collection_send_time",
+}
+PING_PONG_FILE = "test_ping_pong_time"
+BYTES_PER_ELEMENT = 4
+
+TRANSPORT_MODELS_TABLE = "transport_models"
+TRANSPORT_MODELS_FILENAME = "transport_models.json"
+
+
+class AlphaBeta(NamedTuple):
+    """Latency-bandwidth model fitted to the times of the payload sizes"""
+
+    latency_ms: float
+    ms_per_byte: float
+    # Number of payload sizes the model was fitted to
+    points: int
+
+    def predict(self, sizes):
+        return self.latency_ms + np.asarray(sizes, dtype=float) * self.ms_per_byte
+
+
+class TransportModel(NamedTuple):
+    """Fitted model of a transport with its overhead relative to MPI"""
+
+    group: str
+    latency_ms: float
+    bandwidth_gb_s: float
+    half_bandwidth_bytes: float
+    # Relative to the MPI model, NaN for MPI itself or when there is no MPI model
+    latency_overhead_ms: float
+    bandwidth_ratio: float
+    mpi_crossover_bytes: float
+    points: int
+
+
+def fit_alpha_beta(sizes, times):
+    """Weighted least squares fit of time = latency + size * ms_per_byte"""
+
+    sizes = np.asarray(sizes, dtype=float)
+    times = np.asarray(times, dtype=float)
+    valid = np.isfinite(sizes) & np.isfinite(times) & (times > 0)
+    sizes, times = sizes[valid], times[valid]
+
+    if len(np.unique(sizes)) < 2:
+        return AlphaBeta(np.nan, np.nan, len(sizes))
+
+    weights = 1.0 / times
+    design = np.column_stack([np.ones_like(sizes), sizes]) * weights[:, np.newaxis]
+    (latency, ms_per_byte), *_ = np.linalg.lstsq(design, times * weights, rcond=None)
+
+    return AlphaBeta(float(latency), float(ms_per_byte), len(sizes))
+
+
+def format_fit(fit):
+    """Example output: 1.52 us + n / 3.10 GB/s"""
+
+    if not fit.ms_per_byte > 0:
+        return f"{fit.latency_ms * 1000:.2f} us"
+
+    return f"{fit.latency_ms * 1000:.2f} us + n / {1e-6 / fit.ms_per_byte:.2f} GB/s"
+
+
+def get_crossover(fit, reference):
+    """Payload above which fit is cheaper than reference, NaN if it never is"""
+
+    if fit.ms_per_byte >= reference.ms_per_byte:
+        return np.nan
+
+    crossover = (fit.latency_ms - reference.latency_ms) / (
+        reference.ms_per_byte - fit.ms_per_byte
+    )
+    return float(crossover) if crossover > 0 else np.nan
+
+
+def get_payload_times(data_frame, get_size):
+    """
+    Median time across the ranks of every payload, with its size in bytes
+
+    Example input: name,node,mean = [payload size 64,0,0.2], [payload size 64,1,0.4]
+    Output (with 32-bit elements): bytes=256, time=0.3
+    """
+
+    stats = aggregate_ranks(data_frame, "name").reset_index()
+    return pd.DataFrame(
+        {"bytes": stats["name"].map(get_size), "time": stats["median"]}
+    ).sort_values("bytes")
+
+
+def get_send_cost_size(name):
+    return int(name.split()[-1]) * BYTES_PER_ELEMENT
+
+
+def get_ping_pong_size(name):
+    return int(name.split()[0])
+
+
+def read_payload_times(tests_folder):
+    """Return the payload times of every transport group found in the tests folder"""
+
+    samples = {}
+    for group, file_name in SEND_COST_FILES.items():
+        path = os.path.join(tests_folder, f"{file_name}.csv")
+        if os.path.exists(path):
+            samples[group] = get_payload_times(pd.read_csv(path), get_send_cost_size)
+
+    path = os.path.join(tests_folder, f"{PING_PONG_FILE}.csv")
+    if os.path.exists(path):
+        samples[PING_PONG] = get_payload_times(pd.read_csv(path), get_ping_pong_size)
+
+    return samples
+
+
+def fit_models(samples):
+    return {
+        group: fit_alpha_beta(payloads["bytes"], payloads["time"])
+        for group, payloads in samples.items()
+    }
+
+
+def describe_models(fits):
+    """Return TransportModel of every fit, compared with the MPI fit"""
+
+    reference = fits.get(MPI)
+    models = []
+
+    for group, fit in fits.items():
+        bandwidth = 1e-6 / fit.ms_per_byte if fit.ms_per_byte > 0 else np.nan
+        half_bandwidth = (
+            fit.latency_ms / fit.ms_per_byte
+            if fit.ms_per_byte > 0 and fit.latency_ms > 0
+            else np.nan
+        )
+
+        overhead, ratio, crossover = np.nan, np.nan, np.nan
+        if reference is not None and group != MPI:
+            overhead = fit.latency_ms - reference.latency_ms
+            ratio = (
+                reference.ms_per_byte / fit.ms_per_byte
+                if fit.ms_per_byte > 0
+                else np.nan
+            )
+            crossover = get_crossover(fit, reference)
+
+        models.append(
+            TransportModel(
+                group,
+                fit.latency_ms,
+                bandwidth,
+                half_bandwidth,
+                overhead,
+                ratio,
+                crossover,
+                fit.points,
+            )
+        )
+
+    return models
+
+
+def append_history(store, models, run_num, commit):
+    if not models:
+        return
+
+    history = pd.DataFrame(models, columns=TransportModel._fields)
+    history.insert(0, "commit", commit)
+    history.insert(0, "run_num", run_num)
+
+    store.append(TRANSPORT_MODELS_TABLE, history)
+
+
+def read_history(store, num_runs):
+    if not store.exists(TRANSPORT_MODELS_TABLE):
+        return pd.DataFrame()
+
+    return store.read_last_runs(TRANSPORT_MODELS_TABLE, num_runs)
+
+
+def write_models(models, file_name):
+    with open(file_name, "w", encoding="utf-8") as file:
+        json.dump(
+            [
+                {
+                    key: None if isinstance(value, float) and np.isnan(value) else value
+                    for key, value in model._asdict().items()
+                }
+                for model in models
+            ],
+            file,
+            indent=2,
+        )
+
+
+def read_models(file_name):
+    """Return the models stored in the file or None if there are none"""
+
+    if not os.path.exists(file_name):
+        return None
+
+    with open(file_name, encoding="utf-8") as file:
+        return [
+            TransportModel(
+                **{
+                    key: np.nan if value is None else value
+                    for key, value in model.items()
+                }
+            )
+            for model in json.load(file)
+        ]
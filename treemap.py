@@ -0,0 +1,147 @@
+"""
+Squarified treemap layout (Bruls, Huizing, van Wijk: "Squarified Treemaps")
+
+Values are laid out in rows along the shorter side of the remaining rectangle, and
+a value is added to the current row only while it doesn't make the worst aspect
+ratio of the row's rectangles worse.
+"""
+
+import matplotlib.pyplot as plt
+from matplotlib.patches import Rectangle
+
+# Labels are drawn only in rectangles which are at least this big (in axis units)
+MIN_LABEL_WIDTH = 8
+MIN_LABEL_HEIGHT = 3
+
+
+def worst_ratio(row, length):
+    """Worst aspect ratio of the row's rectangles laid along side of given length"""
+
+    total = sum(row)
+    return max(
+        max(length**2 * value / total**2, total**2 / (length**2 * value))
+        for value in row
+    )
+
+
+def layout_row(row, x, y, width, height):
+    """
+    Lay the row out along the shorter side of the rectangle and
+    return its rectangles and the remaining rectangle
+    """
+
+    total = sum(row)
+    rects = []
+
+    if width >= height:
+        row_width = total / height
+        for value in row:
+            rects.append((x, y, row_width, value / row_width))
+            y += value / row_width
+        return rects, (x + row_width, y - height, width - row_width, height)
+
+    row_height = total / width
+    for value in row:
+        rects.append((x, y, value / row_height, row_height))
+        x += value / row_height
+    return rects, (x - width, y + row_height, width, height - row_height)
+
+
+def squarify(values, x, y, width, height):
+    """
+    Return rectangle (x, y, width, height) for each of the positive values, which
+    must be sorted in descending order. Areas are proportional to the values.
+    """
+
+    scale = width * height / sum(values)
+    remaining = [value * scale for value in values]
+
+    rects = []
+    row = []
+    while remaining:
+        length = min(width, height)
+        if not row or worst_ratio(row + [remaining[0]], length) <= worst_ratio(
+            row, length
+        ):
+            row.append(remaining.pop(0))
+            continue
+
+        row_rects, (x, y, width, height) = layout_row(row, x, y, width, height)
+        rects.extend(row_rects)
+        row = []
+
+    if row:
+        rects.extend(layout_row(row, x, y, width, height)[0])
+
+    return rects
+
+
+def plot_treemap(axis, values, labels, colors):
+    """Draw the treemap of the values (sorted in descending order) into axis"""
+
+    width, height = 100, 60
+
+    for (x, y, rect_width, rect_height), label, color in zip(
+        squarify(values, 0, 0, width, height), labels, colors
+    ):
+        axis.add_patch(
+            Rectangle(
+                (x, y), rect_width, rect_height, facecolor=color, edgecolor="white"
+            )
+        )
+
+        if rect_width >= MIN_LABEL_WIDTH and rect_height >= MIN_LABEL_HEIGHT:
+            # About two characters of the 10pt font fit in an axis unit of a 19in figure
+            max_chars = int(rect_width * 2)
+            text = label if len(label) <= max_chars else f"{label[: max_chars - 3]}..."
+            axis.text(
+                x + rect_width / 2,
+                y + rect_height / 2,
+                text,
+                ha="center",
+                va="center",
+                fontsize=10,
+            )
+
+    axis.set_xlim(0, width)
+    axis.set_ylim(0, height)
+    axis.invert_yaxis()
+    axis.axis("off")
+
+
+def save_treemap(file_name, title, values, labels, color_keys):
+    """
+    Save the treemap of the values (sorted in descending order), rectangles with
+    the same color key have the same color, which is explained in the legend
+    """
+
+    colors, palette = get_colors(color_keys)
+
+    _, axis = plt.subplots(figsize=(19, 12))
+    plot_treemap(axis, values, labels, colors)
+    axis.set_title(title)
+    axis.legend(
+        handles=[
+            Rectangle((0, 0), 1, 1, color=color, label=key)
+            for key, color in palette.items()
+        ],
+        loc="upper center",
+        bbox_to_anchor=(0.5, 0.0),
+        ncol=min(len(palette), 5),
+        fontsize=12,
+    )
+
+    plt.tight_layout()
+    plt.savefig(file_name)
+    plt.close()
+
+
+def get_colors(keys, colormap="tab20"):
+    """Assign a color to every distinct key, in the order of first appearance"""
+
+    cmap = plt.get_cmap(colormap)
+    palette = {}
+    for key in keys:
+        palette.setdefault(key, cmap(len(palette) % cmap.N))
+
+    return [palette[key] for key in keys], palette
@@ -0,0 +1,50 @@
+"""
+Settings and formatting helpers shared by the sections of the wiki pages
+"""
+
+import numpy as np
+from config import get_config
+
+CONFIG = get_config()
+OUTPUT_DIR = CONFIG.output_dir
+BUILD_ANALYZER = CONFIG.build_analyzer
+REPO_NAME = CONFIG.repo_name
+RUN_NUM = CONFIG.run_num
+
+NUM_TOP_RESULTS = 25
+
+
+def strip_relative_path(name):
+    """Remove the relative path from the file name"""
+
+    while name.startswith("../"):
+        name = name[3:]
+
+    return name
+
+
+def convert_time(time_in_sec):
+    minutes, seconds = divmod(round(time_in_sec), 60)
+    return f"{minutes}min {seconds}sec"
+
+
+def create_image_hyperlink(image_link):
+    return f"[![]({image_link})]({image_link})"
+
+
+def format_number(value, spec, suffix=""):
+    return "-" if np.isnan(value) else f"{value:{spec}}{suffix}"
+
+
+def format_bytes(size):
+    """Example output: 48.0 KiB"""
+
+    if np.isnan(size):
+        return "-"
+
+    for unit in ("B", "KiB", "MiB"):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+
+    return f"{size:.1f} GiB"